@@ -0,0 +1,156 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from ai_model.process_pool import in_worker
+from utils.metrics import INFERENCE_BATCH_SIZE, INFERENCE_QUEUE_DEPTH, add_collector
+
+# ✅ 설정 (환경변수로 조정)
+BATCHING_ENABLED = os.getenv("INFERENCE_BATCHING", "0") == "1"
+BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "10"))
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+
+# 모델 이름 → 스케줄러 (통계 조회용)
+_schedulers = {}
+
+
+class BatchingScheduler:
+    """
+    여러 요청 스레드의 입력(1x3x224x224)을 모아 한 번의 N x 3 x 224 x 224 forward로 실행하고
+    결과를 각 호출자에게 나눠 돌려주는 스케줄러.
+    첫 요청이 들어온 뒤 window_ms 동안 또는 max_batch_size가 찰 때까지 기다렸다가 실행합니다.
+    """
+
+    def __init__(self, name, model, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.name = name
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # 통계
+        self._batches = 0
+        self._requests = 0
+        self._max_seen_batch = 0
+        self._batch_size_counts = {}
+        self._forward_seconds = 0.0
+
+        _schedulers[name] = self
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._loop, name=f"batcher-{self.name}", daemon=True
+                    )
+                    self._worker.start()
+
+    # ✅ 입력 등록 → Future 반환
+    def submit(self, input_tensor):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((input_tensor, future))
+        return future
+
+    # ✅ model(input_tensor)처럼 호출 가능 (결과가 나올 때까지 대기)
+    def __call__(self, input_tensor):
+        return self.submit(input_tensor).result()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        size = batch[0][0].shape[0]
+        deadline = time.monotonic() + self.window
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += item[0].shape[0]
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect_batch()
+            inputs = [tensor for tensor, _ in batch]
+            futures = [future for _, future in batch]
+
+            try:
+                start = time.perf_counter()
+                # no_grad는 스레드별로 적용되므로 워커 스레드에서 다시 설정
+                with torch.no_grad():
+                    output = self.model(torch.cat(inputs, dim=0))
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            # 결과를 호출자별로 분배
+            offset = 0
+            for tensor, future in zip(inputs, futures):
+                n = tensor.shape[0]
+                future.set_result(output[offset:offset + n])
+                offset += n
+
+            self._record(offset, elapsed)
+
+    def _record(self, batch_size, elapsed):
+        with self._lock:
+            self._batches += 1
+            self._requests += batch_size
+            self._forward_seconds += elapsed
+            self._max_seen_batch = max(self._max_seen_batch, batch_size)
+            self._batch_size_counts[batch_size] = self._batch_size_counts.get(batch_size, 0) + 1
+        INFERENCE_BATCH_SIZE.observe(batch_size, model=self.name)
+
+    # ✅ 큐 길이 / 배치 크기 통계
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "requests": self._requests,
+                "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size_seen": self._max_seen_batch,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_size_counts.items())},
+                "avg_forward_ms": round(self._forward_seconds / self._batches * 1000, 2) if self._batches else 0.0,
+                "window_ms": self.window * 1000,
+                "max_batch_size": self.max_batch_size,
+            }
+
+
+# ✅ 배치 사용 여부에 따라 스케줄러 또는 모델 자체를 반환
+#    (프로세스 풀 워커 안에서는 배치하지 않음: 부모 프로세스에서 이미 묶어서 보냄)
+def make_forward(name, model):
+    if BATCHING_ENABLED and not in_worker():
+        return BatchingScheduler(name, model)
+    return model
+
+
+def get_all_stats():
+    return {
+        "enabled": BATCHING_ENABLED,
+        "models": {name: scheduler.stats() for name, scheduler in _schedulers.items()},
+    }
+
+
+# ✅ /metrics 조회 시 배치 대기열 길이 갱신
+def _collect_queue_depth():
+    for name, scheduler in list(_schedulers.items()):
+        INFERENCE_QUEUE_DEPTH.set(scheduler._queue.qsize(), model=name)
+
+
+add_collector(_collect_queue_depth)
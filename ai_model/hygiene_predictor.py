@@ -1,11 +1,17 @@
 import torch
 import torch.nn.functional as F
-import numpy as np
-from PIL import Image
 from torchvision import transforms
 from segmentation_models_pytorch import UnetPlusPlus
 import os
 
+from ai_model.batching import make_forward
+from ai_model.postprocess import build_palette_lut
+from ai_model.optimize import optimize_for_inference
+from ai_model.process_pool import pooled_loader
+from ai_model.registry import registry, warmup_segmentation_model
+from ai_model.segmentation_result import SegmentationResult, composite_overlay
+from utils.timing import stage
+
 # ✅ 설정
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_PATH = os.path.join(BASE_DIR, "ai_model", "hygiene_model_saved_weight.pt")
@@ -24,16 +30,29 @@ HYGIENE_CLASS_MAP = {
     9: "지르코니아 (zircr)"
 }
 
-# ✅ 모델 정의 및 로드
-model = UnetPlusPlus(
-    encoder_name="efficientnet-b7",
-    encoder_weights=None,
-    in_channels=3,
-    classes=10
-)
-model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
-model.to(DEVICE)
-model.eval()
+# ✅ 모델 정의 및 로드 (레지스트리가 첫 사용 시 또는 워밍업 스레드에서 호출)
+def build_model(load_weights=True):
+    model = UnetPlusPlus(
+        encoder_name="efficientnet-b7",
+        encoder_weights=None,
+        in_channels=3,
+        classes=10
+    )
+    if load_weights:
+        model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
+    model.to(DEVICE)
+    model.eval()
+    return model
+
+# ✅ 레지스트리용 로더: fp32 모델 + 설정된 CPU 최적화 (ai_model/optimize.py)
+def load_model():
+    return optimize_for_inference(build_model(), "model2")
+
+# INFERENCE_BACKEND=process 이면 워커 프로세스에서 로드 (ai_model/process_pool.py)
+registry.register("model2", pooled_loader("model2", load_model), warmup=warmup_segmentation_model)
+
+# ✅ forward 호출 (INFERENCE_BATCHING=1 이면 요청 간 마이크로 배치 스케줄러 경유)
+forward = make_forward("model2", registry.lazy("model2"))
 
 # ✅ 전처리
 def preprocess(pil_img, size=(224, 224)):
@@ -43,67 +62,48 @@ def preprocess(pil_img, size=(224, 224)):
     ])
     return transform(pil_img).unsqueeze(0)
 
-# ✅ 후처리 (클래스 → RGBA 컬러맵)
-def postprocess(output_tensor, target_size=(224, 224)):
-    pred = torch.argmax(output_tensor.squeeze(0), dim=0).cpu().numpy()
-
-    PALETTE = {
-        0: (0, 0, 0, 0),            # background
-        1: (255, 182, 193, 200),    # am
-        2: (0, 255, 127, 200),      # cecr
-        3: (30, 144, 255, 200),     # gcr
-        4: (255, 255, 0, 200),      # mcr
-        5: (255, 140, 0, 200),      # ortho
-        6: (128, 0, 128, 200),      # tar1
-        7: (255, 105, 180, 200),    # tar2
-        8: (0, 206, 209, 200),      # tar3
-        9: (105, 105, 105, 200),    # zircr
-    }
-
-    h, w = pred.shape
-    color_mask = np.zeros((h, w, 4), dtype=np.uint8)
-
-    for class_id, color in PALETTE.items():
-        color_mask[pred == class_id] = color
-
-    return Image.fromarray(color_mask, mode="RGBA").resize(target_size)
-
-# ✅ 예측 + 합성 마스크 저장
-def predict_mask_and_overlay_only(pil_img, overlay_save_path):
-    input_tensor = preprocess(pil_img).to(DEVICE)
-    with torch.no_grad():
-        output = model(input_tensor)
+# ✅ 클래스 → RGBA 팔레트 (LUT로 변환해 한 번에 컬러링)
+PALETTE = {
+    0: (0, 0, 0, 0),            # background
+    1: (255, 182, 193, 200),    # am
+    2: (0, 255, 127, 200),      # cecr
+    3: (30, 144, 255, 200),     # gcr
+    4: (255, 255, 0, 200),      # mcr
+    5: (255, 140, 0, 200),      # ortho
+    6: (128, 0, 128, 200),      # tar1
+    7: (255, 105, 180, 200),    # tar2
+    8: (0, 206, 209, 200),      # tar3
+    9: (105, 105, 105, 200),    # zircr
+}
+PALETTE_LUT = build_palette_lut(PALETTE)
+
+# ✅ 저장된 마스크로 오버레이 다시 그리기 (결과 객체의 overlay와 같은 합성)
+def render_overlay(pred, resized_img):
+    return composite_overlay(pred, resized_img, PALETTE_LUT)
+
+# ✅ 모델 1회 실행 → 결과 객체 (마스크/오버레이/주요 클래스는 지연 계산)
+class HygieneResult(SegmentationResult):
+    @property
+    def label(self):
+        return HYGIENE_CLASS_MAP.get(self.class_id, "Unknown")
+
+def predict(pil_img, input_tensor=None, resized_img=None):
+    if input_tensor is None:
+        input_tensor = preprocess(pil_img)
+    input_tensor = input_tensor.to(DEVICE)
+    with torch.no_grad(), stage("forward.model2"):
+        output = forward(input_tensor)
         output = F.softmax(output, dim=1)
 
-    mask_img = postprocess(output)
-    resized_img = pil_img.resize(mask_img.size).convert("RGBA")
-    overlayed = Image.alpha_composite(resized_img, mask_img)
+    return HygieneResult(output, pil_img, PALETTE_LUT, resized_img=resized_img)
 
+# ✅ 예측 + 합성 마스크 저장
+def predict_mask_and_overlay_only(pil_img, overlay_save_path, input_tensor=None, resized_img=None):
+    overlayed = predict(pil_img, input_tensor=input_tensor, resized_img=resized_img).overlay
     overlayed.save(overlay_save_path)
     return overlayed
 
 # ✅ 주요 클래스 ID, confidence, 라벨명 반환
-def get_main_class_and_confidence_and_label(pil_img):
-    input_tensor = preprocess(pil_img).to(DEVICE)
-    with torch.no_grad():
-        output = model(input_tensor)
-        output = F.softmax(output, dim=1)
-
-    pred = torch.argmax(output.squeeze(0), dim=0).cpu().numpy()
-    output_np = output.squeeze(0).cpu().numpy()
-
-    class_ids, counts = np.unique(pred, return_counts=True)
-
-    best_class = -1
-    best_conf = 0.0
-    for cid, cnt in zip(class_ids, counts):
-        if cid == 0:
-            continue
-        class_conf = output_np[cid][pred == cid].mean()
-        if cnt > 0 and class_conf > best_conf:
-            best_class = cid
-            best_conf = class_conf
-
-    best_label = HYGIENE_CLASS_MAP.get(best_class, "Unknown")
-
-    return int(best_class), float(best_conf), best_label
+def get_main_class_and_confidence_and_label(pil_img, input_tensor=None):
+    result = predict(pil_img, input_tensor=input_tensor)
+    return result.class_id, result.confidence, result.label
@@ -0,0 +1,118 @@
+import numpy as np
+
+# ✅ 병변 마스크의 압축 표현 (MongoDB 문서 / JSON 응답용)
+#   기존 lesion_points([[y, x], ...] 전체 픽셀 목록) 대신 클래스별로
+#   - rle  : 행 우선(row-major)으로 펼친 이진 마스크의 run-length (0 run부터 시작, 번갈아 0/1)
+#   - area : 픽셀 수
+#   - bbox : [x_min, y_min, x_max, y_max] (양 끝 포함)
+#   를 저장합니다. decode_* 함수로 원래 마스크 / 픽셀 목록을 그대로 복원할 수 있습니다.
+
+GEOMETRY_FORMAT = "rle-v1"
+
+# 클래스 정보 없이 lesion_points만 있던 기존 문서를 마이그레이션할 때 쓰는 클래스 키
+UNKNOWN_CLASS_KEY = "unknown"
+UNKNOWN_CLASS_VALUE = 255
+
+
+def rle_encode(binary_mask):
+    """이진 마스크(H x W) → run-length 리스트 (첫 값은 0 run 길이)"""
+    flat = np.asarray(binary_mask, dtype=np.uint8).ravel()
+    # 값이 바뀌는 위치를 찾아 run 길이 계산
+    padded = np.concatenate(([0], flat, [0]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    runs = np.diff(np.concatenate(([0], changes, [flat.size])))
+    # 마지막 0 run이 0이면 제거
+    if runs.size and runs[-1] == 0:
+        runs = runs[:-1]
+    return runs.tolist()
+
+
+def rle_decode(runs, shape):
+    """run-length 리스트 → 이진 마스크(H x W, bool)"""
+    size = shape[0] * shape[1]
+    values = np.arange(len(runs)) % 2 == 1
+    flat = np.repeat(values, np.asarray(runs, dtype=np.intp))
+    if flat.size < size:
+        flat = np.concatenate((flat, np.zeros(size - flat.size, dtype=bool)))
+    return flat.reshape(shape)
+
+
+def encode_lesion_mask(pred_mask):
+    """클래스 ID 마스크(H x W) → 클래스별 RLE / 면적 / bbox 딕셔너리"""
+    pred_mask = np.asarray(pred_mask)
+    height, width = pred_mask.shape
+    classes = {}
+
+    for class_id in np.unique(pred_mask):
+        if class_id == 0:
+            continue
+        binary = pred_mask == class_id
+        ys, xs = np.nonzero(binary)
+        classes[str(int(class_id))] = {
+            "rle": rle_encode(binary),
+            "area": int(ys.size),
+            "bbox": [int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())],
+        }
+
+    return {
+        "format": GEOMETRY_FORMAT,
+        "height": int(height),
+        "width": int(width),
+        "total_area": int(sum(c["area"] for c in classes.values())),
+        "classes": classes,
+    }
+
+
+def decode_lesion_mask(geometry):
+    """encode_lesion_mask 결과 → 클래스 ID 마스크(H x W, uint8)"""
+    shape = (geometry["height"], geometry["width"])
+    pred_mask = np.zeros(shape, dtype=np.uint8)
+    for class_key, info in geometry.get("classes", {}).items():
+        value = int(class_key) if class_key.isdigit() else UNKNOWN_CLASS_VALUE
+        pred_mask[rle_decode(info["rle"], shape)] = value
+    return pred_mask
+
+
+def decode_lesion_points(geometry):
+    """encode_lesion_mask 결과 → 기존 lesion_points 형식 ([[y, x], ...], 행 우선 정렬)"""
+    return np.column_stack(np.where(decode_lesion_mask(geometry) > 0)).tolist()
+
+
+def geometry_from_lesion_points(lesion_points, height=224, width=224):
+    """기존 문서의 lesion_points(클래스 정보 없음) → 압축 표현 (클래스 키는 'unknown')"""
+    binary = np.zeros((height, width), dtype=bool)
+    if lesion_points:
+        coords = np.asarray(lesion_points, dtype=np.intp)
+        binary[coords[:, 0], coords[:, 1]] = True
+
+    classes = {}
+    if binary.any():
+        ys, xs = np.nonzero(binary)
+        classes[UNKNOWN_CLASS_KEY] = {
+            "rle": rle_encode(binary),
+            "area": int(ys.size),
+            "bbox": [int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())],
+        }
+
+    return {
+        "format": GEOMETRY_FORMAT,
+        "height": height,
+        "width": width,
+        "total_area": int(binary.sum()),
+        "classes": classes,
+    }
+
+
+def with_lesion_points(inference_result):
+    """
+    model1_inference_result 딕셔너리에 lesion_points를 복원해 붙인 사본을 반환
+    (?include_points=1 요청 시 사용, 이미 lesion_points가 있으면 그대로 둠)
+    """
+    if not inference_result or "lesion_points" in inference_result:
+        return inference_result
+    geometry = inference_result.get("lesion_geometry")
+    if not geometry:
+        return inference_result
+    result = dict(inference_result)
+    result["lesion_points"] = decode_lesion_points(geometry)
+    return result
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+import time
+
+from utils.metrics import LLM_FIRST_CHUNK_LATENCY, LLM_LATENCY
+
+# ✅ 챗봇 LLM 백엔드 (app.extensions['gemini_model']에 저장)
+#   - 라우트는 기존 Gemini 모델과 같은 방식으로 사용: backend.start_chat(history=...).send_message(msg).text
+#   - 스트리밍: chat.stream_message(msg) → 생성되는 대로 텍스트 조각(str)을 내주는 제너레이터
+#   - gemini : 첫 사용 시 SDK 설정, 모델 지원 여부는 백그라운드 스레드에서 검증 (서버 시작을 막지 않음)
+#   - stub   : 네트워크 없이 항상 같은 입력에 같은 답을 주는 로컬 백엔드 (부하 테스트 / 오프라인 실행용)
+
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+
+
+# ✅ send_message 응답 시간을 메트릭으로 기록하는 대화 래퍼 (그 외 속성은 원래 대화 객체로 위임)
+class TimedChat:
+    def __init__(self, chat, backend_name):
+        self._chat = chat
+        self._backend_name = backend_name
+
+    def send_message(self, message, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._chat.send_message(message, **kwargs)
+            outcome = "ok"
+            return response
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - start, backend=self._backend_name, outcome=outcome)
+
+    # ✅ 스트리밍 응답 (Gemini send_message(stream=True)), 클라이언트가 끊으면 제너레이터가 닫히며 중단
+    def stream_message(self, message, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        first = True
+        try:
+            for chunk in self._chat.send_message(message, stream=True, **kwargs):
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                if first:
+                    first = False
+                    LLM_FIRST_CHUNK_LATENCY.observe(time.perf_counter() - start, backend=self._backend_name)
+                yield text
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - start, backend=self._backend_name, outcome=outcome)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+# 안전 필터 등으로 텍스트가 없는 조각은 .text 접근 시 ValueError
+def _chunk_text(chunk):
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+class LLMBackend:
+    name = "base"
+
+    def start_chat(self, history=None):
+        return TimedChat(self._start_chat(history), self.name)
+
+    def _start_chat(self, history=None):
+        raise NotImplementedError
+
+    def validate_async(self):
+        pass
+
+    def status(self):
+        return {"backend": self.name, "state": OK, "error": None}
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key, model_name='models/gemini-2.5-flash'):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+        self._state = PENDING
+        self._error = None
+
+    # SDK import / configure는 처음 필요할 때 한 번만
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    if not self.api_key:
+                        raise ValueError("Gemini API 키가 없습니다. .env 확인")
+                    from google.generativeai import configure, GenerativeModel
+                    configure(api_key=self.api_key)
+                    self._model = GenerativeModel(self.model_name)
+        return self._model
+
+    def validate(self):
+        self._get_model()
+        from google.generativeai import list_models
+        if not any(m.name == self.model_name and 'generateContent' in m.supported_generation_methods
+                   for m in list_models()):
+            raise ValueError(f"모델 {self.model_name}은 generateContent 미지원")
+
+    # ✅ 모델 지원 여부 검증을 백그라운드에서 (실패해도 서버는 계속 동작, 상태로 노출)
+    def validate_async(self):
+        def _run():
+            try:
+                self.validate()
+                self._state, self._error = OK, None
+                print(f"✅ Gemini 모델 확인 완료: {self.model_name}")
+            except Exception as e:
+                self._state, self._error = FAILED, str(e)
+                print(f"❌ Gemini 모델 확인 실패: {e}")
+
+        thread = threading.Thread(target=_run, name="llm-validate", daemon=True)
+        thread.start()
+        return thread
+
+    def _start_chat(self, history=None):
+        return self._get_model().start_chat(history=history or [])
+
+    def status(self):
+        return {"backend": self.name, "model": self.model_name, "state": self._state, "error": self._error}
+
+
+# ✅ 로컬 스텁 백엔드 ==========================================
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubChat:
+    def __init__(self, backend, history=None):
+        self.backend = backend
+        self.history = list(history or [])
+
+    def send_message(self, message, stream=False):
+        # 대화 맥락 + 질문이 같으면 항상 같은 답
+        context = "".join(str(part) for turn in self.history for part in turn.get("parts", []))
+        digest = hashlib.sha256(f"{context}\n{message}".encode("utf-8")).hexdigest()[:8]
+        question = " ".join(str(message).split())[:40]
+        text = f"[stub:{digest}] '{question}'에 대한 테스트 응답입니다. 정확한 진단은 치과의사와 상담하세요."
+
+        self.history.append({"role": "user", "parts": [message]})
+        self.history.append({"role": "model", "parts": [text]})
+        if stream:
+            return self._stream(text)
+
+        if self.backend.latency:
+            time.sleep(self.backend.latency)
+        return StubResponse(text)
+
+    # ✅ 단어 단위 조각으로 나눠 전체 지연(LLM_STUB_LATENCY_MS)을 조각마다 나눠 기다림 (Gemini 스트리밍 흉내)
+    def _stream(self, text):
+        words = text.split(" ")
+        delay = self.backend.latency / len(words)
+        for i, word in enumerate(words):
+            if delay:
+                time.sleep(delay)
+            yield StubResponse(word if i == 0 else f" {word}")
+
+
+class StubBackend(LLMBackend):
+    name = "stub"
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+
+    def _start_chat(self, history=None):
+        return StubChat(self, history)
+
+
+# ✅ 설정값으로 백엔드 생성 (LLM_BACKEND=gemini | stub)
+def create_llm_backend(config):
+    backend_name = (config.get('LLM_BACKEND') or 'gemini').lower()
+
+    if backend_name == 'stub':
+        return StubBackend(latency_ms=float(config.get('LLM_STUB_LATENCY_MS') or 0))
+    if backend_name == 'gemini':
+        backend = GeminiBackend(config.get('GEMINI_API_KEY') or os.getenv("GEMINI_API_KEY"),
+                                model_name=config.get('GEMINI_MODEL_NAME') or 'models/gemini-2.5-flash')
+        if config.get('LLM_VALIDATE_ON_START', True):
+            backend.validate_async()
+        return backend
+
+    raise ValueError(f"지원하지 않는 LLM_BACKEND: {backend_name}")
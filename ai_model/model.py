@@ -3,16 +3,18 @@ import json
 import cv2
 import numpy as np
 from datetime import datetime
-from ultralytics import YOLO
+
+from ai_model.registry import registry
 
 # === [YOLO 모델 로딩] ==============================
+# import 시점이 아니라 첫 추론 요청 때 로드 (ultralytics import 포함)
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'best.pt')
-_model = None
 
-try:
-    _model = YOLO(MODEL_PATH)
-except Exception as e:
-    _model = None
+def load_model():
+    from ultralytics import YOLO
+    return YOLO(MODEL_PATH)
+
+registry.register("yolo", load_model, warm_on_start=False)
 
 # === [AI 추론 함수] =================================
 def perform_inference(image_path, processed_output_dir):
@@ -20,7 +22,9 @@ def perform_inference(image_path, processed_output_dir):
     주어진 이미지에 대해 YOLOv11-seg 추론을 수행하고,
     결과가 그려진 이미지를 저장하고 JSON 데이터를 반환합니다.
     """
-    if _model is None:
+    try:
+        _model = registry.get("yolo")
+    except Exception:
         return {
             "error": "AI 모델이 로드되지 않았습니다.",
             "prediction": "N/A",
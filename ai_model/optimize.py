@@ -0,0 +1,168 @@
+import glob
+import os
+
+import torch
+
+# ✅ CPU 추론 최적화 모드 (환경변수로 설정)
+#   INFERENCE_PRECISION      : fp32(기본) | bf16 (CPU autocast) | int8 (pt2e 정적 양자화, 보정 이미지 필요)
+#   INFERENCE_CHANNELS_LAST  : 1 이면 모델/입력을 channels_last 메모리 형식으로
+#   INFERENCE_COMPILE        : 1 이면 torch.compile (int8은 항상 compile)
+#   INFERENCE_CALIBRATION_DIR: int8 보정용 샘플 이미지 폴더 (없거나 비어 있으면 int8을 적용하지 않고 fp32 사용)
+# 모든 모드에서 forward는 torch.inference_mode로 실행됩니다.
+# 정확도 변화는 benchmarks/accuracy_check.py로 fp32 기준과 비교해 확인하세요.
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+# 모델 이름 → 실제 적용된 최적화 (실패 시 사유 포함)
+_applied = {}
+
+
+class InferenceOptions:
+    def __init__(self, precision="fp32", channels_last=False, compile=False, calibration_dir=None,
+                 random_calibration=False):
+        if precision not in PRECISIONS:
+            raise ValueError(f"지원하지 않는 INFERENCE_PRECISION: {precision} (가능: {', '.join(PRECISIONS)})")
+        self.precision = precision
+        self.channels_last = channels_last
+        self.compile = compile
+        self.calibration_dir = calibration_dir
+        # 무작위 입력 보정은 환경변수로 켤 수 없음 (벤치마크 --random-weights 처럼 코드에서 명시할 때만)
+        self.random_calibration = random_calibration
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            precision=os.getenv("INFERENCE_PRECISION", "fp32").lower(),
+            channels_last=os.getenv("INFERENCE_CHANNELS_LAST", "0") == "1",
+            compile=os.getenv("INFERENCE_COMPILE", "0") == "1",
+            calibration_dir=os.getenv("INFERENCE_CALIBRATION_DIR"),
+        )
+
+    def to_dict(self):
+        return {
+            "precision": self.precision,
+            "channels_last": self.channels_last,
+            "compile": self.compile,
+        }
+
+
+class OptimizedModel(torch.nn.Module):
+    """inference_mode / channels_last 입력 / bf16 autocast를 적용해 forward하는 래퍼 (출력은 항상 fp32)"""
+
+    def __init__(self, model, options):
+        super().__init__()
+        self.model = model
+        self.options = options
+
+    def forward(self, x):
+        with torch.inference_mode():
+            if self.options.channels_last:
+                x = x.contiguous(memory_format=torch.channels_last)
+            if self.options.precision == "bf16":
+                with torch.autocast("cpu", dtype=torch.bfloat16):
+                    return self.model(x).float()
+            return self.model(x)
+
+
+# ✅ int8 보정 입력: 샘플 이미지 폴더의 실제 이미지 사용
+#   이미지가 없으면 예외 → int8 대신 fp32로 동작 (임의의 scale로 진단이 바뀌지 않도록)
+#   allow_random=True 일 때만 무작위 입력으로 보정 (무작위 가중치 벤치마크 등 정확도와 무관한 경우)
+def calibration_inputs(calibration_dir=None, limit=32, size=(224, 224), allow_random=False):
+    if calibration_dir and os.path.isdir(calibration_dir):
+        from PIL import Image
+        from torchvision import transforms
+
+        transform = transforms.Compose([transforms.Resize(size), transforms.ToTensor()])
+        paths = sorted(
+            p for ext in ("png", "jpg", "jpeg") for p in glob.glob(os.path.join(calibration_dir, f"*.{ext}"))
+        )[:limit]
+        if paths:
+            return [transform(Image.open(p).convert("RGB")).unsqueeze(0) for p in paths]
+
+    if not allow_random:
+        raise RuntimeError(f"int8 보정 이미지 없음 (INFERENCE_CALIBRATION_DIR={calibration_dir!r})")
+    print("⚠️ int8 보정 이미지 없음: 무작위 입력으로 보정합니다 (random_calibration 설정)")
+    return [torch.rand(1, 3, *size) for _ in range(8)]
+
+
+def _quantize_int8(model, inputs):
+    """pt2e 정적 양자화 (X86 Inductor 양자화기) → 보정 → 변환 → compile"""
+    try:
+        from torch.ao.quantization.quantize_pt2e import prepare_pt2e, convert_pt2e
+        import torch.ao.quantization.quantizer.x86_inductor_quantizer as xiq
+    except ImportError:
+        from torchao.quantization.pt2e.quantize_pt2e import prepare_pt2e, convert_pt2e
+        import torchao.quantization.pt2e.quantizer.x86_inductor_quantizer as xiq
+
+    example = (inputs[0],)
+    export_fn = getattr(torch.export, "export_for_training", torch.export.export)
+    exported = export_fn(model, example).module()
+
+    quantizer = xiq.X86InductorQuantizer()
+    quantizer.set_global(xiq.get_default_x86_inductor_quantization_config())
+    prepared = prepare_pt2e(exported, quantizer)
+    with torch.no_grad():
+        for x in inputs:
+            prepared(x)
+    return torch.compile(convert_pt2e(prepared))
+
+
+# torch.compile은 첫 forward 때 실제로 컴파일하므로, 요청 처리 중이 아니라 여기서 더미 입력으로 한 번 실행해
+# 컴파일 오류를 드러냄 (실패하면 호출한 쪽에서 eager 모델 유지)
+def _compile_check(model, options, size):
+    OptimizedModel(model, options)(torch.zeros(1, 3, *size))
+
+
+# ✅ 모델에 최적화 적용 (실패한 단계는 건너뛰고 fp32 eager로 동작, 사유는 상태에 기록)
+def optimize_for_inference(model, name, options=None, example_size=(224, 224)):
+    options = options or InferenceOptions.from_env()
+    applied = {"requested": options.to_dict(), "precision": "fp32", "channels_last": False,
+               "compile": False, "error": None}
+    model.eval()
+
+    if options.precision == "int8":
+        try:
+            inputs = calibration_inputs(options.calibration_dir, size=example_size,
+                                        allow_random=options.random_calibration)
+            quantized = _quantize_int8(model, inputs)
+            _compile_check(quantized, InferenceOptions(), example_size)
+            model = quantized
+            applied["precision"] = "int8"
+            applied["compile"] = True
+        except Exception as e:
+            applied["error"] = f"int8 양자화 실패, fp32 사용: {e}"
+            print(f"⚠️ [{name}] {applied['error']}")
+    elif options.precision == "bf16":
+        applied["precision"] = "bf16"
+
+    if options.channels_last and applied["precision"] != "int8":
+        model = model.to(memory_format=torch.channels_last)
+        applied["channels_last"] = True
+
+    if options.compile and not applied["compile"]:
+        try:
+            compiled = torch.compile(model)
+            _compile_check(compiled, InferenceOptions(precision=applied["precision"],
+                                                      channels_last=applied["channels_last"]), example_size)
+            model = compiled
+            applied["compile"] = True
+        except Exception as e:
+            applied["error"] = f"torch.compile 실패: {e}"
+            print(f"⚠️ [{name}] {applied['error']}")
+
+    # 실제 적용된 설정 기준으로 래핑 (int8 실패 시 bf16/채널 변환도 요청과 다를 수 있음)
+    effective = InferenceOptions(
+        precision=applied["precision"] if applied["precision"] != "int8" else "fp32",
+        channels_last=applied["channels_last"],
+    )
+    _applied[name] = applied
+    return OptimizedModel(model, effective)
+
+
+# ✅ 다른 프로세스(INFERENCE_BACKEND=process 추론 워커)에서 적용된 최적화를 이 프로세스 상태에 기록
+def record_optimization_status(name, applied):
+    _applied[name] = applied
+
+
+def get_optimization_status():
+    return dict(_applied)
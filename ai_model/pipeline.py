@@ -0,0 +1,140 @@
+import contextvars
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from PIL import Image
+from torchvision import transforms
+
+from ai_model import predictor, hygiene_predictor, tooth_number_predictor
+from ai_model.batching import BATCHING_ENABLED, MAX_BATCH_SIZE
+from ai_model.optimize import get_optimization_status
+from ai_model.process_pool import process_backend_enabled, worker_count
+from ai_model.registry import registry
+from utils.timing import stage
+
+# ✅ 설정
+INPUT_SIZE = (224, 224)
+MODEL_COUNT = 3
+
+
+# ✅ 추론 스레드 수: 요청 1건 = 모델 3개 호출
+#    배치를 켜면 모델마다 최대 배치 크기만큼 호출이 동시에 스케줄러에 들어가야 실제로 묶이므로 3 x 최대 배치 크기
+#    프로세스 풀이면 모든 워커 프로세스가 일할 수 있도록 3 x 워커 수 (둘 다면 큰 쪽)
+#    INFERENCE_PIPELINE_WORKERS 로 직접 지정 가능
+def _default_workers():
+    concurrent_requests = MAX_BATCH_SIZE if BATCHING_ENABLED else 1
+    if process_backend_enabled():
+        concurrent_requests = max(concurrent_requests, worker_count())
+    return MODEL_COUNT * max(1, concurrent_requests)
+
+
+PIPELINE_WORKERS = int(os.getenv("INFERENCE_PIPELINE_WORKERS", "0")) or _default_workers()
+
+# ✅ 3개 모델이 동일하게 사용하는 전처리 (Resize + ToTensor)
+shared_transform = transforms.Compose([
+    transforms.Resize(INPUT_SIZE),
+    transforms.ToTensor(),
+])
+
+# 모델 3개를 동시에 돌리기 위한 공용 스레드 풀 (torch 연산은 GIL을 놓으므로 스레드로 병렬 실행됨)
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="inference")
+
+
+class PreprocessedImage:
+    """업로드 이미지 1장을 한 번만 디코딩/전처리한 결과 (모든 모델이 공유)"""
+
+    def __init__(self, pil_img: Image.Image):
+        self.image = pil_img
+        self.tensor = shared_transform(pil_img).unsqueeze(0)   # 1x3x224x224
+        self.resized = pil_img.resize(INPUT_SIZE)              # 오버레이 합성용
+
+
+class PipelineResult:
+    """3개 모델 추론 결과를 하나로 묶은 객체"""
+
+    def __init__(self, disease, hygiene, tooth):
+        self.disease = disease    # model1: 질병 (predictor.DiseaseResult)
+        self.hygiene = hygiene    # model2: 위생 (hygiene_predictor.HygieneResult)
+        self.tooth = tooth        # model3: 치아번호 (tooth_number_predictor.ToothNumberResult)
+
+
+# ✅ 모델별 작업 (각 스레드에서 실행: forward + 후처리 [+ 오버레이 저장])
+def _run_model(name, module, pre, save_path):
+    result = module.predict(pre.image, input_tensor=pre.tensor, resized_img=pre.resized)
+    with stage(f"postprocess.{name}"):
+        result.compute_views()
+    if save_path:
+        with stage(f"png_encode.{name}"):
+            overlay = result.overlay
+            # 오버레이는 업로드 파일명(확장자) 그대로 저장: JPEG는 알파 채널을 저장할 수 없으므로 RGB로
+            if overlay.mode == "RGBA" and os.path.splitext(save_path)[1].lower() in (".jpg", ".jpeg"):
+                overlay = overlay.convert("RGB")
+            overlay.save(save_path)
+    return result
+
+def _submit(*args):
+    # 요청 컨텍스트(단계별 시간 측정 등)를 워커 스레드로 전달
+    return _executor.submit(contextvars.copy_context().run, _run_model, *args)
+
+
+# ✅ 이미지 1회 전처리 → model1/2/3 동시 추론 → 결과 통합
+def run_all_models(pil_img, overlay_save_paths=None):
+    """
+    overlay_save_paths: (model1 경로, model2 경로, model3 경로), 없으면 오버레이를 만들지 않음
+                        (업로드는 마스크만 저장하고 오버레이는 조회 시 그림: services/overlay.py)
+    전체 지연 시간이 세 모델 forward 합이 아니라 가장 느린 모델 기준이 되도록 병렬 실행합니다.
+    """
+    with stage("preprocess"):
+        pre = PreprocessedImage(pil_img)
+    path_1, path_2, path_3 = overlay_save_paths or (None, None, None)
+
+    future_1 = _submit("model1", predictor, pre, path_1)
+    future_2 = _submit("model2", hygiene_predictor, pre, path_2)
+    future_3 = _submit("model3", tooth_number_predictor, pre, path_3)
+
+    # 하나라도 실패하면 예외가 그대로 전달됨
+    return PipelineResult(future_1.result(), future_2.result(), future_3.result())
+
+
+# ✅ 가중치 지문: 가중치 파일 내용(SHA-256) + 입력 크기 (프로세스당 1회 계산)
+@lru_cache(maxsize=1)
+def weights_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f"input={INPUT_SIZE}".encode())
+    for name, path in (("model1", predictor.model_path),
+                       ("model2", hygiene_predictor.MODEL_PATH),
+                       ("model3", tooth_number_predictor.MODEL_PATH)):
+        digest.update(f"|{name}:".encode())
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+# ✅ 모델별로 실제 적용된 추론 최적화 (요청한 설정이 아니라 fp32 폴백 등 결과 기준)
+#    load=True 이면 아직 로드되지 않은 모델을 먼저 로드 (어차피 추론에 필요, 적용 결과는 로드해야 알 수 있음)
+def applied_optimization(load=True):
+    applied = {}
+    for name in ("model1", "model2", "model3"):
+        status = get_optimization_status().get(name)
+        if status is None and load:
+            registry.get(name)
+            status = get_optimization_status().get(name)
+        applied[name] = {key: status.get(key) for key in ("precision", "channels_last", "compile")} \
+            if status is not None else None
+    return applied
+
+
+# ✅ 모델 버전 지문: 가중치 지문 + 실제 적용된 추론 최적화
+#    결과 캐시 키에 포함되어 가중치 / 적용 결과가 바뀌면 이전 결과를 쓰지 않음
+#    (int8 / compile이 fp32로 폴백한 프로세스의 결과가 실제 int8 결과와 같은 키로 섞이지 않음)
+def model_fingerprint(load=True):
+    digest = hashlib.sha256(weights_fingerprint().encode())
+    digest.update(json.dumps(applied_optimization(load), sort_keys=True).encode())
+    return digest.hexdigest()[:16]
@@ -0,0 +1,76 @@
+import numpy as np
+from PIL import Image
+
+# ✅ 모든 세그멘테이션 모델이 공유하는 벡터화 후처리 유틸
+#   - 팔레트 LUT 컬러링 (클래스 수만큼 전체 이미지를 도는 루프 제거)
+#   - bincount 기반 클래스별 픽셀 수 / 평균 confidence
+#   - numpy 알파 블렌딩 / RGBA 합성
+
+
+def build_palette_lut(palette):
+    """{class_id: (R, G, B[, A])} → (max_class_id + 1) x 채널 uint8 룩업 테이블"""
+    num_classes = max(palette) + 1
+    channels = len(next(iter(palette.values())))
+    lut = np.zeros((num_classes, channels), dtype=np.uint8)
+    for class_id, color in palette.items():
+        lut[class_id] = color
+    return lut
+
+
+def colorize(pred, lut):
+    """클래스 ID 마스크(H x W) → 컬러 마스크(H x W x 채널), 이미지 1회 인덱싱"""
+    return lut[pred]
+
+
+def pixel_confidences(pred, probs):
+    """각 픽셀의 예측 클래스 확률 (H x W). probs: C x H x W"""
+    return np.take_along_axis(probs, pred[np.newaxis].astype(np.intp), axis=0)[0]
+
+
+def class_pixel_stats(pred, probs, num_classes=None):
+    """
+    클래스별 픽셀 수와 (해당 클래스로 예측된 픽셀의) 평균 confidence
+    반환: (counts, mean_confidences) — 길이 num_classes 배열, 픽셀이 없는 클래스는 0
+    """
+    num_classes = num_classes or probs.shape[0]
+    flat_pred = pred.ravel()
+    counts = np.bincount(flat_pred, minlength=num_classes)
+    sums = np.bincount(flat_pred, weights=pixel_confidences(pred, probs).ravel(), minlength=num_classes)
+    means = np.divide(sums, counts, out=np.zeros(num_classes, dtype=np.float64), where=counts > 0)
+    return counts, means
+
+
+def main_class(pred, probs):
+    """배경(0) 제외, 평균 confidence가 가장 높은 클래스 (class_id, confidence). 없으면 (-1, 0.0)"""
+    counts, means = class_pixel_stats(pred, probs)
+    means = np.where(counts > 0, means, 0.0)
+    means[0] = 0.0
+    best_class = int(np.argmax(means))
+    best_conf = float(means[best_class])
+    if best_conf <= 0.0:
+        return -1, 0.0
+    return best_class, best_conf
+
+
+def foreground_confidence(pred, probs):
+    """배경이 아닌 모든 픽셀의 예측 클래스 확률 평균 (없으면 0.0)"""
+    lesion = pred > 0
+    if not lesion.any():
+        return 0.0
+    return float(pixel_confidences(pred, probs)[lesion].mean())
+
+
+def alpha_blend(base, overlay, alpha):
+    """Image.blend와 동일: base + alpha * (overlay - base)를 float32로 계산 후 버림 (uint8 H x W x C)"""
+    base = base.astype(np.float32)
+    out = base + np.float32(alpha) * (overlay.astype(np.float32) - base)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def alpha_composite(base_rgb, overlay_rgba):
+    """
+    불투명 원본(RGB) 위에 RGBA 마스크를 합성 → RGBA 배열.
+    RGBA 합성은 PIL C 구현이 numpy보다 빠르므로(벤치마크 참고) Image.alpha_composite를 사용합니다.
+    """
+    base = Image.fromarray(base_rgb[..., :3]).convert("RGBA")
+    return np.asarray(Image.alpha_composite(base, Image.fromarray(overlay_rgba)))
@@ -6,6 +6,16 @@ import numpy as np
 import segmentation_models_pytorch as smp
 import matplotlib.pyplot as plt
 from typing import Tuple, List
+from functools import cached_property
+
+from ai_model.batching import make_forward
+from ai_model.lesion_geometry import encode_lesion_mask
+from ai_model.postprocess import build_palette_lut, colorize, alpha_blend, foreground_confidence
+from ai_model.optimize import optimize_for_inference
+from ai_model.process_pool import pooled_loader
+from ai_model.registry import registry, warmup_segmentation_model
+from ai_model.segmentation_result import SegmentationResult
+from utils.timing import stage
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -23,16 +33,32 @@ DISEASE_CLASS_MAP = {
 }
 
 n_labels = 10
-model = smp.UnetPlusPlus(
-    encoder_name='efficientnet-b7',
-    encoder_weights='imagenet',
-    classes=n_labels,
-    activation=None
-)
 model_path = os.path.join(os.path.dirname(__file__), 'disease_model_saved_weight.pt')
-model.load_state_dict(torch.load(model_path, map_location=device))
-model.to(device)
-model.eval()
+
+# ✅ 모델 정의 및 로드 (레지스트리가 첫 사용 시 또는 워밍업 스레드에서 호출)
+#    저장된 가중치로 덮어쓰므로 ImageNet 사전학습 가중치는 받지 않음
+def build_model(load_weights=True):
+    model = smp.UnetPlusPlus(
+        encoder_name='efficientnet-b7',
+        encoder_weights=None,
+        classes=n_labels,
+        activation=None
+    )
+    if load_weights:
+        model.load_state_dict(torch.load(model_path, map_location=device))
+    model.to(device)
+    model.eval()
+    return model
+
+# ✅ 레지스트리용 로더: fp32 모델 + 설정된 CPU 최적화 (ai_model/optimize.py)
+def load_model():
+    return optimize_for_inference(build_model(), "model1")
+
+# INFERENCE_BACKEND=process 이면 워커 프로세스에서 로드 (ai_model/process_pool.py)
+registry.register("model1", pooled_loader("model1", load_model), warmup=warmup_segmentation_model)
+
+# ✅ forward 호출 (INFERENCE_BATCHING=1 이면 요청 간 마이크로 배치 스케줄러 경유)
+forward = make_forward("model1", registry.lazy("model1"))
 
 BACKEND_MODEL_NAME = os.path.basename(model_path)
 
@@ -53,52 +79,82 @@ PALETTE = {
     8: (128, 0, 128),
     9: (128, 128, 128),
 }
-
-def predict_overlayed_image(pil_img: Image.Image) -> Tuple[Image.Image, List[List[int]], float, str, str]:
-    original_img_resized = pil_img.resize((224, 224)).convert('RGB')
-    input_tensor = transform(pil_img).unsqueeze(0).to(device)
-
-    with torch.no_grad():
-        output_logits = model(input_tensor)[0].cpu().numpy()
-        probabilities = torch.softmax(torch.from_numpy(output_logits), dim=0).numpy()
-        pred_mask = np.argmax(output_logits, axis=0)
-
-    color_mask = np.zeros((224, 224, 3), dtype=np.uint8)
-    for class_id, color in PALETTE.items():
-        color_mask[pred_mask == class_id] = color
-    color_mask_img = Image.fromarray(color_mask)
-
-    overlay = Image.blend(original_img_resized, color_mask_img, alpha=0.78)
-
-    lesion_coords = np.column_stack(np.where(pred_mask > 0))
-    lesion_points = lesion_coords.tolist()
-
-    backend_model_confidence = 0.0
-    if lesion_coords.shape[0] > 0:
-        lesion_pixel_confidences = [
-            probabilities[pred_mask[y, x], y, x]
-            for y, x in lesion_coords
-            if pred_mask[y, x] > 0
-        ]
-        if lesion_pixel_confidences:
-            backend_model_confidence = np.mean(lesion_pixel_confidences)
-
-    lesion_labels = pred_mask[pred_mask > 0]
-    if len(lesion_labels) > 0:
-        most_common_class = np.bincount(lesion_labels).argmax()
-        main_class_label = DISEASE_CLASS_MAP.get(most_common_class, "알 수 없음")
-    else:
-        main_class_label = "감지되지 않음"
+PALETTE_LUT = build_palette_lut(PALETTE)
+
+# ✅ 질병 모델 오버레이: RGB 팔레트를 alpha=0.78로 블렌딩 (저장된 마스크로 다시 그릴 때도 사용)
+def render_overlay(pred, resized_img):
+    if resized_img.size != (224, 224):
+        resized_img = resized_img.resize((224, 224))
+    base = np.asarray(resized_img.convert('RGB'))
+    return Image.fromarray(alpha_blend(base, colorize(pred, PALETTE_LUT), alpha=0.78))
+
+# ✅ 모델 1회 실행 → 결과 객체 (마스크/오버레이/병변 요약은 지연 계산)
+class DiseaseResult(SegmentationResult):
+    @cached_property
+    def overlay(self):
+        return render_overlay(self.pred, self._resized_img if self._resized_img is not None else self.image)
+
+    # 병변(배경 제외) 픽셀 전체의 평균 확률
+    @cached_property
+    def confidence(self):
+        return foreground_confidence(self.pred, self.output_np)
+
+    # 병변 픽셀 중 가장 많은 클래스의 라벨
+    @cached_property
+    def label(self):
+        lesion_labels = self.pred[self.pred > 0]
+        if len(lesion_labels) > 0:
+            most_common_class = np.bincount(lesion_labels).argmax()
+            return DISEASE_CLASS_MAP.get(most_common_class, "알 수 없음")
+        return "감지되지 않음"
+
+    # 클래스별 RLE / 면적 / bbox (MongoDB 저장용 압축 표현)
+    @cached_property
+    def lesion_geometry(self):
+        return encode_lesion_mask(self.pred)
+
+    # 전체 병변 픽셀 목록 [[y, x], ...] (요청 시에만 사용)
+    @property
+    def lesion_points(self):
+        return np.column_stack(np.where(self.pred > 0)).tolist()
+
+    @property
+    def model_name(self):
+        return BACKEND_MODEL_NAME
+
+    def compute_views(self):
+        self.confidence
+        self.label
+        self.lesion_geometry
+        return self
+
+def predict(pil_img: Image.Image, input_tensor: torch.Tensor = None,
+            resized_img: Image.Image = None) -> DiseaseResult:
+    # ✅ 파이프라인에서 공유 전처리 결과(input_tensor, resized_img)를 넘기면 재계산하지 않음
+    if input_tensor is None:
+        input_tensor = transform(pil_img).unsqueeze(0)
+    input_tensor = input_tensor.to(device)
+
+    with torch.no_grad(), stage("forward.model1"):
+        output_logits = forward(input_tensor)
+        probabilities = torch.softmax(output_logits, dim=1)
+
+    return DiseaseResult(probabilities, pil_img, PALETTE_LUT, resized_img=resized_img)
+
+def predict_overlayed_image(pil_img: Image.Image, input_tensor: torch.Tensor = None,
+                            resized_img: Image.Image = None) -> Tuple[Image.Image, List[List[int]], float, str, str]:
+    result = predict(pil_img, input_tensor=input_tensor, resized_img=resized_img)
+    overlay = result.overlay
 
     if os.environ.get("FLASK_DEBUG") == "1":
         plt.figure(figsize=(10, 5))
         plt.subplot(1, 3, 1)
-        plt.imshow(original_img_resized)
+        plt.imshow(result.image.resize((224, 224)).convert('RGB'))
         plt.title("Original")
         plt.axis("off")
 
         plt.subplot(1, 3, 2)
-        plt.imshow(color_mask_img)
+        plt.imshow(Image.fromarray(colorize(result.pred, PALETTE_LUT)))
         plt.title("Predicted Mask")
         plt.axis("off")
 
@@ -109,4 +165,4 @@ def predict_overlayed_image(pil_img: Image.Image) -> Tuple[Image.Image, List[Lis
         plt.tight_layout()
         plt.show()
 
-    return overlay, lesion_points, float(backend_model_confidence), BACKEND_MODEL_NAME, main_class_label
+    return overlay, result.lesion_points, float(result.confidence), BACKEND_MODEL_NAME, result.label
@@ -0,0 +1,388 @@
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+import torch
+
+from ai_model.optimize import record_optimization_status
+
+# ✅ 프로세스 풀 추론 백엔드 (INFERENCE_BACKEND=process)
+#   - 워커 프로세스마다 CPU 코어 일부를 고정(sched_setaffinity)하고 세그멘테이션 모델을 따로 로드
+#   - 요청 스레드는 전처리된 입력 텐서를 공유 메모리(multiprocessing.shared_memory)에 쓰고,
+#     워커는 같은 방식으로 출력(logits)을 돌려줌 → 큐로는 슬롯 이름 / shape 같은 메타데이터만 전달 (텐서 pickle 없음)
+#   - 결과는 워커마다 따로 쓰는 파이프로 받음 (한 워커가 전송 중 죽어도 다른 워커 / 재시작한 워커의 응답은 막히지 않음)
+#   - 공유 메모리 슬롯은 요청 사이에 재사용 (크기가 부족할 때만 다시 만듦)
+#   INFERENCE_PROCESS_WORKERS      : 워커 프로세스 수 (0이면 사용 가능 코어 수 / 워커당 스레드 수)
+#   INFERENCE_THREADS_PER_WORKER   : 워커당 torch intra-op 스레드 수 (= 고정 코어 수)
+#   INFERENCE_RESULT_TIMEOUT       : 요청 1건 결과를 기다리는 최대 시간(초), 모델 로드는 INFERENCE_LOAD_TIMEOUT
+
+BACKEND = os.getenv("INFERENCE_BACKEND", "thread").lower()
+PROCESS_WORKERS = int(os.getenv("INFERENCE_PROCESS_WORKERS", "0"))
+THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "2"))
+RESULT_TIMEOUT = float(os.getenv("INFERENCE_RESULT_TIMEOUT", "120"))
+LOAD_TIMEOUT = float(os.getenv("INFERENCE_LOAD_TIMEOUT", "600"))
+
+WORKER_NAME_PREFIX = "inference-worker"
+FLOAT_BYTES = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+_initializer = None
+
+
+def in_worker():
+    return mp.current_process().name.startswith(WORKER_NAME_PREFIX)
+
+
+def process_backend_enabled():
+    return BACKEND == "process" and not in_worker()
+
+
+# ✅ 워커 프로세스에서 모델 로드 전에 실행할 함수 (모듈 최상위 함수, 벤치마크의 무작위 가중치 등)
+def set_worker_initializer(initializer):
+    global _initializer
+    _initializer = initializer
+
+
+# ✅ 워커 프로세스 수 (INFERENCE_PROCESS_WORKERS=0 이면 사용 가능 코어 수 / 워커당 스레드 수)
+def available_cores():
+    return sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+
+
+def worker_count(workers=PROCESS_WORKERS, threads_per_worker=THREADS_PER_WORKER):
+    return workers or max(1, len(available_cores()) // max(1, threads_per_worker))
+
+
+def _attach(name):
+    """워커 쪽 공유 메모리 연결 (생성/해제는 부모 프로세스가 관리)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 이하: spawn 워커는 부모와 같은 resource_tracker를 쓰므로 중복 등록은 무시됨
+        return shared_memory.SharedMemory(name=name)
+
+
+def _as_array(shm, shape):
+    return np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+
+
+# ✅ 워커 프로세스 본체 ======================================================
+def _worker_main(cores, threads, initializer, requests, results):
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    if initializer is not None:
+        initializer()
+
+    # 모델 등록 (레지스트리 로더는 워커 안에서는 로컬 모델을 만듦)
+    from ai_model import predictor, hygiene_predictor, tooth_number_predictor  # noqa: F401
+    from ai_model.optimize import get_optimization_status
+    from ai_model.registry import registry
+
+    attached = {}
+    reported = set()    # 적용된 최적화 상태를 이미 부모에게 보낸 모델
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, name, in_name, in_shape, out_name, out_capacity = message
+        try:
+            model = registry.get(name)
+            for shm_name in (in_name, out_name):
+                if shm_name not in attached:
+                    if len(attached) > 64:
+                        for shm in attached.values():
+                            shm.close()
+                        attached.clear()
+                    attached[shm_name] = _attach(shm_name)
+
+            x = torch.from_numpy(_as_array(attached[in_name], in_shape))
+            with torch.no_grad():
+                output = model(x).float()
+            out_shape = tuple(output.shape)
+            if output.numel() * FLOAT_BYTES > out_capacity:
+                raise RuntimeError(f"출력 버퍼 부족: {out_shape}")
+            _as_array(attached[out_name], out_shape)[...] = output.numpy()
+
+            # 모델을 로드한 뒤 첫 응답에만 실제 적용된 최적화(precision / compile / 오류)를 함께 보냄
+            applied = None
+            if name not in reported:
+                applied = get_optimization_status().get(name)
+                reported.add(name)
+            results.send((request_id, None, out_shape, applied))
+        except Exception as e:
+            results.send((request_id, f"{type(e).__name__}: {e}", None, None))
+
+
+# ✅ 부모 프로세스 쪽 ========================================================
+class _Slot:
+    """요청 1건이 쓰는 입력 / 출력 공유 메모리 한 쌍 (요청 사이에 재사용)"""
+
+    def __init__(self):
+        self.input = None
+        self.output = None
+
+    @staticmethod
+    def _ensure(shm, nbytes):
+        if shm is not None and shm.size >= nbytes:
+            return shm
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        return shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+
+    def reserve(self, in_bytes, out_bytes):
+        self.input = self._ensure(self.input, in_bytes)
+        self.output = self._ensure(self.output, out_bytes)
+
+    def release(self):
+        for shm in (self.input, self.output):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self.input = self.output = None
+
+
+class _Worker:
+    def __init__(self, index, cores):
+        self.index = index
+        self.cores = cores
+        self.process = None
+        self.requests = None
+        self.results = None     # 결과 파이프 (부모 쪽 읽기 끝)
+        self.in_flight = {}     # request_id → (Future, slot, 모델 이름)
+        self.optimization = {}  # 모델 이름 → 워커에서 실제 적용된 최적화
+
+
+class InferenceProcessPool:
+    def __init__(self, workers=PROCESS_WORKERS, threads_per_worker=THREADS_PER_WORKER, initializer=None):
+        available = available_cores()
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.num_workers = worker_count(workers, self.threads_per_worker)
+        self.initializer = initializer
+
+        self._ctx = mp.get_context("spawn")     # torch 스레드 풀과 fork는 같이 쓰지 않음
+        self._workers = []
+        for i in range(self.num_workers):
+            cores = [available[(i * self.threads_per_worker + j) % len(available)]
+                     for j in range(self.threads_per_worker)]
+            self._workers.append(_Worker(i, cores))
+
+        self._lock = threading.Lock()
+        self._free_slots = []
+        self._ids = itertools.count()
+        self._output_channels = {}
+        self._completed = 0
+        self._restarts = 0
+        self._closed = False
+
+        for worker in self._workers:
+            self._start_worker(worker)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="inference-pool-results", daemon=True)
+        self._dispatcher.start()
+
+    def _start_worker(self, worker):
+        if worker.results is not None:
+            worker.results.close()
+        worker.requests = self._ctx.Queue()
+        worker.results, results_writer = self._ctx.Pipe(duplex=False)
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.cores, self.threads_per_worker, self.initializer, worker.requests, results_writer),
+            name=f"{WORKER_NAME_PREFIX}-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        results_writer.close()      # 쓰기 끝은 워커만 가짐 → 워커가 죽으면 읽기 쪽에서 EOF
+        print(f"✅ 추론 워커 시작: #{worker.index} (pid {worker.process.pid}, 코어 {worker.cores})")
+
+    def _acquire_slot(self):
+        with self._lock:
+            return self._free_slots.pop() if self._free_slots else _Slot()
+
+    # ✅ 입력 텐서를 공유 메모리에 쓰고 가장 한가한 워커에 전달 → Future (출력 텐서)
+    def submit(self, name, input_tensor, worker=None):
+        if self._closed:
+            raise RuntimeError("추론 프로세스 풀이 종료되었습니다.")
+        x = input_tensor.detach().to("cpu", torch.float32).contiguous()
+        in_shape = tuple(x.shape)
+        channels = self._output_channels.get(name, 64)
+        out_bytes = in_shape[0] * channels * in_shape[2] * in_shape[3] * FLOAT_BYTES
+
+        slot = self._acquire_slot()
+        slot.reserve(x.numel() * FLOAT_BYTES, out_bytes)
+        _as_array(slot.input, in_shape)[...] = x.numpy()
+
+        future = Future()
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                request_id = next(self._ids)
+                worker = worker or min(self._workers, key=lambda w: len(w.in_flight))
+                worker.in_flight[request_id] = (future, slot, name)
+                # 등록과 전송을 같은 잠금 안에서: 워커 재시작(_check_workers)과 겹쳐도
+                # 죽은 프로세스의 예전 큐로 보내고 응답을 영영 못 받는 요청이 생기지 않음
+                worker.requests.put((request_id, name, slot.input.name, in_shape,
+                                     slot.output.name, slot.output.size))
+        if closed:
+            # 슬롯을 채우는 사이 종료됨: 공유 메모리를 남기지 않도록 해제
+            slot.release()
+            raise RuntimeError("추론 프로세스 풀이 종료되었습니다.")
+        return future
+
+    @staticmethod
+    def _wait(future, name, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise RuntimeError(f"추론 워커 응답 시간 초과 ({name}, {timeout}초)") from None
+
+    def forward(self, name, input_tensor):
+        return self._wait(self.submit(name, input_tensor), name, RESULT_TIMEOUT)
+
+    # ✅ 모든 워커에 모델 로드 + 더미 forward (출력 채널 수도 여기서 확인)
+    def load(self, name, size=(224, 224)):
+        dummy = torch.zeros(1, 3, *size)
+        futures = [self.submit(name, dummy, worker=w) for w in self._workers]
+        output = [self._wait(f, name, LOAD_TIMEOUT) for f in futures][0]
+        self._output_channels[name] = output.shape[1]
+        return RemoteModel(self, name)
+
+    def _dispatch(self):
+        while not self._closed:
+            # 결과가 계속 들어오는 중에도 죽은 워커를 감지하도록 매 반복마다 확인
+            self._check_workers()
+            with self._lock:
+                readers = {worker.results: worker for worker in self._workers}
+            try:
+                ready = connection.wait(list(readers), timeout=1.0)
+            except OSError:
+                continue
+            for reader in ready:
+                try:
+                    message = reader.recv()
+                except (EOFError, OSError):
+                    # 워커 종료: 프로세스 정리를 잠깐 기다린 뒤 다음 _check_workers에서 재시작
+                    readers[reader].process.join(timeout=1.0)
+                    continue
+                self._complete(readers[reader], *message)
+
+    def _complete(self, worker, request_id, error, out_shape, applied):
+        with self._lock:
+            entry = worker.in_flight.pop(request_id, None)
+        if entry is None:
+            return
+        future, slot, name = entry
+
+        if applied is not None:
+            # 워커에서 적용된 최적화를 부모 프로세스 상태(/api/inference-stats)에 기록
+            worker.optimization[name] = applied
+            record_optimization_status(name, applied)
+
+        if error is None:
+            # 공유 메모리 → 요청 스레드 소유 텐서로 한 번 복사 후 슬롯 반납
+            output = torch.from_numpy(_as_array(slot.output, out_shape).copy())
+            self._output_channels[name] = out_shape[1]
+            future.set_result(output)
+        else:
+            future.set_exception(RuntimeError(f"추론 워커 오류 ({name}): {error}"))
+
+        with self._lock:
+            self._completed += 1
+            self._free_slots.append(slot)
+
+    # ✅ 죽은 워커 감지: 처리 중이던 요청은 실패 처리하고 워커 재시작 (모델은 다음 요청 때 다시 로드)
+    def _check_workers(self):
+        for worker in self._workers:
+            if self._closed or worker.process.is_alive():
+                continue
+            # 처리 중 요청 정리와 새 큐 / 프로세스 교체를 한 번에 (submit은 같은 잠금 안에서 전송)
+            with self._lock:
+                lost = list(worker.in_flight.values())
+                worker.in_flight.clear()
+                self._restarts += 1
+                print(f"❌ 추론 워커 #{worker.index} 종료됨 (exit {worker.process.exitcode}), 재시작")
+                self._start_worker(worker)
+            for future, slot, name in lost:
+                future.set_exception(RuntimeError(f"추론 워커가 종료되었습니다 ({name})"))
+                slot.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "threads_per_worker": self.threads_per_worker,
+                "completed": self._completed,
+                "restarts": self._restarts,
+                "free_slots": len(self._free_slots),
+                "processes": [
+                    {"index": w.index, "pid": w.process.pid, "alive": w.process.is_alive(),
+                     "cores": w.cores, "in_flight": len(w.in_flight), "optimization": dict(w.optimization)}
+                    for w in self._workers
+                ],
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            worker.requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            lost = [entry for worker in self._workers for entry in worker.in_flight.values()]
+            for worker in self._workers:
+                worker.in_flight.clear()
+            for slot in self._free_slots:
+                slot.release()
+            self._free_slots.clear()
+        for future, slot, name in lost:
+            future.set_exception(RuntimeError(f"추론 프로세스 풀이 종료되었습니다 ({name})"))
+            slot.release()
+
+
+class RemoteModel:
+    """레지스트리에 등록되는 프로세스 풀 모델 (model(x)처럼 호출)"""
+
+    def __init__(self, pool, name):
+        self.pool = pool
+        self.name = name
+
+    def __call__(self, input_tensor):
+        return self.pool.forward(self.name, input_tensor)
+
+    def parameters(self):
+        # warmup_segmentation_model이 장치를 확인할 때 사용 (워커 쪽 모델은 CPU)
+        return iter(())
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InferenceProcessPool(initializer=_initializer)
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+# ✅ 레지스트리 로더 선택: process 백엔드면 워커 프로세스에 모델을 로드하고 원격 호출 객체 반환
+def pooled_loader(name, loader):
+    if not process_backend_enabled():
+        return loader
+    return lambda: get_pool().load(name)
+
+
+def get_pool_stats():
+    if _pool is None:
+        return {"backend": BACKEND}
+    return {"backend": BACKEND, **_pool.stats()}
@@ -0,0 +1,128 @@
+import threading
+import time
+
+# ✅ 모델 레지스트리
+#   - import 시점에는 모델을 만들지 않고, 처음 사용할 때 또는 백그라운드 워밍업 스레드에서 로드
+#   - 모델별 준비 상태(registered / loading / ready / failed)를 조회 가능
+#   - 사전학습 인코더 가중치는 받지 않음 (각 loader가 encoder_weights=None으로 생성 후 저장된 가중치만 로드)
+
+REGISTERED = "registered"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._warmups = {}
+        self._models = {}
+        self._locks = {}
+        self._state = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._warmup_thread = None
+        self._lock = threading.Lock()
+
+    # ✅ loader: 인자 없이 모델을 만들어 반환하는 함수 / warmup: 로드 직후 1회 실행할 함수(선택)
+    def register(self, name, loader, warmup=None, warm_on_start=True):
+        with self._lock:
+            self._loaders[name] = loader
+            self._warmups[name] = (warmup, warm_on_start)
+            self._locks[name] = threading.Lock()
+            self._state[name] = REGISTERED
+
+    # ✅ 모델 반환 (아직 없으면 이 스레드에서 로드, 동시에 요청해도 한 번만 로드)
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            self._state[name] = LOADING
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+                warmup, _ = self._warmups[name]
+                if warmup is not None:
+                    warmup(model)
+            except Exception as e:
+                self._state[name] = FAILED
+                self._errors[name] = str(e)
+                print(f"❌ 모델 로드 실패 ({name}): {e}")
+                raise
+
+            self._load_seconds[name] = round(time.perf_counter() - start, 2)
+            self._errors.pop(name, None)
+            self._models[name] = model
+            self._state[name] = READY
+            print(f"✅ 모델 로드 완료 ({name}): {self._load_seconds[name]}초")
+            return model
+
+    # ✅ model(x)처럼 호출하면 레지스트리에서 모델을 꺼내 실행하는 객체
+    def lazy(self, name):
+        return LazyModel(self, name)
+
+    # ✅ 백그라운드 스레드에서 모델 미리 로드
+    def warm_up(self, names=None, background=True):
+        if names is None:
+            names = [name for name, (_, on_start) in self._warmups.items() if on_start]
+
+        def _run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # 상태는 FAILED로 남고, 다음 요청에서 다시 로드 시도
+
+        if not background:
+            _run()
+            return None
+
+        with self._lock:
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                self._warmup_thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def is_ready(self, names=None):
+        names = names or [name for name, (_, on_start) in self._warmups.items() if on_start]
+        return all(self._state.get(name) == READY for name in names)
+
+    def status(self):
+        return {
+            name: {
+                "state": self._state[name],
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+
+class LazyModel:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        return self.registry.get(self.name)(*args, **kwargs)
+
+
+# ✅ 세그멘테이션 모델 워밍업: 더미 입력으로 forward 1회 (첫 요청의 초기화 지연 제거)
+def warmup_segmentation_model(model, size=(224, 224)):
+    import torch
+
+    # 양자화된 모델은 파라미터가 없을 수 있으므로 기본값은 CPU
+    device = next(model.parameters(), torch.empty(0)).device
+    with torch.no_grad():
+        model(torch.zeros(1, 3, *size, device=device))
+
+
+# 프로세스 전역 레지스트리
+registry = ModelRegistry()
+
@@ -0,0 +1,70 @@
+from functools import cached_property
+
+import torch
+from PIL import Image
+
+from ai_model.postprocess import colorize, main_class as find_main_class
+
+
+class SegmentationResult:
+    """
+    세그멘테이션 모델 forward 1회 결과(softmax 확률)를 캐시하는 객체.
+    argmax 마스크 / 컬러 마스크 / 오버레이 / 주요 클래스 요약은 처음 접근할 때 한 번만 계산합니다.
+    """
+
+    def __init__(self, output, pil_img, palette_lut, resized_img=None):
+        self.output = output                    # softmax 확률 (1 x C x H x W)
+        self.image = pil_img
+        self._palette_lut = palette_lut         # 모듈별 팔레트 LUT (postprocess.build_palette_lut)
+        self._resized_img = resized_img         # 파이프라인에서 공유하는 리사이즈 원본 (선택)
+
+    # ✅ 클래스별 확률 (C x H x W)
+    @cached_property
+    def output_np(self):
+        return self.output.squeeze(0).cpu().numpy()
+
+    # ✅ 픽셀별 클래스 ID (H x W)
+    @cached_property
+    def pred(self):
+        return torch.argmax(self.output.squeeze(0), dim=0).cpu().numpy()
+
+    # ✅ RGBA 컬러 마스크
+    @cached_property
+    def mask_image(self):
+        return Image.fromarray(colorize(self.pred, self._palette_lut))
+
+    # ✅ 원본 위에 마스크를 합성한 이미지 (저장 / 요청 시에만 계산)
+    @cached_property
+    def overlay(self):
+        mask_img = self.mask_image
+        resized_img = self._resized_img
+        if resized_img is None or resized_img.size != mask_img.size:
+            resized_img = self.image.resize(mask_img.size)
+        return Image.alpha_composite(resized_img.convert("RGBA"), mask_img)
+
+    # ✅ 배경 제외 평균 confidence가 가장 높은 클래스 (class_id, confidence)
+    @cached_property
+    def main_class(self):
+        return find_main_class(self.pred, self.output_np)
+
+    @property
+    def class_id(self):
+        return self.main_class[0]
+
+    @property
+    def confidence(self):
+        return self.main_class[1]
+
+    # ✅ DB 저장 / 응답에 필요한 값을 미리 계산 (파이프라인 워커 스레드에서 호출, 오버레이는 제외)
+    def compute_views(self):
+        self.pred
+        self.main_class
+        return self
+
+
+# ✅ 리사이즈 원본 + 클래스 마스크 → RGBA 팔레트 합성 오버레이 (저장된 마스크로 다시 그릴 때 사용)
+def composite_overlay(pred, resized_img, palette_lut):
+    mask_img = Image.fromarray(colorize(pred, palette_lut))
+    if resized_img.size != mask_img.size:
+        resized_img = resized_img.resize(mask_img.size)
+    return Image.alpha_composite(resized_img.convert("RGBA"), mask_img)
@@ -4,7 +4,6 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from config import DevelopmentConfig
 from models.model import db, MongoDBClient
-from google.generativeai import configure, GenerativeModel, list_models
 from dotenv import load_dotenv
 
 # Blueprint 라우트 임포트
@@ -16,65 +15,131 @@ from routes.static_routes import static_bp
 from routes.application_routes import application_bp
 from routes.consult_routes import consult_bp
 from routes.chatbot_routes import chatbot_bp # chatbot_bp 임포트는 유지
+from ai_model.registry import registry
+from ai_model.llm_backend import create_llm_backend
+from utils.metrics import init_metrics
+from services.upload_jobs import UploadJobManager
+from services.image_serving import ThumbnailRenderer
+from services.inference_results import ensure_indexes
+from services.storage import create_storage
+from services.overlay import OverlayRenderer
+from services.result_cache import OriginalStore, ResultCache
+from services.patient_digest import PatientDigestStore
+from services.answer_cache import AnswerCache
+from services.chat_sessions import ChatSessionStore
+from services.consult_stats import ConsultStats
 
 # dotenv로 API 키 불러오기
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("Gemini API 키가 없습니다. .env 확인")
-configure(api_key=GEMINI_API_KEY)
-
-# Gemini 모델 준비
-model_name = 'models/gemini-2.5-flash'
-if not any(m.name == model_name and 'generateContent' in m.supported_generation_methods for m in list_models()):
-    raise ValueError(f"모델 {model_name}은 generateContent 미지원")
-
-# app.py에서는 직접 gemini_model을 전역으로 생성하지 않고, 필요하다면 chatbot_routes에서 접근하거나,
-# app context에 저장하여 사용할 수 있습니다. 여기서는 gemini_model 변수 선언은 유지합니다.
-gemini_model = GenerativeModel(model_name)
-
-# Flask 앱 설정
-app = Flask(__name__)
-app.config.from_object(DevelopmentConfig)
-CORS(app)
-
-print(f"✅ 연결된 DB URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
-
-os.makedirs(app.config['UPLOAD_FOLDER_ORIGINAL'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER_MODEL1'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER_MODEL2'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER_MODEL3'], exist_ok=True)
-
-db.init_app(app)
-mongo_client = MongoDBClient(uri=app.config['MONGO_URI'], db_name=app.config['MONGO_DB_NAME'])
-app.extensions = getattr(app, 'extensions', {})
-app.extensions['mongo_client'] = mongo_client
-# ✅ Gemini 모델 객체를 app.extensions에 저장하여 다른 Blueprint에서 접근 가능하게 합니다.
-app.extensions['gemini_model'] = gemini_model 
-
-with app.app_context():
-    db.create_all()
-
-# 라우트 등록
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(image_bp)
-app.register_blueprint(upload_bp, url_prefix='/api')
-app.register_blueprint(inference_bp, url_prefix='/api')
-app.register_blueprint(static_bp)
-app.register_blueprint(application_bp, url_prefix='/api')
-app.register_blueprint(consult_bp, url_prefix='/api/consult')
-app.register_blueprint(chatbot_bp) # 챗봇 블루프린트 등록은 유지
-
-# 기본 엔드포인트
-@app.route('/')
-def index():
-    return "Hello from MediTooth Backend!"
-
-# 기존 /api/chat 엔드포인트 (chat_with_gemini 함수)는 여기에서 제거됩니다.
-
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({"error": "서버 내부 오류"}), 500
+
+
+# ✅ 앱 팩토리: 모델 로딩을 기다리지 않고 바로 auth/consult 등 라우트를 서빙
+#    세그멘테이션 모델은 백그라운드 스레드에서 워밍업 (MODEL_WARMUP=0 이면 첫 요청 때 로드)
+def create_app(config_object=DevelopmentConfig):
+    # Flask 앱 설정
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    CORS(app)
+
+    print(f"✅ 연결된 DB URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+    os.makedirs(app.config['UPLOAD_FOLDER_ORIGINAL'], exist_ok=True)
+    os.makedirs(app.config['PROCESSED_FOLDER_MODEL1'], exist_ok=True)
+    os.makedirs(app.config['PROCESSED_FOLDER_MODEL2'], exist_ok=True)
+    os.makedirs(app.config['PROCESSED_FOLDER_MODEL3'], exist_ok=True)
+    os.makedirs(app.config['MASK_FOLDER'], exist_ok=True)
+
+    db.init_app(app)
+    # ✅ 요청/모델/DB/LLM 메트릭 수집 + GET /metrics (MongoDBClient 생성 전에 등록)
+    if app.config.get('METRICS_ENABLED', True):
+        init_metrics(app)
+    # ✅ 프로세스 공용 MongoDB 클라이언트 (커넥션 풀 / 재시도 / 지연 쓰기 설정은 config.py MONGO_*)
+    mongo_client = MongoDBClient.from_config(app.config)
+    app.extensions = getattr(app, 'extensions', {})
+    app.extensions['mongo_client'] = mongo_client
+    # ✅ inference_results 조회용 (user_id, timestamp) 복합 인덱스 (백그라운드 생성)
+    ensure_indexes(mongo_client.get_collection("inference_results"))
+    # ✅ 원본 / 마스크 저장소 (STORAGE_BACKEND=local: 해시 샤딩 폴더, s3: S3 호환 저장소)
+    storage = create_storage(app.config)
+    app.extensions['storage'] = storage
+    # ✅ 오버레이 이미지는 요청 시 마스크로 렌더링 (메모리 / 디스크 LRU 캐시)
+    app.extensions['overlay_renderer'] = OverlayRenderer.from_config(app.config, storage)
+    # ✅ 원본 썸네일 (?w=256) 생성 + 전용 캐시
+    app.extensions['thumbnail_renderer'] = ThumbnailRenderer.from_config(app.config)
+    # ✅ 내용 기반 추론 결과 캐시 (메모리 LRU → MongoDB) + 원본 파일 중복 제거
+    result_cache = None
+    if app.config.get('RESULT_CACHE_ENABLED', True):
+        result_cache = ResultCache.from_config(mongo_client, app.config)
+        result_cache.start()
+    app.extensions['result_cache'] = result_cache
+    if app.config.get('ORIGINAL_DEDUPE_ENABLED', True):
+        app.extensions['original_store'] = OriginalStore.from_config(mongo_client, app.config)
+    # ✅ 챗봇용 환자별 기록 요약 (업로드 / 의사 응답 시 증분 갱신)
+    patient_digests = PatientDigestStore.from_config(mongo_client, app.config)
+    app.extensions['patient_digests'] = patient_digests
+    # ✅ 챗봇 답변 캐시 (환자 요약이 바뀌면 키가 달라져 자동 무효화)
+    chat_cache = None
+    if app.config.get('CHAT_CACHE_ENABLED', True):
+        chat_cache = AnswerCache.from_config(mongo_client, app.config)
+        chat_cache.start()
+    app.extensions['chat_cache'] = chat_cache
+    # ✅ 비동기 업로드 작업 관리자 (상태는 MongoDB에 저장, 남은 작업은 백그라운드에서 복구)
+    app.extensions['upload_jobs'] = UploadJobManager.from_config(mongo_client, app.config, result_cache=result_cache,
+                                                              storage=storage, digests=patient_digests)
+    if app.config.get('UPLOAD_JOB_RECOVERY', True):
+        app.extensions['upload_jobs'].start()
+    # ✅ LLM 백엔드(Gemini 또는 로컬 스텁)를 app.extensions에 저장하여 다른 Blueprint에서 접근 가능하게 합니다.
+    #    Gemini 모델 확인은 백그라운드에서 진행되므로 네트워크 없이도 서버가 시작됩니다.
+    app.extensions['gemini_model'] = create_llm_backend(app.config)
+    # ✅ 챗봇 대화 세션 (최근 대화 토큰 예산 + 이전 대화 요약, 대화 기록은 'chat_transcripts'에 모아 쓰기)
+    chat_sessions = ChatSessionStore.from_config(mongo_client, app.config, llm=app.extensions['gemini_model'])
+    chat_sessions.start()
+    app.extensions['chat_sessions'] = chat_sessions
+    # ✅ 진료 신청 통계 (일별 GROUP BY, 선택적으로 일별 집계 테이블)
+    consult_stats = ConsultStats.from_config(app.config)
+    app.extensions['consult_stats'] = consult_stats
+
+    with app.app_context():
+        db.create_all()
+        consult_stats.start()
+
+    # 라우트 등록
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(image_bp)
+    app.register_blueprint(upload_bp, url_prefix='/api')
+    app.register_blueprint(inference_bp, url_prefix='/api')
+    app.register_blueprint(static_bp)
+    app.register_blueprint(application_bp, url_prefix='/api')
+    app.register_blueprint(consult_bp, url_prefix='/api/consult')
+    app.register_blueprint(chatbot_bp) # 챗봇 블루프린트 등록은 유지
+
+    # 기본 엔드포인트
+    @app.route('/')
+    def index():
+        return "Hello from MediTooth Backend!"
+
+    # ✅ 준비 상태: 서버는 떠 있지만 모델 워밍업 중이면 503
+    @app.route('/ready')
+    def readiness():
+        ready = registry.is_ready()
+        return jsonify({
+            "ready": ready,
+            "models": registry.status(),
+            "llm": app.extensions['gemini_model'].status()
+        }), 200 if ready else 503
+
+    # 기존 /api/chat 엔드포인트 (chat_with_gemini 함수)는 여기에서 제거됩니다.
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({"error": "서버 내부 오류"}), 500
+
+    if app.config.get('MODEL_WARMUP', True):
+        registry.warm_up()
+
+    return app
+
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app = create_app()
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,161 @@
+"""
+추론 최적화 정확도 검사: fp32 기준 모델 vs 최적화 모델(INFERENCE_* 설정)의 마스크 / confidence 비교
+
+실행:
+    INFERENCE_PRECISION=bf16 INFERENCE_CHANNELS_LAST=1 \\
+        python -m benchmarks.accuracy_check --samples ./samples [--models model1,model2,model3]
+
+샘플 폴더의 각 이미지에 대해 모델별로
+  - 픽셀 일치율 (argmax 마스크가 같은 픽셀 비율)
+  - 주요 클래스(진단 라벨 / 위생 클래스 / 치아번호) 일치율
+  - confidence 절대 오차
+  - forward 지연 시간 (fp32 vs 최적화)
+와 실제 적용된 최적화(get_optimization_status)를 JSON으로 출력하고,
+기준을 넘지 못하거나 요청한 최적화가 적용되지 않았으면(fp32 폴백 등) 종료 코드 1을 반환합니다.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_model import predictor, hygiene_predictor, tooth_number_predictor  # noqa: E402
+from ai_model.optimize import InferenceOptions, get_optimization_status, optimize_for_inference  # noqa: E402
+from ai_model.pipeline import shared_transform  # noqa: E402
+from ai_model.postprocess import main_class, foreground_confidence  # noqa: E402
+
+MODULES = {
+    "model1": predictor,
+    "model2": hygiene_predictor,
+    "model3": tooth_number_predictor,
+}
+
+
+def load_samples(sample_dir, synthetic):
+    paths = sorted(p for ext in ("png", "jpg", "jpeg") for p in glob.glob(os.path.join(sample_dir or "", f"*.{ext}")))
+    if paths:
+        return [(os.path.basename(p), shared_transform(Image.open(p).convert("RGB")).unsqueeze(0)) for p in paths]
+    if synthetic:
+        print("⚠️ 샘플 이미지 없음: 무작위 입력 사용 (정확도 판단용이 아닌 동작 확인용)", file=sys.stderr)
+        return [(f"synthetic_{i}", torch.rand(1, 3, 224, 224)) for i in range(synthetic)]
+    raise SystemExit("샘플 이미지가 없습니다: --samples 폴더를 지정하세요 (동작 확인만 하려면 --synthetic N)")
+
+
+def _summary(name, probs):
+    """모델별 진단 요약 (model1: 병변 최다 클래스 + 병변 평균 확률, model2/3: 주요 클래스 + 평균 확률)"""
+    pred = probs.argmax(axis=0)
+    if name == "model1":
+        lesion = pred[pred > 0]
+        label = int(np.bincount(lesion).argmax()) if lesion.size else -1
+        return pred, label, foreground_confidence(pred, probs)
+    class_id, confidence = main_class(pred, probs)
+    return pred, class_id, confidence
+
+
+def _run(model, x):
+    start = time.perf_counter()
+    with torch.inference_mode():
+        output = model(x)
+    return F.softmax(output.float(), dim=1)[0].numpy(), (time.perf_counter() - start) * 1000
+
+
+def applied_mismatches(options, applied):
+    """요청한 설정과 실제 적용된 설정의 차이 목록 (int8은 항상 compile, channels_last 미적용)"""
+    expected = {
+        "precision": options.precision,
+        "channels_last": options.channels_last and options.precision != "int8",
+        "compile": options.compile or options.precision == "int8",
+    }
+    mismatches = [f"{key}: 요청 {value}, 적용 {applied.get(key)}"
+                  for key, value in expected.items() if applied.get(key) != value]
+    if applied.get("error"):
+        mismatches.append(applied["error"])
+    return mismatches
+
+
+def check_model(name, samples, options):
+    module = MODULES[name]
+    baseline = module.build_model()
+    optimized = optimize_for_inference(module.build_model(), name, options)
+    applied = get_optimization_status()[name]
+
+    # 첫 호출(compile / 캐시 초기화)은 측정에서 제외
+    _run(baseline, samples[0][1])
+    _run(optimized, samples[0][1])
+
+    agreements, class_matches, conf_diffs = [], 0, []
+    baseline_ms, optimized_ms = [], []
+    per_sample = []
+
+    for sample_name, x in samples:
+        ref_probs, ref_ms = _run(baseline, x)
+        opt_probs, opt_ms = _run(optimized, x)
+        ref_pred, ref_class, ref_conf = _summary(name, ref_probs)
+        opt_pred, opt_class, opt_conf = _summary(name, opt_probs)
+
+        agreement = float((ref_pred == opt_pred).mean())
+        agreements.append(agreement)
+        class_matches += int(ref_class == opt_class)
+        conf_diffs.append(abs(ref_conf - opt_conf))
+        baseline_ms.append(ref_ms)
+        optimized_ms.append(opt_ms)
+        per_sample.append({
+            "sample": sample_name,
+            "pixel_agreement": round(agreement, 4),
+            "class_fp32": ref_class,
+            "class_optimized": opt_class,
+            "confidence_fp32": round(ref_conf, 4),
+            "confidence_optimized": round(opt_conf, 4),
+        })
+
+    mean_baseline = sum(baseline_ms) / len(baseline_ms)
+    mean_optimized = sum(optimized_ms) / len(optimized_ms)
+    return {
+        "applied": {key: applied[key] for key in ("precision", "channels_last", "compile", "error")},
+        "applied_mismatches": applied_mismatches(options, applied),
+        "min_pixel_agreement": round(min(agreements), 4),
+        "mean_pixel_agreement": round(sum(agreements) / len(agreements), 4),
+        "main_class_match_rate": round(class_matches / len(samples), 4),
+        "max_confidence_diff": round(max(conf_diffs), 4),
+        "fp32_ms": round(mean_baseline, 2),
+        "optimized_ms": round(mean_optimized, 2),
+        "speedup": round(mean_baseline / mean_optimized, 2) if mean_optimized else None,
+        "samples": per_sample,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", help="샘플 이미지 폴더")
+    parser.add_argument("--synthetic", type=int, default=0, help="샘플이 없을 때 무작위 입력 개수")
+    parser.add_argument("--models", default="model1,model2,model3")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="최소 픽셀 일치율")
+    parser.add_argument("--min-class-match", type=float, default=1.0, help="최소 주요 클래스 일치율")
+    parser.add_argument("--max-conf-diff", type=float, default=0.02, help="최대 confidence 오차")
+    args = parser.parse_args()
+
+    options = InferenceOptions.from_env()
+    samples = load_samples(args.samples, args.synthetic)
+
+    report = {"options": options.to_dict(), "models": {}, "passed": True}
+    for name in args.models.split(","):
+        result = check_model(name, samples, options)
+        result["passed"] = (
+            not result["applied_mismatches"]
+            and result["min_pixel_agreement"] >= args.min_agreement
+            and result["main_class_match_rate"] >= args.min_class_match
+            and result["max_confidence_diff"] <= args.max_conf_diff
+        )
+        report["models"][name] = result
+        report["passed"] = report["passed"] and result["passed"]
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(0 if report["passed"] else 1)
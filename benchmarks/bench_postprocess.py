@@ -0,0 +1,135 @@
+"""
+후처리 마이크로 벤치마크: 기존 루프 구현 vs ai_model.postprocess 벡터화 구현
+
+실행: python -m benchmarks.bench_postprocess [--repeat 200]
+모델 가중치 없이 모델별 클래스 수 / 팔레트 채널 수로 만든 합성 224x224 출력으로 측정합니다.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_model.postprocess import (  # noqa: E402
+    build_palette_lut, colorize, main_class, foreground_confidence,
+    alpha_blend, alpha_composite,
+)
+
+SIZE = 224
+
+# 모델 이름, 클래스 수, 팔레트 채널 수(model1=RGB blend, model2/3=RGBA composite)
+MODELS = [
+    ("model1_disease", 10, 3),
+    ("model2_hygiene", 10, 4),
+    ("model3_tooth_number", 33, 4),
+]
+
+
+# ✅ 기존 구현 (비교 기준)
+def legacy_colorize(pred, palette, channels):
+    color_mask = np.zeros((SIZE, SIZE, channels), dtype=np.uint8)
+    for class_id, color in palette.items():
+        color_mask[pred == class_id] = color
+    return color_mask
+
+def legacy_main_class(pred, probs):
+    class_ids, counts = np.unique(pred, return_counts=True)
+    best_class, best_conf = -1, 0.0
+    for cid, cnt in zip(class_ids, counts):
+        if cid == 0:
+            continue
+        class_conf = probs[cid][pred == cid].mean()
+        if cnt > 0 and class_conf > best_conf:
+            best_class, best_conf = cid, class_conf
+    return int(best_class), float(best_conf)
+
+def legacy_foreground_confidence(pred, probs):
+    lesion_coords = np.column_stack(np.where(pred > 0))
+    confidences = [probs[pred[y, x], y, x] for y, x in lesion_coords if pred[y, x] > 0]
+    return float(np.mean(confidences)) if confidences else 0.0
+
+def legacy_overlay(base_img, color_mask, channels):
+    if channels == 3:
+        return np.asarray(Image.blend(base_img, Image.fromarray(color_mask), alpha=0.78))
+    return np.asarray(Image.alpha_composite(base_img.convert("RGBA"), Image.fromarray(color_mask)))
+
+
+# ✅ 벡터화 구현
+def vectorized_overlay(base, color_mask, channels):
+    if channels == 3:
+        return alpha_blend(base, color_mask, alpha=0.78)
+    return alpha_composite(base, color_mask)
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def make_inputs(num_classes, channels, rng):
+    logits = rng.standard_normal((num_classes, SIZE, SIZE)).astype(np.float32)
+    logits[0] += 1.5  # 배경 비율을 실제 출력과 비슷하게
+    probs = np.exp(logits) / np.exp(logits).sum(axis=0, keepdims=True)
+    pred = probs.argmax(axis=0)
+    palette = {cid: tuple(int(v) for v in rng.integers(0, 256, channels)) for cid in range(num_classes)}
+    base = rng.integers(0, 256, (SIZE, SIZE, 3), dtype=np.uint8)
+    return probs, pred, palette, base
+
+
+def run(repeat):
+    rng = np.random.default_rng(0)
+    report = {}
+
+    for name, num_classes, channels in MODELS:
+        probs, pred, palette, base = make_inputs(num_classes, channels, rng)
+        lut = build_palette_lut(palette)
+        base_img = Image.fromarray(base)
+        color_mask = colorize(pred, lut)
+
+        # 결과 일치 확인 (블렌딩은 반올림 차이 1 이내 허용)
+        assert np.array_equal(colorize(pred, lut), legacy_colorize(pred, palette, channels))
+        assert legacy_main_class(pred, probs)[0] == main_class(pred, probs)[0]
+        assert abs(legacy_main_class(pred, probs)[1] - main_class(pred, probs)[1]) < 1e-5
+        assert abs(legacy_foreground_confidence(pred, probs) - foreground_confidence(pred, probs)) < 1e-5
+        diff = np.abs(legacy_overlay(base_img, color_mask, channels).astype(int)
+                      - vectorized_overlay(base, color_mask, channels).astype(int))
+        assert diff.max() <= 1
+
+        stages = {
+            "colorize": (lambda: legacy_colorize(pred, palette, channels),
+                         lambda: colorize(pred, lut)),
+            "class_stats": (lambda: legacy_main_class(pred, probs),
+                            lambda: main_class(pred, probs)),
+            "foreground_confidence": (lambda: legacy_foreground_confidence(pred, probs),
+                                      lambda: foreground_confidence(pred, probs)),
+            "overlay": (lambda: legacy_overlay(base_img, color_mask, channels),
+                        lambda: vectorized_overlay(base, color_mask, channels)),
+        }
+
+        report[name] = {}
+        for stage, (legacy_fn, new_fn) in stages.items():
+            # 픽셀 단위 리스트 컴프리헨션은 매우 느리므로 반복 횟수를 줄임
+            legacy_repeat = max(1, repeat // 20) if stage == "foreground_confidence" else repeat
+            legacy_ms = _time(legacy_fn, legacy_repeat)
+            new_ms = _time(new_fn, repeat)
+            report[name][stage] = {
+                "legacy_ms": round(legacy_ms, 3),
+                "vectorized_ms": round(new_ms, 3),
+                "speedup": round(legacy_ms / new_ms, 1) if new_ms > 0 else None,
+            }
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
@@ -0,0 +1,280 @@
+"""
+업로드 파이프라인 단계별 벤치마크: /api/upload_masked_image → 3개 모델 → MongoDB
+
+실행:
+    python -m benchmarks.bench_upload_pipeline [--requests 20] [--resolutions 640x480,1280x960,4032x3024]
+                                              [--random-weights] [--output bench.json]
+
+Flask 테스트 클라이언트로 합성 이미지(기본 JPEG, --format png)를 업로드하고, utils.timing.stage로 표시된 단계별
+p50 / p95 / p99 (ms)를 JSON으로 출력합니다. 릴리스 간 회귀 비교와 최적화 효과 확인용입니다.
+  - MongoDB : 메모리 내 대체 클라이언트 (InMemoryMongoClient)
+  - MySQL   : SQLite 메모리 DB
+  - 모델 가중치가 없으면 --random-weights (forward 연산량은 가중치 값과 무관)
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+import torch  # noqa: E402
+
+from config import DevelopmentConfig  # noqa: E402
+from utils.timing import record_stages  # noqa: E402
+
+STAGES = [
+    "file_save", "decode", "preprocess",
+    "forward.model1", "forward.model2", "forward.model3",
+    "postprocess.model1", "postprocess.model2", "postprocess.model3",
+    "mask_save", "original_wait", "db_insert",
+]
+
+
+# ✅ MongoDB 대체: 컬렉션별 리스트에 저장만 하는 메모리 클라이언트 ==================
+class InMemoryCollection:
+    def __init__(self):
+        self.documents = []
+
+    def insert_one(self, document):
+        document.setdefault("_id", len(self.documents) + 1)
+        self.documents.append(document)
+
+    def insert_many(self, documents):
+        for document in documents:
+            self.insert_one(document)
+
+    def find(self, query=None, *args, **kwargs):
+        query = query or {}
+        return [d for d in self.documents if all(d.get(k) == v for k, v in query.items())]
+
+    def create_index(self, *args, **kwargs):
+        return None
+
+    # 환자 요약(patient_digests) 갱신 등 업데이트는 저장하지 않음 (추론 경로 측정용)
+    def update_one(self, *args, **kwargs):
+        return _UpdateResult()
+
+
+class _UpdateResult:
+    upserted_id = None
+    matched_count = 0
+    modified_count = 0
+
+
+class InMemoryDB(dict):
+    def __missing__(self, name):
+        self[name] = InMemoryCollection()
+        return self[name]
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+class InMemoryMongoClient:
+    def __init__(self, *args, **kwargs):
+        self.db = _shared_db
+        self.inference_results_collection = self.db["inference_results"]
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def insert_result(self, result_data):
+        self.inference_results_collection.insert_one(result_data)
+
+    def insert_into_collection(self, collection_name, document):
+        self.db[collection_name].insert_one(document)
+        return document["_id"]
+
+    def get_collection(self, collection_name):
+        return self.db[collection_name]
+
+    def write_behind_buffer(self, collection_name, batch_size=None, interval=None):
+        return _ImmediateBuffer(self.db[collection_name])
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _ImmediateBuffer:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add(self, document):
+        self.collection.insert_one(document)
+
+
+_shared_db = InMemoryDB()
+
+
+class BenchmarkConfig(DevelopmentConfig):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    MODEL_WARMUP = False
+    LLM_BACKEND = "stub"
+    UPLOAD_ASYNC_DEFAULT = False
+    UPLOAD_JOB_RECOVERY = False
+    # 같은 이미지를 반복 업로드하므로 결과 캐시 / 원본 중복 제거를 끄고 매번 추론 시간 측정
+    RESULT_CACHE_ENABLED = False
+    STORAGE_BACKEND = "local"
+    ORIGINAL_DEDUPE_ENABLED = False
+
+
+# ✅ 모델 가중치 파일 없이 무작위 가중치로 등록 (INFERENCE_BACKEND=process 면 각 워커 프로세스에서도 실행)
+def use_random_weights():
+    from ai_model import predictor, hygiene_predictor, tooth_number_predictor
+    from ai_model.optimize import InferenceOptions, optimize_for_inference
+    from ai_model.process_pool import pooled_loader
+    from ai_model.registry import registry, warmup_segmentation_model
+
+    # 무작위 가중치는 정확도와 무관하므로 int8 보정 이미지가 없어도 무작위 입력으로 보정 허용
+    options = InferenceOptions.from_env()
+    options.random_calibration = True
+
+    for name, module in (("model1", predictor), ("model2", hygiene_predictor), ("model3", tooth_number_predictor)):
+        loader = lambda name=name, module=module: optimize_for_inference(
+            module.build_model(load_weights=False), name, options)
+        registry.register(name, pooled_loader(name, loader), warmup=warmup_segmentation_model)
+
+
+# ✅ 벤치마크용 앱 =========================================================
+def build_app(image_dir, random_weights):
+    import app as app_module
+    from ai_model.process_pool import set_worker_initializer
+    from ai_model.registry import registry
+
+    if random_weights:
+        set_worker_initializer(use_random_weights)
+        use_random_weights()
+
+    BenchmarkConfig.UPLOAD_FOLDER_ORIGINAL = os.path.join(image_dir, "original")
+    BenchmarkConfig.PROCESSED_FOLDER_MODEL1 = os.path.join(image_dir, "model1")
+    BenchmarkConfig.PROCESSED_FOLDER_MODEL2 = os.path.join(image_dir, "model2")
+    BenchmarkConfig.PROCESSED_FOLDER_MODEL3 = os.path.join(image_dir, "model3")
+    BenchmarkConfig.MASK_FOLDER = os.path.join(image_dir, "masks")
+    BenchmarkConfig.OVERLAY_CACHE_DIR = os.path.join(image_dir, "overlay_cache")
+    BenchmarkConfig.THUMBNAIL_CACHE_DIR = os.path.join(image_dir, "thumbnail_cache")
+
+    app_module.MongoDBClient = InMemoryMongoClient
+    app = app_module.create_app(BenchmarkConfig)
+
+    # 모델 로드 시간은 측정에서 제외
+    registry.warm_up(names=["model1", "model2", "model3"], background=False)
+    return app
+
+
+# ✅ 합성 입력: 부드러운 그라데이션 + 노이즈 (휴대폰 사진과 비슷한 JPEG 크기)
+def synthetic_image(width, height, seed, image_format="JPEG"):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([(x * 255 // max(width - 1, 1)), (y * 255 // max(height - 1, 1)),
+                     ((x + y) * 255 // max(width + height - 2, 1))], axis=-1)
+    noise = rng.integers(-20, 20, size=(height, width, 3))
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    else:
+        Image.fromarray(pixels).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(values.mean()), 2),
+    }
+
+
+def run_resolution(client, width, height, requests, warmup, image_format="JPEG"):
+    payload = synthetic_image(width, height, seed=width * height, image_format=image_format)
+    filename = "bench.jpg" if image_format == "JPEG" else f"bench.{image_format.lower()}"
+    samples = {name: [] for name in STAGES}
+    totals = []
+
+    for i in range(warmup + requests):
+        with record_stages() as recorder:
+            start = time.perf_counter()
+            response = client.post(
+                "/api/upload_masked_image",
+                data={"file": (io.BytesIO(payload), filename), "user_id": "bench"},
+                content_type="multipart/form-data",
+            )
+            elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"업로드 실패 ({response.status_code}): {response.get_data(as_text=True)[:300]}")
+        if i < warmup:
+            continue
+        totals.append(elapsed)
+        for name in STAGES:
+            samples[name].append(recorder.timings.get(name, 0.0))
+
+    return {
+        "upload_bytes": len(payload),
+        "total": percentiles(totals),
+        "stages": {name: percentiles(values) for name, values in samples.items()},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20, help="해상도별 측정 요청 수")
+    parser.add_argument("--warmup", type=int, default=2, help="해상도별 측정 제외 요청 수")
+    parser.add_argument("--resolutions", default="640x480,1280x960,4032x3024")
+    parser.add_argument("--format", default="jpeg", choices=["jpeg", "png"], help="업로드 이미지 형식")
+    parser.add_argument("--random-weights", action="store_true", help="모델 가중치 파일 없이 무작위 가중치 사용")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (없으면 stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as image_dir:
+        app = build_app(image_dir, args.random_weights)
+        client = app.test_client()
+
+        report = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "env": {k: v for k, v in os.environ.items() if k.startswith("INFERENCE_")},
+            "requests_per_resolution": args.requests,
+            "format": args.format,
+            "resolutions": {},
+        }
+        for resolution in args.resolutions.split(","):
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            print(f"▶ {resolution} 측정 중...", file=sys.stderr)
+            report["resolutions"][resolution] = run_resolution(client, width, height, args.requests, args.warmup,
+                                                                image_format=args.format.upper())
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
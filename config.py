@@ -19,6 +19,20 @@ class DevelopmentConfig:
     MONGO_URI = os.getenv('MONGO_URI')
     MONGO_DB_NAME = os.getenv('MONGO_DB_NAME')
 
+    # ✅ MongoDB 커넥션 풀 / 타임아웃 / 재시도 (프로세스당 MongoClient 1개 공유)
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '30000'))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))   # 풀이 가득 찼을 때 대기 한도
+    MONGO_RETRY_WRITES = os.getenv('MONGO_RETRY_WRITES', '1') == '1'
+    MONGO_RETRY_ATTEMPTS = int(os.getenv('MONGO_RETRY_ATTEMPTS', '3'))
+    # ✅ inference_results 지연 쓰기 (insert_many로 모아서 저장, 응답이 저장 완료를 기다리지 않음)
+    MONGO_WRITE_BEHIND = os.getenv('MONGO_WRITE_BEHIND', '0') == '1'
+    MONGO_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('MONGO_WRITE_BEHIND_BATCH_SIZE', '50'))
+    MONGO_WRITE_BEHIND_INTERVAL_MS = int(os.getenv('MONGO_WRITE_BEHIND_INTERVAL_MS', '200'))
+
     # 보안 키
     SECRET_KEY = os.getenv('SECRET_KEY') or 'default_fallback_key'
 
@@ -31,5 +45,78 @@ class DevelopmentConfig:
     PROCESSED_FOLDER_MODEL2 = os.path.join(IMAGE_BASE_DIR, 'model2')
     PROCESSED_FOLDER_MODEL3 = os.path.join(IMAGE_BASE_DIR, 'model3')
 
+    # ✅ 원본 / 마스크 저장소: local(위 폴더 아래 해시 샤딩 하위 폴더) | s3(S3 호환, 여러 서버 공유 / pip install boto3)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    STORAGE_SHARD_DEPTH = int(os.getenv('STORAGE_SHARD_DEPTH', '2'))
+    S3_BUCKET = os.getenv('S3_BUCKET')
+    S3_PREFIX = os.getenv('S3_PREFIX', '')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')      # MinIO 등 (비우면 AWS S3)
+    S3_REGION = os.getenv('S3_REGION')
+
+    # ✅ 모델별 클래스 마스크 (업로드 시 저장) + 오버레이 렌더링 캐시
+    MASK_FOLDER = os.path.join(IMAGE_BASE_DIR, 'masks')
+    OVERLAY_CACHE_DIR = os.path.join(IMAGE_BASE_DIR, 'overlay_cache')
+    OVERLAY_CACHE_MEMORY_MB = int(os.getenv('OVERLAY_CACHE_MEMORY_MB', '64'))
+    OVERLAY_CACHE_DISK_MB = int(os.getenv('OVERLAY_CACHE_DISK_MB', '512'))
+    OVERLAY_QUALITY = int(os.getenv('OVERLAY_QUALITY', '85'))
+
+    # ✅ 이미지 응답 캐시 헤더 (업로드 파일명은 바뀌지 않으므로 immutable) + 원본 썸네일 (?w=)
+    IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    IMAGE_CACHE_PRIVATE = os.getenv('IMAGE_CACHE_PRIVATE', '1') == '1'     # 진료 이미지이므로 기본은 공유 캐시(CDN) 금지
+    IMAGE_THUMBNAIL_WIDTHS = os.getenv('IMAGE_THUMBNAIL_WIDTHS', '128,256,512')
+    THUMBNAIL_CACHE_DIR = os.path.join(IMAGE_BASE_DIR, 'thumbnail_cache')
+    THUMBNAIL_CACHE_MEMORY_MB = int(os.getenv('THUMBNAIL_CACHE_MEMORY_MB', '32'))
+    THUMBNAIL_CACHE_DISK_MB = int(os.getenv('THUMBNAIL_CACHE_DISK_MB', '512'))
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))
+
+    # ✅ 서버 시작 시 세그멘테이션 모델 백그라운드 워밍업 (0이면 첫 요청 때 로드)
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', '1') == '1'
+
+    # ✅ 챗봇 LLM 백엔드: gemini(기본) | stub(네트워크 없는 로컬 테스트용)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'models/gemini-2.5-flash')
+    LLM_STUB_LATENCY_MS = float(os.getenv('LLM_STUB_LATENCY_MS', '0'))
+    # ✅ 챗봇 프롬프트에 넣는 환자 기록: 'patient_digests' 요약 문서 (최신 N건 유지) + 토큰 예산
+    PATIENT_DIGEST_MAX_RECORDS = int(os.getenv('PATIENT_DIGEST_MAX_RECORDS', '30'))
+    CHATBOT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHATBOT_HISTORY_TOKEN_BUDGET', '2000'))
+    # ✅ 챗봇 답변 캐시 (환자 맥락 + 정규화한 질문 → 답변, 메모리 LRU + 선택적 MongoDB 'chat_answer_cache')
+    CHAT_CACHE_ENABLED = os.getenv('CHAT_CACHE_ENABLED', '1') == '1'
+    CHAT_CACHE_MONGO = os.getenv('CHAT_CACHE_MONGO', '0') == '1'
+    CHAT_CACHE_MEMORY_ENTRIES = int(os.getenv('CHAT_CACHE_MEMORY_ENTRIES', '1024'))
+    CHAT_CACHE_TTL_SECONDS = int(os.getenv('CHAT_CACHE_TTL_SECONDS', '3600'))
+    # ✅ 챗봇 대화 세션 (/api/chat session_id): 최근 대화 토큰 예산, 넘친 대화는 요약 (extractive | llm)
+    CHAT_SESSION_HISTORY_TOKENS = int(os.getenv('CHAT_SESSION_HISTORY_TOKENS', '1500'))
+    CHAT_SESSION_SUMMARY_TOKENS = int(os.getenv('CHAT_SESSION_SUMMARY_TOKENS', '400'))
+    CHAT_SESSION_SUMMARY = os.getenv('CHAT_SESSION_SUMMARY', 'extractive')
+    CHAT_SESSION_IDLE_MINUTES = int(os.getenv('CHAT_SESSION_IDLE_MINUTES', '30'))
+    CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', '10000'))
+    CHAT_TRANSCRIPT_TTL_DAYS = int(os.getenv('CHAT_TRANSCRIPT_TTL_DAYS', '90'))
+    # 같은 세션에 진행 중인 턴이 있을 때 기다리는 최대 시간 (넘으면 409 / SSE 'error', 워커 스레드를 오래 잡지 않음)
+    CHAT_TURN_LOCK_TIMEOUT_SECONDS = float(os.getenv('CHAT_TURN_LOCK_TIMEOUT_SECONDS', '2'))
+    # ✅ 진료 신청 통계 (/api/consult/stats): 일별 집계 테이블 사용 여부, ?from=&to= 최대 조회 일수
+    CONSULT_STATS_MATERIALIZED = os.getenv('CONSULT_STATS_MATERIALIZED', '0') == '1'
+    CONSULT_STATS_MAX_DAYS = int(os.getenv('CONSULT_STATS_MAX_DAYS', '366'))
+
+    # ✅ GET /metrics (Prometheus 텍스트 형식) 요청/모델/DB/LLM 메트릭 수집
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+
+    # ✅ 비동기 업로드 (202 + job_id, GET /api/upload_jobs/<job_id>[/events])
+    #    UPLOAD_ASYNC_DEFAULT=1 이면 기본 비동기 (?sync=1 로 기존 동기 응답), 0 이면 ?async=1 일 때만 비동기
+    UPLOAD_ASYNC_DEFAULT = os.getenv('UPLOAD_ASYNC_DEFAULT', '0') == '1'
+    UPLOAD_JOB_WORKERS = int(os.getenv('UPLOAD_JOB_WORKERS', '2'))
+    UPLOAD_JOB_STALE_SECONDS = int(os.getenv('UPLOAD_JOB_STALE_SECONDS', '300'))
+    UPLOAD_JOB_MAX_ATTEMPTS = int(os.getenv('UPLOAD_JOB_MAX_ATTEMPTS', '3'))
+    UPLOAD_JOB_RESULT_TTL_HOURS = int(os.getenv('UPLOAD_JOB_RESULT_TTL_HOURS', '168'))
+    UPLOAD_JOB_RECOVERY = os.getenv('UPLOAD_JOB_RECOVERY', '1') == '1'
+
+    # ✅ 추론 결과 캐시 (SHA-256(디코딩 이미지 + 모델 가중치 지문) → 결과, 메모리 LRU + MongoDB 'inference_cache')
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', '1') == '1'
+    RESULT_CACHE_MONGO = os.getenv('RESULT_CACHE_MONGO', '1') == '1'
+    RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv('RESULT_CACHE_MEMORY_ENTRIES', '512'))
+    RESULT_CACHE_TTL_DAYS = int(os.getenv('RESULT_CACHE_TTL_DAYS', '30'))
+    # ✅ 같은 내용의 원본 파일은 하드 링크로 저장 (MongoDB 'original_files'에 SHA-256 → 경로)
+    ORIGINAL_DEDUPE_ENABLED = os.getenv('ORIGINAL_DEDUPE_ENABLED', '1') == '1'
+
     # 허용 확장자
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
\ No newline at end of file
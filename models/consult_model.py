@@ -15,3 +15,12 @@ class ConsultRequest(db.Model):
     reply_datetime = db.Column(db.String(20), nullable=True)
     is_requested = db.Column(db.String(1), default='Y')  # Y / N
     is_replied = db.Column(db.String(1), default='N')    # Y / N
+
+
+# ✅ 일별 진료 신청 집계 (CONSULT_STATS_MATERIALIZED=1 일 때 신청 / 취소 / 의사 응답 시 함께 갱신)
+class ConsultDailyStats(db.Model):
+    __tablename__ = 'consult_daily_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
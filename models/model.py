@@ -1,39 +1,116 @@
 from flask_sqlalchemy import SQLAlchemy
+from bson import ObjectId
 from pymongo import MongoClient
+from pymongo.errors import (AutoReconnect, BulkWriteError, DuplicateKeyError, NetworkTimeout,
+                            ServerSelectionTimeoutError, WaitQueueTimeoutError)
+import atexit
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from utils.metrics import (MONGO_WRITE_BEHIND_DROPPED, MONGO_WRITE_BEHIND_FLUSH_SIZE, MONGO_WRITE_BEHIND_PENDING,
+                           MONGO_WRITE_RETRIES, mongo_pool_listener)
+
 # .env 파일 로드 (MongoDB URI와 DB 이름을 가져오기 위함)
 load_dotenv()
 db = SQLAlchemy()
 
 # MongoDB 클라이언트 클래스
+# ✅ 프로세스 전체에서 하나만 생성해 공유 (app.extensions['mongo_client'], 라우트는 요청마다 새로 만들지 않음)
+#   - 커넥션 풀 크기 / 타임아웃 설정, retryWrites / retryReads
+#   - 일시적 네트워크 오류는 insert를 retry_attempts회까지 재시도 (같은 _id로 다시 보내므로 중복 저장 없음)
+#   - write_behind=True 이면 inference_results insert를 버퍼에 모아 insert_many로 flush (flush_interval마다 또는 batch_size 도달 시)
+#   - 다른 컬렉션도 write_behind_buffer(이름)로 같은 방식의 모아 쓰기 사용 (예: 챗봇 대화 기록)
+#   - 풀 사용량은 /metrics 의 mongodb_pool_* (utils/metrics.py)
 class MongoDBClient:
-    def __init__(self, uri=None, db_name=None):
+    def __init__(self, uri=None, db_name=None, max_pool_size=100, min_pool_size=0, server_selection_timeout_ms=30000,
+                 connect_timeout_ms=20000, socket_timeout_ms=None, wait_queue_timeout_ms=None, retry_writes=True,
+                 retry_attempts=3, write_behind=False, write_behind_batch_size=50, write_behind_interval=0.2):
         mongo_uri = uri or os.getenv('MONGO_URI')
         mongo_db_name = db_name or os.getenv('MONGO_DB_NAME')
 
         if not mongo_uri or not mongo_db_name:
             raise ValueError("MongoDB URI or DB name not set in environment variables or config.")
 
-        self.client = MongoClient(mongo_uri)
+        self.max_pool_size = max_pool_size
+        self.retry_attempts = max(1, retry_attempts)
+        self.client = MongoClient(
+            mongo_uri,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            serverSelectionTimeoutMS=server_selection_timeout_ms,
+            connectTimeoutMS=connect_timeout_ms,
+            socketTimeoutMS=socket_timeout_ms,
+            waitQueueTimeoutMS=wait_queue_timeout_ms,
+            retryWrites=retry_writes,
+            retryReads=True,
+            event_listeners=[mongo_pool_listener()],
+        )
         self.db = self.client[mongo_db_name]
         self.inference_results_collection = self.db.inference_results
 
+        self.write_behind_batch_size = write_behind_batch_size
+        self.write_behind_interval = write_behind_interval
+        self._buffers = {}                  # 컬렉션 이름 → _WriteBehindBuffer
+        self._buffers_lock = threading.Lock()
+        self._write_behind = self.write_behind_buffer("inference_results") if write_behind else None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            uri=config.get('MONGO_URI'),
+            db_name=config.get('MONGO_DB_NAME'),
+            max_pool_size=config.get('MONGO_MAX_POOL_SIZE', 100),
+            min_pool_size=config.get('MONGO_MIN_POOL_SIZE', 0),
+            server_selection_timeout_ms=config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000),
+            connect_timeout_ms=config.get('MONGO_CONNECT_TIMEOUT_MS', 20000),
+            socket_timeout_ms=config.get('MONGO_SOCKET_TIMEOUT_MS'),
+            wait_queue_timeout_ms=config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+            retry_writes=config.get('MONGO_RETRY_WRITES', True),
+            retry_attempts=config.get('MONGO_RETRY_ATTEMPTS', 3),
+            write_behind=config.get('MONGO_WRITE_BEHIND', False),
+            write_behind_batch_size=config.get('MONGO_WRITE_BEHIND_BATCH_SIZE', 50),
+            write_behind_interval=config.get('MONGO_WRITE_BEHIND_INTERVAL_MS', 200) / 1000,
+        )
+
+    # ✅ 일시적 오류(연결 끊김 / 타임아웃)만 지수 백오프로 재시도
+    #    서버 선택 타임아웃은 이미 serverSelectionTimeoutMS 만큼 기다린 뒤이므로 재시도하지 않음 (요청이 몇 배로 길어짐)
+    def _with_retry(self, operation, func):
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                return func()
+            except DuplicateKeyError:
+                if attempt == 1:
+                    raise
+                return None     # 앞선 시도가 실제로는 저장된 경우 (같은 _id)
+            except ServerSelectionTimeoutError:
+                raise
+            except (AutoReconnect, NetworkTimeout, WaitQueueTimeoutError):
+                if attempt == self.retry_attempts:
+                    raise
+                MONGO_WRITE_RETRIES.inc(operation=operation)
+                time.sleep(0.1 * 2 ** (attempt - 1))
+
     def insert_result(self, result_data):
+        result_data.setdefault('_id', ObjectId())
+        if self._write_behind is not None:
+            self._write_behind.add(result_data)
+            return
         try:
-            self.inference_results_collection.insert_one(result_data)
+            self._with_retry("insert_result", lambda: self.inference_results_collection.insert_one(result_data))
             print(f"MongoDB 'inference_results'에 문서 삽입 성공.")
         except Exception as e:
             print(f"MongoDB 'inference_results' 문서 삽입 실패: {e}")
             raise
 
     def insert_into_collection(self, collection_name, document):
+        document.setdefault('_id', ObjectId())
         try:
             collection = self.db[collection_name]
-            result = collection.insert_one(document)
-            print(f"MongoDB '{collection_name}' 컬렉션에 문서 삽입 성공: {result.inserted_id}")
-            return result.inserted_id
+            self._with_retry("insert_one", lambda: collection.insert_one(document))
+            print(f"MongoDB '{collection_name}' 컬렉션에 문서 삽입 성공: {document['_id']}")
+            return document['_id']
         except Exception as e:
             print(f"MongoDB '{collection_name}' 문서 삽입 실패: {e}")
             raise
@@ -41,9 +118,131 @@ class MongoDBClient:
     def get_collection(self, collection_name):
         return self.db[collection_name]
 
+    # ✅ 컬렉션별 지연 쓰기 버퍼 (처음 요청할 때 생성, 이후 같은 버퍼 반환) → buffer.add(document)
+    def write_behind_buffer(self, collection_name, batch_size=None, interval=None):
+        with self._buffers_lock:
+            buffer = self._buffers.get(collection_name)
+            if buffer is None:
+                buffer = self._buffers[collection_name] = _WriteBehindBuffer(
+                    self.db[collection_name], batch_size or self.write_behind_batch_size,
+                    interval or self.write_behind_interval, self._with_retry,
+                    dead_letter=self.db[DEAD_LETTER_COLLECTION])
+            return buffer
+
+    # 지연 쓰기 버퍼 즉시 비우기 (종료 시 / 테스트)
+    def flush(self):
+        with self._buffers_lock:
+            buffers = list(self._buffers.values())
+        for buffer in buffers:
+            buffer.flush()
+
+    def pool_stats(self):
+        stats = {"max_pool_size": self.max_pool_size}
+        if self._write_behind is not None:
+            stats["write_behind_pending"] = self._write_behind.pending()
+        return stats
+
     def close(self):
+        self.flush()
         self.client.close()
 
+
+DEAD_LETTER_COLLECTION = "write_behind_dead_letter"
+
+
+class _WriteBehindBuffer:
+    """insert 모음 → 백그라운드 스레드에서 insert_many(ordered=False)
+
+    문서 자체의 오류(검증 실패, 16MB 초과 등)로 실패한 문서는 dead_letter 컬렉션으로 옮기고 버퍼에서 뺌
+    (같은 배치를 계속 재시도하면 뒤의 모든 쓰기가 막히므로), 연결 오류는 다음 주기에 같은 배치를 재시도
+    write concern 오류(복제 확인 실패 등)도 저장 여부를 알 수 없으므로 같은 배치를 재시도
+    (insert_many가 문서에 _id를 채워 두므로 이미 저장된 문서는 중복 키 → 성공 처리)
+    """
+
+    def __init__(self, collection, batch_size, interval, with_retry, max_pending=10000, dead_letter=None):
+        self.collection = collection
+        self.name = collection.name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.dead_letter = dead_letter
+        self._with_retry = with_retry
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        threading.Thread(target=self._loop, name=f"mongo-write-behind-{self.name}", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add(self, document):
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                raise RuntimeError(f"MongoDB 지연 쓰기 버퍼가 가득 찼습니다 ({self.name}).")
+            self._pending.append(document)
+            MONGO_WRITE_BEHIND_PENDING.set(len(self._pending), collection=self.name)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ MongoDB 지연 쓰기 실패, 다음 주기에 재시도: {e}")
+                time.sleep(self.interval)
+
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    return
+                try:
+                    self._with_retry("insert_many", lambda: self.collection.insert_many(batch, ordered=False))
+                except BulkWriteError as e:
+                    # ordered=False: writeErrors에 없는 문서는 저장됨, 중복 _id(재시도로 이미 저장된 문서)는 성공으로 처리
+                    failed = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+                    self._dead_letter(batch, failed)
+                    if e.details.get("writeConcernErrors") or not e.details.get("writeErrors"):
+                        # dead letter로 옮긴 문서만 빼고 배치를 남겨 둠 → 예외로 다음 주기에 재시도
+                        dropped = {id(batch[error["index"]]) for error in failed}
+                        with self._cond:
+                            self._pending[:len(batch)] = [doc for doc in batch if id(doc) not in dropped]
+                        print(f"⚠️ MongoDB '{self.name}' write concern 오류, 배치 {len(batch)}건 재시도 예정: "
+                              f"{e.details.get('writeConcernErrors')}")
+                        raise
+                MONGO_WRITE_BEHIND_FLUSH_SIZE.observe(len(batch), collection=self.name)
+                with self._cond:
+                    del self._pending[:len(batch)]
+                    MONGO_WRITE_BEHIND_PENDING.set(len(self._pending), collection=self.name)
+
+    def _dead_letter(self, batch, errors):
+        for error in errors:
+            document = batch[error["index"]]
+            MONGO_WRITE_BEHIND_DROPPED.inc(collection=self.name)
+            print(f"❌ MongoDB '{self.name}' 문서 저장 실패, dead letter로 이동: {document.get('_id')} "
+                  f"(code {error.get('code')}: {error.get('errmsg')})")
+            if self.dead_letter is None:
+                continue
+            entry = {"collection": self.name, "document_id": document.get("_id"),
+                     "code": error.get("code"), "error": error.get("errmsg")}
+            try:
+                self.dead_letter.insert_one({**entry, "document": document})
+            except Exception:
+                # 문서 자체를 저장할 수 없는 경우(크기 초과 등)는 오류 정보만
+                try:
+                    self.dead_letter.insert_one(entry)
+                except Exception as e:
+                    print(f"⚠️ dead letter 저장 실패 ({self.name}): {e}")
+
+
 # ✅ 환자용 모델 (User)
 class User(db.Model):
     __tablename__ = 'user'
@@ -1,7 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from models.location_model import db, Location
 from models.application_model import ApplicationModel
-from pymongo import MongoClient
 
 application_bp = Blueprint('application', __name__)
 
@@ -1,212 +1,367 @@
-from flask import Blueprint, request, jsonify, current_app as app # current_app 임포트 추가
+from flask import Blueprint, Response, request, jsonify, current_app as app # current_app 임포트 추가
 # import google.generativeai as genai # 이 줄은 필요 없거나 제거 (app.py에서 전역으로 모델 관리)
-from pymongo import MongoClient # 챗봇 API가 직접 DB 접근한다면 필요
+import json
 import time
-import os
 import re # 정규표현식 모듈 임포트
-from datetime import datetime # datetime 모듈 임포트
+from datetime import date
+
+from services.chat_sessions import valid_session_id
+from services.inference_results import find_by_filename, find_on_date
+from services.patient_digest import ENTRY_FIELDS, format_entry, history_text, record_entry
 
 chatbot_bp = Blueprint('chatbot', __name__)
 # genai.configure(api_key="YOUR_GEMINI_API_KEY") # 이 줄은 app.py에서 처리하므로 주석 처리하거나 제거
 
-# 기존 chatbot_reply 함수 (필요에 따라 유지 또는 삭제)
-@chatbot_bp.route('/chatbot', methods=['POST'])
-def chatbot_reply():
-    start_time = time.time()
+# ✅ 답변 캐시 (services/answer_cache.py): 같은 환자 맥락 + 같은 질문이면 LLM 호출 생략 → (답변, 캐시 적중 여부)
+def ask_cached(endpoint, digest, context, message, ask):
+    cache = app.extensions.get('chat_cache')
+    if cache is None:
+        return ask(), False
+    key = cache.key_for(endpoint, app.extensions['gemini_model'], digest, context, message)
+    answer, source = cache.get_or_ask(key, ask)
+    return answer, source != "miss"
 
-    data = request.json
-    user_message = data.get('message')
-    patient_id = data.get('patient_id')
 
-    # MongoDB에서 해당 환자의 가장 최근 기록 가져오기
-    # current_app을 통해 mongo_client 접근
-    mongo_client = app.extensions['mongo_client'] 
-    db = mongo_client.db # MongoDBClient 인스턴스의 db 속성을 사용
-    record = db.inference_results.find_one(
-        {"user_id": patient_id},
-        sort=[("timestamp", -1)]
-    )
+SESSION_BUSY_MESSAGE = "이 대화 세션의 이전 질문에 대한 답변이 아직 진행 중입니다. 잠시 후 다시 시도해 주세요."
+
+
+# ✅ 세션 턴 잠금: CHAT_TURN_LOCK_TIMEOUT_SECONDS 까지만 기다림 (같은 세션의 긴 답변 동안 워커 스레드를 막지 않음)
+def acquire_turn(lock):
+    return lock.acquire(timeout=app.config.get('CHAT_TURN_LOCK_TIMEOUT_SECONDS', 2))
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events):
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ✅ LLM 답변을 SSE로 전달: DB 조회 / 프롬프트 준비는 응답 시작 전에 끝내고, 스트림 동안은 LLM 조각만 전달
+#    conversation(): (start_chat history, 보낼 메시지, 답변 캐시 맥락 - None이면 캐시 사용 안 함)
+#    캐시 적중이면 답변 전체를 'chunk' 1개로 바로 보내고 끝, 끝까지 받은 답변만 캐시에 저장
+#    on_complete(답변, 응답 시간, 캐시 적중 여부): 답변을 끝까지 보낸 뒤 호출 (대화 세션 기록)
+#    lock: 대화 세션 턴 잠금 - conversation()부터 on_complete까지 잡고 있음
+#          (같은 세션의 다음 턴은 제한 시간만 기다리고, 그래도 사용 중이면 'error' 이벤트로 바로 종료)
+#    클라이언트가 연결을 끊으면 제너레이터가 닫히면서 LLM 스트림도 중단 (워커 스레드 바로 반환, 잠금도 해제)
+def stream_answer(endpoint, digest, message, start_time, image_url, conversation, on_complete=None, extra=None,
+                  lock=None):
+    backend = app.extensions['gemini_model']
+    cache = app.extensions.get('chat_cache')
+    logger = app.logger
+    lock_timeout = app.config.get('CHAT_TURN_LOCK_TIMEOUT_SECONDS', 2)
+
+    def generate():
+        first_chunk_time = None
+        cached = None
+        if lock is not None and not lock.acquire(timeout=lock_timeout):
+            yield sse('error', {'error': SESSION_BUSY_MESSAGE, 'busy': True})
+            return
+        # 맥락 준비 / 캐시 / LLM / 턴 기록 중 어디서 실패해도 'error' 이벤트로 끝냄 (잘린 스트림을 남기지 않음)
+        try:
+            history, prompt, context = conversation()
+            key = cache.key_for(endpoint, backend, digest, context, message) \
+                if cache is not None and context is not None else None
+            cached, _ = cache.lookup(key) if key is not None else (None, None)
+            if cached is not None:
+                answer = cached
+                yield sse('chunk', {'text': cached})
+                first_chunk_time = round(time.time() - start_time, 2)
+            else:
+                parts = []
+                for text in backend.start_chat(history=history).stream_message(prompt):
+                    if first_chunk_time is None:
+                        first_chunk_time = round(time.time() - start_time, 2)
+                    parts.append(text)
+                    yield sse('chunk', {'text': text})
+                answer = "".join(parts)
+                if key is not None:
+                    cache.store(key, answer)
+
+            elapsed_time = round(time.time() - start_time, 2)
+            if on_complete is not None:
+                on_complete(answer, elapsed_time, cached is not None)
+        except Exception as e:
+            logger.error(f"챗봇 스트리밍 오류: {str(e)}", exc_info=True)
+            yield sse('error', {'error': str(e)})
+            return
+        finally:
+            if lock is not None:
+                lock.release()
+        yield sse('done', {
+            **(extra or {}),
+            'image_url': image_url,
+            'elapsed_time': elapsed_time,
+            'first_chunk_time': first_chunk_time,
+            'cache_hit': cached is not None,
+        })
+
+    return sse_response(generate())
+
+
+# ✅ /chatbot 프롬프트 맥락: 환자 요약 문서(patient_digests)의 가장 최근 기록 → (요약 문서, 기록 요약 문자열, 이미지 URL)
+def chatbot_context(patient_id):
+    digest = app.extensions['patient_digests'].get(patient_id)
+    record = digest['recent'][0] if digest and digest.get('recent') else None
 
     # 환자 기록 요약 문자열
     if not record:
-        record_text = "환자 기록 없음"
-        image_url = None
-    else:
-        # 모델별 inference_result가 Map으로 저장되어있다고 가정
-        model1_inf = record.get('model1_inference_result', {})
-        model2_inf = record.get('model2_inference_result', {})
-        model3_inf = record.get('model3_inference_result', {})
-
-        model1_label = model1_inf.get('label', '없음')
-        model2_label = model2_inf.get('label', '없음')
-        model3_tooth = model3_inf.get('tooth_number_fdi', '없음')
-
-        record_text = f"""
+        return digest, "환자 기록 없음", None
+
+    model1_label = (record.get('model1') or {}).get('label') or '없음'
+    model2_label = (record.get('model2') or {}).get('label') or '없음'
+    model3_tooth = (record.get('model3') or {}).get('tooth_number_fdi') or '없음'
+
+    record_text = f"""
         • 모델1 진단: {model1_label}
         • 모델2 위생 상태: {model2_label}
         • 모델3 치아 번호: {model3_tooth}
         """
 
-        # 웹 접근 가능한 전체 이미지 URL 생성
-        base_url = "http://192.168.0.19:5000"
-        image_path = record.get("original_image_path", "")
-        image_url = f"{base_url}{image_path}"
+    # 웹 접근 가능한 전체 이미지 URL 생성
+    base_url = "http://192.168.0.19:5000"
+    image_path = record.get("image_path", "")
+    return digest, record_text, f"{base_url}{image_path}"
 
-    # Gemini 모델 호출 (current_app에서 가져옴)
-    gemini_model = app.extensions['gemini_model']
-    chat = gemini_model.start_chat()
 
-    prompt = f"""
+def chatbot_prompt(record_text, user_message):
+    return f"""
     다음은 환자의 최근 치과 진단 기록입니다:\n{record_text}\n\n
     환자가 다음과 같은 질문을 했습니다:\n"{user_message}"\n
     이 질문에 대해 친절하고 정확하게 답변해주세요.
     """
 
-    response = chat.send_message(prompt)
-    reply = response.text
+
+# 기존 chatbot_reply 함수 (필요에 따라 유지 또는 삭제)
+@chatbot_bp.route('/chatbot', methods=['POST'])
+def chatbot_reply():
+    start_time = time.time()
+
+    data = request.json
+    user_message = data.get('message')
+    patient_id = data.get('patient_id')
+
+    digest, record_text, image_url = chatbot_context(patient_id)
+
+    # Gemini 모델 호출 (current_app에서 가져옴)
+    gemini_model = app.extensions['gemini_model']
+    prompt = chatbot_prompt(record_text, user_message)
+
+    def ask():
+        chat = gemini_model.start_chat()
+        return chat.send_message(prompt).text
+
+    reply, cache_hit = ask_cached('chatbot', digest, record_text, user_message, ask)
 
     elapsed_time = round(time.time() - start_time, 2)
-    app.logger.info(f"[⏱️ chatbot_reply] 응답 시간: {elapsed_time}초")
+    app.logger.info(f"[⏱️ chatbot_reply] 응답 시간: {elapsed_time}초{' (캐시 적중)' if cache_hit else ''}")
 
     return jsonify({
         'reply': reply,
         'image_url': image_url,
-        'elapsed_time': elapsed_time
+        'elapsed_time': elapsed_time,
+        'cache_hit': cache_hit
     })
 
 
+# ✅ /chatbot 스트리밍 (SSE): 'chunk' 이벤트로 답변 조각, 마지막 'done' 이벤트에 image_url / 시간
+@chatbot_bp.route('/chatbot/stream', methods=['POST'])
+def chatbot_reply_stream():
+    start_time = time.time()
+
+    data = request.json
+    user_message = data.get('message')
+    patient_id = data.get('patient_id')
+
+    digest, record_text, image_url = chatbot_context(patient_id)
+    prompt = chatbot_prompt(record_text, user_message)
+
+    return stream_answer('chatbot', digest, user_message, start_time, image_url,
+                         lambda: (None, prompt, record_text))
+
+
+# ✅ /api/chat 세션 시스템 맥락: 환자 요약 문서 → 시스템 지시문
+def patient_context(digest):
+    entries = digest.get('recent', []) if digest else []
+    if not entries:
+        return "당신은 치과 챗봇입니다. 일반적인 정보만 제공하며 진단은 하지 않습니다."
+
+    # 최신 기록부터 토큰 예산 안에서 요약
+    history, included = history_text(digest, app.config.get('CHATBOT_HISTORY_TOKEN_BUDGET', 2000))
+
+    return f"""
+            당신은 치과 챗봇입니다. 아래 환자의 총 {digest.get('record_count', len(entries))}건의 진료 기록 중 최근 {included}건을 바탕으로 질문에 답변하세요.
+            제공된 기록은 최신순입니다. 필요하다면 모든 기록을 참조하여 답변하세요.
+            총 진료 기록:
+            {history}
+            """
+
+
+# 특정 요청이 없으면 가장 최신 기록의 이미지 URL 사용
+def latest_image_url(digest):
+    entries = digest.get('recent', []) if digest else []
+    image_path_from_db = entries[0].get('image_path', '') if entries else ''
+    return f"http://192.168.0.19:5000{image_path_from_db}" if image_path_from_db else None
+
+
+# ✅ 메시지의 특정 날짜 또는 파일명 → 해당 기록 1건 (전체 기록을 읽지 않고 인덱스 쿼리로 조회), 없으면 None
+def specific_record(user_id, message):
+    # 1. 사용자 메시지에서 특정 날짜 또는 파일명 파싱
+    target_date_match = re.search(r'(\d{4})\s*[년./-]\s*(\d{1,2})\s*[월./-]\s*(\d{1,2})\s*일?', message)
+    target_filename_match = re.search(r'(\d{14}_web_image\.png|\d{14}_web_image\.jpg)', message)
+
+    # 2. 특정 기록을 찾기 위한 변수
+    records = app.extensions['mongo_client'].get_collection('inference_results')
+    doc = None
+    if target_date_match:
+        try:
+            target_date = date(*(int(part) for part in target_date_match.groups()))
+            doc = find_on_date(records, user_id, target_date, ENTRY_FIELDS)
+        except ValueError:
+            pass
+    elif target_filename_match:
+        doc = find_by_filename(records, user_id, target_filename_match.group(1), ENTRY_FIELDS)
+    return record_entry(doc) if doc else None
+
+
+# ✅ /api/chat 한 턴 준비 → dict (기록이 없을 때 바로 줄 답이면 'reply'만)
+#    세션의 시스템 맥락은 한 번만 만들고 (환자 요약이 바뀌면 교체), 특정 기록 질문은 이번 턴 메시지에만 붙임
+def prepare_chat_turn(user_id, session_id, message):
+    digest = app.extensions['patient_digests'].get(user_id)
+    found_specific_record = specific_record(user_id, message)
+
+    if found_specific_record is None and not (digest and digest.get('recent')) and "진료" in message:
+        return {"reply": "진료 기록이 없습니다. 먼저 등록해 주세요."}
+
+    sessions = app.extensions['chat_sessions']
+    version = digest.get('updated_at') if digest else None
+    session, _ = sessions.get_or_create(user_id, session_id, version, lambda: patient_context(digest))
+    response_image_url = latest_image_url(digest)
+
+    prompt = message
+    if found_specific_record:
+        # 특정 기록이 발견되면 해당 기록의 이미지 사용
+        image_path_from_db = found_specific_record.get('image_path', '')
+        if image_path_from_db:
+            response_image_url = f"http://192.168.0.19:5000{image_path_from_db}"
+        # 특정 기록에 대한 상세 요약
+        prompt = f"""
+            환자가 요청한 특정 진료 기록 ({found_specific_record.get('timestamp')})에 대한 정보입니다:
+            {format_entry(found_specific_record)}
+            이 기록을 바탕으로 다음 질문에 답변하세요.
+            환자 질문: {message}
+            """
+
+    return {
+        "digest": digest,
+        "session": session,
+        "prompt": prompt,
+        "image_url": response_image_url,
+    }
+
+
+# ✅ 세션 턴 잠금(session.turn_lock) 안에서 호출 → (start_chat history, 보낼 메시지, 답변 캐시 맥락 또는 None)
+#    세션 첫 턴만 답변 캐시 사용 (이후 턴은 이전 대화에 따라 답이 달라짐)
+def session_conversation(session, prompt):
+    with session.lock:
+        history = session.history()
+        first_turn = session.turn_count == 0 and not session.summary
+    return history, prompt, (f"{session.context}\n{prompt}" if first_turn else None)
+
+
+def request_session_id(data):
+    session_id = data.get("session_id")
+    if session_id is not None and not valid_session_id(session_id):
+        return None, (jsonify({"error": "잘못된 session_id 입니다."}), 400)
+    return session_id, None
+
+
 # ✅ /api/chat 엔드포인트를 여기로 이동 및 수정
+#    session_id를 보내면 같은 대화 세션 이어가기 (없으면 새 세션, 응답의 session_id를 다음 요청에 사용)
 @chatbot_bp.route("/api/chat", methods=["POST"])
 def chat_with_gemini_moved(): # 함수 이름 충돌 방지를 위해 변경
+    start_time = time.time()
     data = request.json
     user_id = data.get("user_id")
     message = data.get("message")
 
     if not user_id or not message:
         return jsonify({"error": "user_id와 message는 필수입니다."}), 400
+    session_id, error = request_session_id(data)
+    if error:
+        return error
 
     try:
-        mongo_client = app.extensions['mongo_client']
-        db = mongo_client.db
-
-        # 모든 기록을 최신순으로 가져옴
-        records_cursor = db['inference_results'].find({"user_id": user_id}).sort("timestamp", -1)
-        records = list(records_cursor)
-
-        system_instruction = ""
-        response_image_url = None # 챗봇 응답에 포함될 이미지 URL
-
-        # 1. 사용자 메시지에서 특정 날짜 또는 파일명 파싱
-        target_date_match = re.search(r'(\d{4}[년\s.-]?\d{1,2}[월\s.-]?\d{1,2}[일])', message)
-        target_filename_match = re.search(r'(\d{14}_web_image\.png|\d{14}_web_image\.jpg)', message)
-        
-        # 2. 특정 기록을 찾기 위한 변수
-        found_specific_record = None
-        
-        if target_date_match:
-            date_str = target_date_match.group(1)
-            date_str = date_str.replace('년', '').replace('월', '').replace('일', '').replace(' ', '').replace('.', '-')
-            try:
-                target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                for record in records:
-                    record_timestamp_str = record.get('timestamp')
-                    if record_timestamp_str:
-                        record_date = datetime.fromisoformat(record_timestamp_str.replace('Z', '+00:00')).date()
-                        if record_date == target_date:
-                            found_specific_record = record
-                            break
-            except ValueError:
-                pass 
-        elif target_filename_match:
-            target_filename = target_filename_match.group(1)
-            for record in records:
-                original_image_filename = os.path.basename(record.get('original_image_path', ''))
-                if original_image_filename == target_filename:
-                    found_specific_record = record
-                    break
-        
-        # 특정 기록이 발견되면 해당 기록의 이미지 사용
-        if found_specific_record:
-            image_path_from_db = found_specific_record.get('original_image_path', '')
-            if image_path_from_db:
-                response_image_url = f"http://192.168.0.19:5000{image_path_from_db}"
-            
-            # 특정 기록에 대한 상세 요약
-            model1_inf = found_specific_record.get('model1_inference_result', {})
-            model2_inf = found_specific_record.get('model2_inference_result', {})
-            model3_inf = found_specific_record.get('model3_inference_result', {})
-
-            model1_label = model1_inf.get('label', '감지되지 않음')
-            model1_confidence = model1_inf.get('confidence', 0.0)
-            model2_label = model2_inf.get('label', '감지되지 않음')
-            model2_confidence = model2_inf.get('confidence', 0.0)
-            model3_tooth = model3_inf.get('tooth_number_fdi', '감지되지 않음')
-            model3_confidence = model3_inf.get('confidence', 0.0)
-
-            system_instruction = f"""
-            당신은 치과 챗봇입니다. 환자가 요청한 특정 진료 기록 ({found_specific_record.get('timestamp')})에 대한 정보입니다:
-            AI 진단 결과:
-            - 모델1 (질병): {model1_label} (확신도: {model1_confidence:.1%})
-            - 모델2 (위생): {model2_label} (확신도: {model2_confidence:.1%})
-            - 모델3 (치아번호): {model3_tooth} (확신도: {model3_confidence:.1%})
-            의사 코멘트: {found_specific_record.get('doctor_comment', '없음')}
-            이 기록을 바탕으로 환자의 질문에 답변하세요.
-            """
-            
-        elif records:
-            # 모든 기록에 대한 요약 생성
-            all_records_summary = []
-            for i, record in enumerate(records):
-                model1_inf = record.get('model1_inference_result', {})
-                model2_inf = record.get('model2_inference_result', {})
-                model3_inf = record.get('model3_inference_result', {})
-
-                model1_label = model1_inf.get('label', '감지되지 않음')
-                model1_confidence = model1_inf.get('confidence', 0.0)
-
-                model2_label = model2_inf.get('label', '감지되지 않음')
-                model2_confidence = model2_inf.get('confidence', 0.0)
-
-                model3_tooth = model3_inf.get('tooth_number_fdi', '감지되지 않음')
-                model3_confidence = model3_inf.get('confidence', 0.0)
-                
-                record_summary = f"""
-                --- 진단 기록 #{len(records) - i} (날짜: {record.get('timestamp')}) ---
-                AI 진단 결과:
-                - 모델1 (질병): {model1_label} (확신도: {model1_confidence:.1%})
-                - 모델2 (위생): {model2_label} (확신도: {model2_confidence:.1%})
-                - 모델3 (치아번호): {model3_tooth} (확신도: {model3_confidence:.1%})
-                의사 코멘트: {record.get('doctor_comment', '없음')}
-                """
-                all_records_summary.append(record_summary)
-
-            # 특정 요청이 없으면 가장 최신 기록의 이미지 URL 사용
-            latest_record = records[0]
-            image_path_from_db = latest_record.get('original_image_path', '')
-            if image_path_from_db:
-                response_image_url = f"http://192.168.0.19:5000{image_path_from_db}"
-
-            system_instruction = f"""
-            당신은 치과 챗봇입니다. 아래 환자의 총 {len(records)}건의 진료 기록을 바탕으로 질문에 답변하세요.
-            제공된 기록은 최신순입니다. 필요하다면 모든 기록을 참조하여 답변하세요.
-            총 진료 기록:
-            {"\n".join(all_records_summary)}
-            """
-        else:
-            if "진료" in message:
-                return jsonify({"response": "진료 기록이 없습니다. 먼저 등록해 주세요."})
-            system_instruction = "당신은 치과 챗봇입니다. 일반적인 정보만 제공하며 진단은 하지 않습니다."
+        turn = prepare_chat_turn(user_id, session_id, message)
+        if "reply" in turn:
+            return jsonify({"response": turn["reply"]})
 
         # Gemini 모델 호출 (current_app에서 가져옴)
         gemini_model = app.extensions['gemini_model']
-        chat = gemini_model.start_chat(history=[
-            {"role": "user", "parts": [system_instruction]}
-        ])
-        response = chat.send_message(message)
-        response_text = response.text
+        session = turn["session"]
+
+        # 같은 세션의 동시 요청은 한 턴씩: 기록 스냅샷 → LLM 호출 → 턴 기록까지 잠금 유지
+        #   진행 중인 턴이 제한 시간 안에 끝나지 않으면 기다리지 않고 409
+        if not acquire_turn(session.turn_lock):
+            return jsonify({"error": SESSION_BUSY_MESSAGE, "session_id": session.session_id}), 409
+        try:
+            history, prompt, cache_context = session_conversation(session, turn["prompt"])
 
-        return jsonify({"response": response_text, "image_url": response_image_url})
+            def ask():
+                chat = gemini_model.start_chat(history=history)
+                return chat.send_message(prompt).text
+
+            if cache_context is not None:
+                response_text, cache_hit = ask_cached('api_chat', turn["digest"], cache_context, message, ask)
+            else:
+                response_text, cache_hit = ask(), False
+            elapsed_time = round(time.time() - start_time, 2)
+
+            app.extensions['chat_sessions'].add_turn(session, message, response_text, elapsed_time, cache_hit)
+        finally:
+            session.turn_lock.release()
+
+        return jsonify({"response": response_text, "image_url": turn["image_url"], "session_id": session.session_id,
+                        "elapsed_time": elapsed_time, "cache_hit": cache_hit})
 
     except Exception as e:
         app.logger.error(f"Gemini 오류: {str(e)}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+# ✅ /api/chat 스트리밍 (SSE): 이벤트 형식은 /chatbot/stream 과 같음 ('done'에 session_id 추가)
+@chatbot_bp.route("/api/chat/stream", methods=["POST"])
+def chat_with_gemini_stream():
+    start_time = time.time()
+    data = request.json
+    user_id = data.get("user_id")
+    message = data.get("message")
+
+    if not user_id or not message:
+        return jsonify({"error": "user_id와 message는 필수입니다."}), 400
+    session_id, error = request_session_id(data)
+    if error:
+        return error
+
+    try:
+        turn = prepare_chat_turn(user_id, session_id, message)
+    except Exception as e:
+        app.logger.error(f"챗봇 맥락 조회 오류: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+    if "reply" in turn:
+        elapsed_time = round(time.time() - start_time, 2)
+        return sse_response([sse('chunk', {'text': turn["reply"]}),
+                             sse('done', {'image_url': None, 'elapsed_time': elapsed_time,
+                                          'first_chunk_time': elapsed_time, 'cache_hit': False})])
+
+    sessions = app.extensions['chat_sessions']
+    session = turn["session"]
+
+    def on_complete(answer, elapsed_time, cache_hit):
+        sessions.add_turn(session, message, answer, elapsed_time, cache_hit)
+
+    return stream_answer('api_chat', turn["digest"], message, start_time, turn["image_url"],
+                         lambda: session_conversation(session, turn["prompt"]), on_complete=on_complete,
+                         extra={'session_id': session.session_id}, lock=session.turn_lock)
@@ -1,10 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from models.consult_model import ConsultRequest
 from models.model import db, User, Doctor
-from datetime import datetime, timedelta
+from services.consult_stats import ConsultStats, InvalidStatsRange, parse_day
+from datetime import datetime
 
 consult_bp = Blueprint('consult', __name__)
 
+
+def _consult_stats():
+    stats = current_app.extensions.get('consult_stats')
+    return stats if stats is not None else ConsultStats()
+
 # ✅ 1. 신청 등록
 @consult_bp.route('', methods=['POST'])
 def create_consult():
@@ -44,6 +50,7 @@ def create_consult():
             is_replied='N'
         )
         db.session.add(consult)
+        _consult_stats().record_created(request_dt)
         db.session.commit()
 
         print("✅ DB 저장 성공!")
@@ -62,6 +69,7 @@ def cancel_consult():
 
     consult = ConsultRequest.query.get(request_id)
     if consult and consult.is_requested == 'Y' and consult.is_replied == 'N':
+        _consult_stats().record_cancelled(consult.request_datetime)
         db.session.delete(consult)
         db.session.commit()
         print(f"🗑 신청 취소 및 삭제 완료 (request_id={request_id})")
@@ -85,52 +93,53 @@ def doctor_reply():
 
     consult = ConsultRequest.query.get(request_id)
     if consult and consult.is_requested == 'Y':
+        # ✅ 처음 응답할 때만 완료 건수 증가 (코멘트 수정은 제외)
+        if consult.is_replied != 'Y':
+            _consult_stats().record_replied(consult.request_datetime)
         consult.doctor_id = doctor_id
         consult.doctor_comment = comment
         consult.reply_datetime = reply_datetime
         consult.is_replied = 'Y'
         consult.is_requested = 'Y'
         db.session.commit()
+        # ✅ 챗봇용 환자 요약에 의사 코멘트 반영
+        digests = current_app.extensions.get('patient_digests')
+        if digests is not None:
+            digests.add_doctor_comment(consult.user_id, consult.image_path, comment, reply_datetime)
         return jsonify({'message': 'Reply submitted'}), 200
 
     return jsonify({'error': 'Request not found or already completed'}), 400
 
 # ✅ 4. 통계 조회
+#    ?date=YYYYMMDD → 하루 {date, total, completed, pending} (기존 형식)
+#    ?from=YYYYMMDD&to=YYYYMMDD → 일별 목록 {from, to, days: [...], total, completed, pending}
+#    두 경우 모두 일별 GROUP BY 쿼리 1번 (CONSULT_STATS_MATERIALIZED=1 이면 일별 집계 테이블 조회)
 @consult_bp.route('/stats', methods=['GET'])
 def consult_stats():
+    stats = _consult_stats()
     date_str = request.args.get('date')  # 'YYYYMMDD'
 
     try:
-        date_obj = datetime.strptime(date_str, '%Y%m%d')
-        start = datetime.combine(date_obj, datetime.min.time())
-        end = start + timedelta(days=1)
-
-        print(f"▶ start: {start}, end: {end}")
-        for row in ConsultRequest.query.all():
-            print(f"  DB row: {row.request_datetime}")
-
-        all_requests = ConsultRequest.query.filter(
-            ConsultRequest.request_datetime >= start,
-            ConsultRequest.request_datetime < end
-        ).count()
-
-        completed = ConsultRequest.query.filter(
-            ConsultRequest.request_datetime >= start,
-            ConsultRequest.request_datetime < end,
-            ConsultRequest.is_replied == 'Y'
-        ).count()
-
-        pending = all_requests - completed
-
+        if date_str is not None:
+            day = parse_day(date_str)
+            _, summary = stats.series(day, day)
+            return jsonify({'date': date_str, **summary})
+
+        start_day = parse_day(request.args.get('from'))
+        end_day = parse_day(request.args.get('to') or request.args.get('from'))
+        days, summary = stats.series(start_day, end_day)
         return jsonify({
-            'date': date_str,
-            'total': all_requests,
-            'completed': completed,
-            'pending': pending
+            'from': start_day.strftime('%Y%m%d'),
+            'to': end_day.strftime('%Y%m%d'),
+            'days': days,
+            **summary
         })
 
-    except Exception as e:
+    except InvalidStatsRange as e:
         return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ 통계 조회 실패: {e}")
+        return jsonify({'error': str(e)}), 500
 
 # ✅ 5. 진료 신청 리스트 조회 (의사용) - 🔁 오늘 날짜로 필터링 추가
 @consult_bp.route('/list', methods=['GET'])
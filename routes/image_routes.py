@@ -1,10 +1,12 @@
 # C:\Users\sptzk\Desktop\backend0709-1\routes\image_routes.py
 import os
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, abort, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 
 from ai_model.model import perform_inference # AI 모델 임포트
+from services.image_serving import serve_image
+from services.storage import LocalShardedStorage
 # from models.model import MongoDBClient # 이 줄은 이제 필요 없습니다. 아래에서 current_app.extensions를 통해 접근합니다.
 
 # Blueprint 생성
@@ -92,12 +94,19 @@ def upload_image():
     print("❌ [에러] 유효하지 않은 파일 타입") # 로그 추가
     return jsonify({'error': 'Invalid file type'}), 400
 
+# 예전 업로드 폴더 (평면 폴더, 설정이 없으면 404)
+def legacy_folder(config_key):
+    directory = current_app.config.get(config_key)
+    if not directory:
+        abort(404)
+    return LocalShardedStorage({"files": directory}, shard_depth=0)
+
 @image_bp.route('/uploads/<filename>')
 def serve_upload(filename):
-    # 이 경로는 원본 이미지를 웹에서 접근할 수 있게 합니다.
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    # 이 경로는 원본 이미지를 웹에서 접근할 수 있게 합니다. (?w=256 썸네일, ETag / Range 지원)
+    return serve_image(legacy_folder('UPLOAD_FOLDER'), "files", filename, current_app)
 
 @image_bp.route('/processed_uploads/<filename>')
 def serve_processed(filename):
-    # 이 경로는 처리된 이미지를 웹에서 접근할 수 있게 합니다.
-    return send_from_directory(current_app.config['PROCESSED_UPLOAD_FOLDER'], filename)
\ No newline at end of file
+    # 이 경로는 처리된 이미지를 웹에서 접근할 수 있게 합니다. (?w=256 썸네일, ETag / Range 지원)
+    return serve_image(legacy_folder('PROCESSED_UPLOAD_FOLDER'), "files", filename, current_app)
\ No newline at end of file
@@ -1,27 +1,51 @@
 from flask import Blueprint, jsonify, current_app, request
+from ai_model.batching import get_all_stats
+from ai_model.optimize import get_optimization_status
+from ai_model.process_pool import get_pool_stats
+from ai_model.lesion_geometry import with_lesion_points
+from services.inference_results import InvalidQuery, decode_cursor, find_results, parse_date_bound, parse_limit
 
 inference_bp = Blueprint('inference', __name__)
 
+# ✅ 진단 결과 조회 (role=P)
+#    ?user_id=  ?from=2025-07-01&to=2025-07-31 (YYYY-MM-DD 또는 ISO 8601, to 날짜 포함)
+#    ?limit=20&after=<next_after> → {"results": [...최신순], "next_after": 다음 페이지 커서 또는 null}
+#    limit / after가 없으면 예전처럼 문서 배열(시간순) 반환
 @inference_bp.route('/inference-results', methods=['GET'])
 def get_inference_results():
     role = request.args.get('role')
     user_id = request.args.get('user_id')
 
     if role == 'P':
+        include_points = request.args.get('include_points', '').lower() in ('1', 'true', 'yes')
+        paginated = 'limit' in request.args or 'after' in request.args
+        try:
+            date_from = parse_date_bound(request.args.get('from'))
+            date_to = parse_date_bound(request.args.get('to'), end=True)
+            limit = parse_limit(request.args.get('limit')) if paginated else None
+            after = decode_cursor(request.args['after']) if request.args.get('after') else None
+        except InvalidQuery as e:
+            return jsonify({"error": str(e)}), 400
+
         try:
             mongo_client = current_app.extensions.get('mongo_client')
             if not mongo_client:
                 return jsonify({"error": "MongoDB 연결 실패"}), 500
 
             collection = mongo_client.get_collection("inference_results")
-            documents = list(collection.find())
+            documents, next_after = find_results(collection, user_id=user_id, date_from=date_from, date_to=date_to,
+                                                 limit=limit, after=after, include_points=include_points)
 
             for doc in documents:
                 doc["_id"] = str(doc["_id"])
 
-            if user_id:
-                documents = [doc for doc in documents if doc.get("user_id") == user_id]
+            # ✅ ?include_points=1 이면 압축 표현에서 전체 병변 픽셀 목록 복원
+            if include_points:
+                for doc in documents:
+                    doc['model1_inference_result'] = with_lesion_points(doc.get('model1_inference_result'))
 
+            if paginated:
+                return jsonify({"results": documents, "next_after": next_after}), 200
             return jsonify(documents), 200
 
         except Exception as e:
@@ -29,3 +53,13 @@ def get_inference_results():
             return jsonify({"error": "MongoDB 조회 실패"}), 500
 
     return jsonify({"error": "Invalid role"}), 400
+
+# ✅ 모델별 마이크로 배치 스케줄러 통계 (큐 길이, 배치 크기) + 적용된 추론 최적화
+@inference_bp.route('/inference-stats', methods=['GET'])
+def get_inference_stats():
+    stats = get_all_stats()
+    stats["optimization"] = get_optimization_status()
+    stats["process_pool"] = get_pool_stats()
+    result_cache = current_app.extensions.get('result_cache')
+    stats["result_cache"] = result_cache.stats() if result_cache is not None else {"enabled": False}
+    return jsonify(stats), 200
@@ -1,42 +1,58 @@
-import os
-from flask import Blueprint, send_from_directory, current_app
+from flask import Blueprint, abort, jsonify, request, current_app
+
+from services.image_serving import send_image_bytes, send_stored, serve_image
+from services.overlay import FORMATS, format_for_filename
+from services.storage import ORIGINALS, valid_name
 
 static_bp = Blueprint('static', __name__)
 
-# 원본 이미지 제공
+# 원본 이미지 제공 (?w=256 처럼 폭을 주면 썸네일, ETag / Range / 장기 캐시 헤더는 services/image_serving.py)
 @static_bp.route('/images/original/<filename>')
 def serve_original_image(filename):
-    return send_from_directory(
-        current_app.config['UPLOAD_FOLDER_ORIGINAL'],
-        filename
-    )
+    return serve_image(current_app.extensions['storage'], ORIGINALS, filename, current_app)
+
+# ✅ 모델별 오버레이 이미지 제공
+#    예전 업로드처럼 파일이 있으면 그대로, 없으면 저장된 마스크로 렌더링 (?format=webp|jpeg|png, 기본은 파일 확장자)
+def serve_overlay(model_name, filename):
+    fmt = request.args.get('format', '').lower()
+    if fmt and fmt not in FORMATS:
+        return jsonify({'error': f'지원하지 않는 형식: {fmt} (webp, jpeg, png)'}), 400
+
+    # 저장된 마스크 / 예전 오버레이 파일명은 user_id를 그대로 포함(공백, '@', 한글 등)하므로
+    # secure_filename으로 바꾸지 않고 원본 이미지와 같은 기준(경로 구분자 / '..' 거부)으로만 검사
+    if not valid_name(filename):
+        abort(404)
+    if not fmt:
+        legacy = send_stored(current_app.extensions['storage'], model_name, filename, current_app.config)
+        if legacy is not None:
+            return legacy
+
+    rendered = current_app.extensions['overlay_renderer'].render(
+        model_name, filename, fmt or format_for_filename(filename))
+    if rendered is None:
+        abort(404)
+    data, mimetype = rendered
+    return send_image_bytes(data, mimetype, filename, current_app.config)
 
 # 모델 1 마스크 이미지 제공
 @static_bp.route('/images/model1/<filename>')
 def serve_model1_image(filename):
-    return send_from_directory(
-        current_app.config['PROCESSED_FOLDER_MODEL1'],
-        filename
-    )
+    return serve_overlay('model1', filename)
 
 # 모델 2 마스크 이미지 제공
 @static_bp.route('/images/model2/<filename>')
 def serve_model2_image(filename):
-    return send_from_directory(
-        current_app.config['PROCESSED_FOLDER_MODEL2'],
-        filename
-    )
+    return serve_overlay('model2', filename)
 
 # 모델 3 마스크 이미지 제공
 @static_bp.route('/images/model3/<filename>')
 def serve_model3_image(filename):
-    return send_from_directory(
-        current_app.config['PROCESSED_FOLDER_MODEL3'],
-        filename
-    )
+    return serve_overlay('model3', filename)
 
 #이미지 타입            접근 URL 예시
 #원본                   /images/original/파일명.png
 #모델1 마스크	         /images/model1/파일명.png
 #모델2 마스크	         /images/model2/파일명.png
-#모델3 마스크	         /images/model3/파일명.png
\ No newline at end of file
+#모델3 마스크	         /images/model3/파일명.png
+#                       (?format=webp | jpeg | png 로 형식 선택)
+#원본 썸네일            /images/original/파일명.png?w=256 (&format=webp)
\ No newline at end of file
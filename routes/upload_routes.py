@@ -1,19 +1,35 @@
-import os
+import io
 import json
+import time
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
+from PIL import UnidentifiedImageError
 from werkzeug.utils import secure_filename
-from PIL import Image
 
-from ai_model.predictor import predict_overlayed_image              # model1: 질병
-from ai_model import hygiene_predictor, tooth_number_predictor      # model2: 위생, model3: 치아번호
-from models.model import MongoDBClient
+from services.ingest import ImageTooLarge, decode_upload, open_checked, write_original, write_original_async
+from services.upload_service import UploadPaths, process_upload   # model1: 질병, model2: 위생, model3: 치아번호
+from services.upload_jobs import TERMINAL, job_view
+from utils.timing import stage
 
 upload_bp = Blueprint('upload', __name__)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
+# ✅ 전체 lesion_points 픽셀 목록 요청 여부 (?include_points=1)
+def wants_lesion_points():
+    return request.args.get('include_points', '').lower() in ('1', 'true', 'yes')
+
+# ✅ 비동기 처리 여부 (?async=1 또는 form async=1 / ?sync=1 이면 항상 동기 / 기본값은 UPLOAD_ASYNC_DEFAULT)
+def wants_async():
+    truthy = ('1', 'true', 'yes')
+    if request.args.get('sync', '').lower() in truthy:
+        return False
+    flag = request.args.get('async', request.form.get('async', ''))
+    if flag:
+        return flag.lower() in truthy
+    return current_app.config.get('UPLOAD_ASYNC_DEFAULT', False)
+
 @upload_bp.route('/upload_image', methods=['POST'])
 def upload_image_from_flutter():
     return upload_masked_image()
@@ -49,105 +65,96 @@ def upload_masked_image():
         original_filename = secure_filename(file.filename)
         base_name = f"{user_id}_{timestamp}_{original_filename}"
 
-        upload_dir = current_app.config['UPLOAD_FOLDER_ORIGINAL']
-        processed_dir_1 = current_app.config['PROCESSED_FOLDER_MODEL1']
-        processed_dir_2 = current_app.config['PROCESSED_FOLDER_MODEL2']
-        processed_dir_3 = current_app.config['PROCESSED_FOLDER_MODEL3']
-
-        os.makedirs(upload_dir, exist_ok=True)
-        os.makedirs(processed_dir_1, exist_ok=True)
-        os.makedirs(processed_dir_2, exist_ok=True)
-        os.makedirs(processed_dir_3, exist_ok=True)
-
-        # 원본 이미지 저장
-        original_path = os.path.join(upload_dir, base_name)
-        file.save(original_path)
-
-        image = Image.open(original_path).convert("RGB")
-
-        # ✅ model1: 질병 세그멘테이션
-        processed_path_1 = os.path.join(processed_dir_1, base_name)
-        masked_image_1, lesion_points, backend_model_confidence, backend_model_name, disease_label = predict_overlayed_image(image)
-        masked_image_1.save(processed_path_1)
-
-        # ✅ model2: 위생 세그멘테이션
-        processed_path_2 = os.path.join(processed_dir_2, base_name)
-        hygiene_predictor.predict_mask_and_overlay_only(image, processed_path_2)
-        hygiene_class_id, hygiene_conf, hygiene_label = hygiene_predictor.get_main_class_and_confidence_and_label(image)
-
-        # ✅ model3: 치아번호 세그멘테이션
-        processed_path_3 = os.path.join(processed_dir_3, base_name)
-        tooth_number_predictor.predict_mask_and_overlay_only(image, processed_path_3)
-        tooth_info = tooth_number_predictor.get_main_class_info_json(image)
-
-        # ✅ MongoDB 저장
-        mongo_client = MongoDBClient()
-        mongo_client.insert_result({
-            'user_id': user_id,
-            'original_image_path': f"/images/original/{base_name}",
-            'original_image_yolo_detections': yolo_inference_data,
-
-            'model1_image_path': f"/images/model1/{base_name}",
-            'model1_inference_result': {
-                'message': 'model1 마스크 생성 완료',
-                'lesion_points': lesion_points,
-                'confidence': backend_model_confidence,
-                'used_model': backend_model_name,
-                'label': disease_label
-            },
-
-            'model2_image_path': f"/images/model2/{base_name}",
-            'model2_inference_result': {
-                'message': 'model2 마스크 생성 완료',
-                'class_id': hygiene_class_id,
-                'confidence': hygiene_conf,
-                'label': hygiene_label
-            },
-
-            'model3_image_path': f"/images/model3/{base_name}",
-            'model3_inference_result': {
-                'message': 'model3 마스크 생성 완료',
-                'class_id': tooth_info['class_id'],
-                'confidence': tooth_info['confidence'],
-                'tooth_number_fdi': tooth_info['tooth_number_fdi']
-            },
-
-            'timestamp': datetime.now()
-        })
-
-        # ✅ 응답 반환
-        return jsonify({
-            'message': '3개 모델 처리 및 저장 완료',
-            'original_image_path': f"/images/original/{base_name}",
-            'original_image_yolo_detections': yolo_inference_data,
-
-            'model1_image_path': f"/images/model1/{base_name}",
-            'model1_inference_result': {
-                'message': 'model1 마스크 생성 완료',
-                'lesion_points': lesion_points,
-                'confidence': backend_model_confidence,
-                'used_model': backend_model_name,
-                'label': disease_label
-            },
-
-            'model2_image_path': f"/images/model2/{base_name}",
-            'model2_inference_result': {
-                'message': 'model2 마스크 생성 완료',
-                'class_id': hygiene_class_id,
-                'confidence': hygiene_conf,
-                'label': hygiene_label
-            },
-
-            'model3_image_path': f"/images/model3/{base_name}",
-            'model3_inference_result': {
-                'message': 'model3 마스크 생성 완료',
-                'class_id': tooth_info['class_id'],
-                'confidence': tooth_info['confidence'],
-                'tooth_number_fdi': tooth_info['tooth_number_fdi']
-            },
-
-            'timestamp': datetime.now()
-        }), 200
-
+        paths = UploadPaths(base_name)
+        storage = current_app.extensions['storage']
+        original_store = current_app.extensions.get('original_store')
+
+        # ✅ 업로드 버퍼에서 바로 읽기 + 해상도 제한 확인 (헤더만, 디코딩 전)
+        data = file.read()
+        open_checked(io.BytesIO(data))
+
+        # ✅ 비동기 모드: 원본 저장 후 작업 등록, 바로 202 + job_id (결과는 폴링 / SSE)
+        if wants_async():
+            write_original(storage, base_name, data, store=original_store)
+            job_id = current_app.extensions['upload_jobs'].submit(
+                paths, user_id, yolo_inference_data, include_points=wants_lesion_points())
+            response = jsonify({
+                'message': '업로드 접수 완료, 처리 중',
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f"/api/upload_jobs/{job_id}",
+                'events_url': f"/api/upload_jobs/{job_id}/events",
+                'original_image_path': f"/images/original/{base_name}",
+            })
+            response.headers['Location'] = f"/api/upload_jobs/{job_id}"
+            return response, 202
+
+        # ✅ 동기 모드 (기존 응답 형태): 메모리에서 디코딩, 원본 저장은 추론과 동시에
+        with stage("decode"):
+            image = decode_upload(data)
+        original_saved = write_original_async(storage, base_name, data, store=original_store)
+
+        # ✅ 같은 사진 재업로드 / 재시도는 결과 캐시로 추론 생략 (inference_results 문서는 새로 저장)
+        mongo_client = current_app.extensions['mongo_client']
+        response = process_upload(paths, user_id, yolo_inference_data, save_result=mongo_client.insert_result,
+                                  storage=storage, include_points=wants_lesion_points(), image=image,
+                                  cache=current_app.extensions.get('result_cache'),
+                                  digests=current_app.extensions.get('patient_digests'),
+                                  original_saved=original_saved)
+        return jsonify(response), 200
+
+    except ImageTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UnidentifiedImageError:
+        return jsonify({'error': '이미지 파일을 읽을 수 없습니다.'}), 400
     except Exception as e:
         return jsonify({'error': f'서버 처리 중 오류: {str(e)}'}), 500
+
+
+# ✅ 비동기 업로드 작업 상태 / 결과 조회 (status: queued | running | done | failed)
+@upload_bp.route('/upload_jobs/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    job = current_app.extensions['upload_jobs'].get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify(job_view(job)), 200
+
+# ✅ 비동기 업로드 작업 SSE 스트림: 상태가 바뀔 때마다 'status' 이벤트, 끝나면 'result' 또는 'error' 이벤트 후 종료
+@upload_bp.route('/upload_jobs/<job_id>/events', methods=['GET'])
+def stream_upload_job(job_id):
+    jobs = current_app.extensions['upload_jobs']
+    if jobs.get(job_id) is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+
+    poll_seconds = current_app.config.get('UPLOAD_JOB_SSE_POLL_SECONDS', 1.0)
+    timeout_seconds = current_app.config.get('UPLOAD_JOB_SSE_TIMEOUT_SECONDS', 300)
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+    def generate():
+        last_status = None
+        last_sent = time.monotonic()
+        deadline = last_sent + timeout_seconds
+        while time.monotonic() < deadline:
+            job = jobs.get(job_id)
+            if job is None:
+                # 스트리밍 중 TTL 인덱스로 작업 문서가 삭제된 경우
+                yield sse('error', {'job_id': job_id, 'error': '작업을 찾을 수 없습니다.'})
+                return
+            if job['status'] != last_status:
+                last_status = job['status']
+                last_sent = time.monotonic()
+                yield sse('status', {'job_id': job_id, 'status': last_status})
+                if last_status in TERMINAL:
+                    view = job_view(job)
+                    yield sse('result' if last_status == 'done' else 'error', view)
+                    return
+            elif time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            jobs.wait_for_change(poll_seconds)
+        yield sse('timeout', {'job_id': job_id, 'status': last_status})
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
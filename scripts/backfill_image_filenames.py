@@ -0,0 +1,63 @@
+"""
+기존 inference_results 문서에 original_image_filename(업로드 파일명)을 채우는 백필
+(챗봇의 파일명 질문을 (user_id, original_image_filename) 인덱스로 조회하기 위함, 새 문서는 저장 시 채워짐)
+
+실행:
+    python -m scripts.backfill_image_filenames --dry-run   # 대상 수만 확인
+    python -m scripts.backfill_image_filenames
+
+여러 번 실행해도 안전합니다 (필드가 없는 문서만 갱신).
+"""
+import argparse
+import os
+import sys
+
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.inference_results import ensure_indexes, original_filename  # noqa: E402
+from models.model import MongoDBClient  # noqa: E402
+
+BATCH_SIZE = 500
+
+
+def backfill(collection, dry_run=False):
+    query = {
+        "original_image_filename": {"$exists": False},
+        "original_image_path": {"$exists": True},
+    }
+    if dry_run:
+        return collection.count_documents(query)
+
+    updated = 0
+    operations = []
+    cursor = collection.find(query, {"original_image_path": 1, "user_id": 1})
+    for doc in cursor:
+        filename = original_filename(doc.get("original_image_path"), doc.get("user_id"))
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"original_image_filename": filename}}))
+
+        if len(operations) >= BATCH_SIZE:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    mongo_client = MongoDBClient()
+    try:
+        count = backfill(mongo_client.inference_results_collection, dry_run=args.dry_run)
+        if args.dry_run:
+            print(f"🔎 백필 대상 문서: {count}건")
+        else:
+            ensure_indexes(mongo_client.inference_results_collection).join()
+            print(f"✅ original_image_filename 백필 완료: {count}건")
+    finally:
+        mongo_client.close()
@@ -0,0 +1,67 @@
+"""
+기존 inference_results 문서의 model1_inference_result.lesion_points(전체 픽셀 목록)를
+압축 표현(lesion_geometry: 클래스별 RLE / 면적 / bbox)으로 변환하는 마이그레이션
+
+실행:
+    python -m scripts.migrate_lesion_geometry --dry-run      # 변환 대상 수만 확인
+    python -m scripts.migrate_lesion_geometry                # 변환 후 lesion_points 삭제
+    python -m scripts.migrate_lesion_geometry --keep-points  # lesion_points는 남겨둠
+
+기존 문서에는 픽셀별 클래스 정보가 없으므로 클래스 키는 'unknown'으로 저장됩니다.
+"""
+import argparse
+import os
+import sys
+
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_model.lesion_geometry import geometry_from_lesion_points  # noqa: E402
+from models.model import MongoDBClient  # noqa: E402
+
+BATCH_SIZE = 200
+
+
+def migrate(collection, dry_run=False, keep_points=False):
+    query = {
+        "model1_inference_result.lesion_points": {"$exists": True},
+        "model1_inference_result.lesion_geometry": {"$exists": False},
+    }
+    if dry_run:
+        return collection.count_documents(query)
+
+    migrated = 0
+    operations = []
+    cursor = collection.find(query, {"model1_inference_result.lesion_points": 1})
+    for doc in cursor:
+        points = doc["model1_inference_result"].get("lesion_points") or []
+        update = {"$set": {"model1_inference_result.lesion_geometry": geometry_from_lesion_points(points)}}
+        if not keep_points:
+            update["$unset"] = {"model1_inference_result.lesion_points": ""}
+        operations.append(UpdateOne({"_id": doc["_id"]}, update))
+
+        if len(operations) >= BATCH_SIZE:
+            migrated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        migrated += collection.bulk_write(operations, ordered=False).modified_count
+    return migrated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--keep-points", action="store_true")
+    args = parser.parse_args()
+
+    mongo_client = MongoDBClient()
+    try:
+        count = migrate(mongo_client.inference_results_collection, dry_run=args.dry_run, keep_points=args.keep_points)
+        if args.dry_run:
+            print(f"🔎 변환 대상 문서: {count}건")
+        else:
+            print(f"✅ lesion_geometry 변환 완료: {count}건")
+    finally:
+        mongo_client.close()
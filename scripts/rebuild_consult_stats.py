@@ -0,0 +1,30 @@
+"""
+consult_request에서 일별 진료 신청 집계(consult_daily_stats)를 다시 만드는 스크립트
+(CONSULT_STATS_MATERIALIZED=1 사용 시, 집계 테이블을 켜기 전에 쌓인 신청이나 수동 수정 후 맞추기 위함)
+
+실행:
+    python -m scripts.rebuild_consult_stats
+
+여러 번 실행해도 안전합니다 (테이블 전체를 다시 계산).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from config import DevelopmentConfig  # noqa: E402
+from models.model import db  # noqa: E402
+from services.consult_stats import ConsultStats  # noqa: E402
+
+
+if __name__ == '__main__':
+    # MySQL 연결만 필요하므로 앱 전체(모델 로딩 / MongoDB) 대신 SQLAlchemy만 초기화
+    app = Flask(__name__)
+    app.config.from_object(DevelopmentConfig)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        count = ConsultStats.from_config(app.config).rebuild()
+        print(f"✅ 일별 진료 신청 집계 재생성 완료: {count}일")
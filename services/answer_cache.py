@@ -0,0 +1,146 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from utils.metrics import CHAT_CACHE_REQUESTS
+
+# ✅ 챗봇 답변 캐시
+#   - 키: SHA-256(엔드포인트 + LLM 모델 + 환자 요약 버전 + 프롬프트 맥락 + 정규화한 질문)
+#     → 새 진단 결과 / 의사 코멘트로 환자 요약(patient_digests)이 바뀌면 버전과 맥락이 달라져 자동으로 새 답변
+#   - 메모리 LRU(최대 항목 수 + TTL) → MongoDB 'chat_answer_cache'(CHAT_CACHE_MONGO=1, TTL 인덱스) 순서로 조회
+#   - 질문 정규화: 유니코드 NFKC, 소문자, 공백 하나로, 끝의 물음표 / 마침표 등 제거 ("심각한가요?" == "심각한가요 ?")
+
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.~…。？！]+$")
+
+
+def normalize_message(message):
+    text = unicodedata.normalize("NFKC", str(message or "")).lower()
+    text = " ".join(text.split())
+    return TRAILING_PUNCTUATION.sub("", text)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class AnswerCache:
+    def __init__(self, collection=None, max_entries=1024, ttl_seconds=3600):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()        # key → (만료 시각 monotonic, 답변)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, mongo_client, config):
+        collection = mongo_client.get_collection("chat_answer_cache") if config.get('CHAT_CACHE_MONGO', False) else None
+        return cls(
+            collection,
+            max_entries=config.get('CHAT_CACHE_MEMORY_ENTRIES', 1024),
+            ttl_seconds=config.get('CHAT_CACHE_TTL_SECONDS', 3600),
+        )
+
+    # ✅ TTL 인덱스 생성 (백그라운드)
+    def start(self):
+        if self.collection is None:
+            return
+
+        def _init():
+            try:
+                self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl_seconds))
+            except Exception as e:
+                print(f"⚠️ chat_answer_cache 인덱스 생성 실패: {e}")
+
+        threading.Thread(target=_init, name="chat-cache-init", daemon=True).start()
+
+    # digest: 환자 요약 문서 (없으면 None), 업로드 / 의사 응답 때마다 updated_at이 바뀜
+    @staticmethod
+    def key_for(endpoint, backend, digest, context, message):
+        version = digest.get("updated_at") if digest else None
+        model = getattr(backend, "model_name", None) or getattr(backend, "name", "")
+        digest_id = digest.get("_id") if digest else None
+        raw = "\x1f".join([endpoint, str(model), str(digest_id), str(version), context, normalize_message(message)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ✅ 캐시 조회, 없으면 ask() 실행 후 저장 → (답변, 출처: memory | mongo | miss)
+    def get_or_ask(self, key, ask):
+        answer, source = self.lookup(key)
+        if answer is not None:
+            return answer, source
+        answer = ask()
+        self.store(key, answer)
+        return answer, "miss"
+
+    # 스트리밍 응답은 조회 / 저장을 따로 (다 받은 뒤 저장) → (답변 또는 None, 출처)
+    def lookup(self, key):
+        answer = self._get_memory(key)
+        if answer is not None:
+            CHAT_CACHE_REQUESTS.inc(result="hit_memory")
+            return answer, "memory"
+
+        answer = self._get_mongo(key)
+        if answer is not None:
+            self._put_memory(key, answer)
+            CHAT_CACHE_REQUESTS.inc(result="hit_mongo")
+            return answer, "mongo"
+
+        CHAT_CACHE_REQUESTS.inc(result="miss")
+        return None, "miss"
+
+    def store(self, key, answer):
+        self._put_memory(key, answer)
+        self._put_mongo(key, answer)
+
+    def _get_memory(self, key):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            expires, answer = item
+            if expires < time.monotonic():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return answer
+
+    def _put_memory(self, key, answer):
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl_seconds, answer)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # MongoDB 계층 오류는 캐시 미스로 처리 (TTL 인덱스 삭제는 지연될 수 있으므로 created_at도 확인)
+    def _get_mongo(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one({
+                "_id": key,
+                "created_at": {"$gte": _now() - timedelta(seconds=self.ttl_seconds)},
+            })
+        except Exception as e:
+            print(f"⚠️ chat_answer_cache 조회 실패: {e}")
+            return None
+        return doc["answer"] if doc else None
+
+    def _put_mongo(self, key, answer):
+        if self.collection is None:
+            return
+        try:
+            self.collection.replace_one({"_id": key}, {"answer": answer, "created_at": _now()}, upsert=True)
+        except Exception as e:
+            print(f"⚠️ chat_answer_cache 저장 실패: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "mongo": self.collection is not None,
+            }
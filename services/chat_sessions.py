@@ -0,0 +1,224 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from services.patient_digest import estimate_tokens
+
+# ✅ 챗봇 대화 세션 (/api/chat, /api/chat/stream 의 session_id)
+#   - (user_id, session_id)별로 서버 메모리에 보관: 시스템 맥락(환자 기록 요약)은 세션 시작 시 한 번 만들고
+#     환자 요약이 바뀌었을 때만 교체
+#   - 최근 대화는 토큰 예산(CHAT_SESSION_HISTORY_TOKENS) 안에서만 유지, 넘친 이전 대화는 요약으로 접음
+#     (즉시 발췌 요약 → CHAT_SESSION_SUMMARY=llm 이면 백그라운드에서 LLM 요약으로 교체)
+#     → 대화가 길어져도 매 턴 프롬프트 크기 / 응답 시간이 일정
+#   - 대화 기록은 'chat_transcripts'에 모아 쓰기(insert_many), created_at TTL 인덱스로 자동 삭제
+#   - 다른 서버 프로세스에서 만든 세션(메모리에 없음)은 대화 기록의 최근 턴으로 복원
+#   - 오래 쓰지 않은 세션(CHAT_SESSION_IDLE_MINUTES)과 최대 개수(CHAT_SESSION_MAX) 초과분은 메모리에서 제거
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+SUMMARY_PROMPT = (
+    "다음은 치과 챗봇과 환자의 이전 대화입니다. 이후 대화에 필요한 내용(환자의 질문, 증상, 챗봇이 안내한 내용)만 "
+    "{limit}자 이내의 한국어로 요약하세요.\n\n{text}"
+)
+
+
+def valid_session_id(session_id):
+    return isinstance(session_id, str) and bool(SESSION_ID.match(session_id))
+
+
+def _clip(text, limit):
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class ChatSession:
+    def __init__(self, user_id, session_id, context=None, version=None):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.context = context          # 시스템 지시문 (환자 기록 요약)
+        self.version = version          # 맥락을 만든 환자 요약 버전 (patient_digests.updated_at)
+        self.turns = []                 # [{"role": "user" | "model", "text": ...}] 최근 대화
+        self.summary = ""               # 접힌 이전 대화 요약
+        self.turn_count = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()        # 세션 상태(turns / summary) 보호
+        self.turn_lock = threading.Lock()   # 같은 세션의 동시 요청은 한 턴씩 (기록 스냅샷 → LLM 호출 → 턴 기록)
+
+    def history(self):
+        context = self.context or ""
+        if self.summary:
+            context = f"{context}\n\n이전 대화 요약:\n{self.summary}"
+        return [{"role": "user", "parts": [context]}] + \
+            [{"role": turn["role"], "parts": [turn["text"]]} for turn in self.turns]
+
+
+class ChatSessionStore:
+    def __init__(self, transcripts, transcript_buffer=None, history_tokens=1500, summary_tokens=400,
+                 idle_seconds=1800, max_sessions=10000, ttl_seconds=90 * 24 * 3600, summary_mode="extractive",
+                 llm=None):
+        self.transcripts = transcripts                  # chat_transcripts 컬렉션 (복원 / 인덱스)
+        self.transcript_buffer = transcript_buffer      # 모아 쓰기 버퍼 (없으면 바로 insert_one)
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.summary_mode = summary_mode
+        self.llm = llm
+        self._sessions = OrderedDict()      # (user_id, session_id) → ChatSession (오래 안 쓴 순)
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary") \
+            if summary_mode == "llm" and llm is not None else None
+
+    @classmethod
+    def from_config(cls, mongo_client, config, llm=None):
+        return cls(
+            mongo_client.get_collection("chat_transcripts"),
+            transcript_buffer=mongo_client.write_behind_buffer("chat_transcripts"),
+            history_tokens=config.get('CHAT_SESSION_HISTORY_TOKENS', 1500),
+            summary_tokens=config.get('CHAT_SESSION_SUMMARY_TOKENS', 400),
+            idle_seconds=config.get('CHAT_SESSION_IDLE_MINUTES', 30) * 60,
+            max_sessions=config.get('CHAT_SESSION_MAX', 10000),
+            ttl_seconds=config.get('CHAT_TRANSCRIPT_TTL_DAYS', 90) * 24 * 3600,
+            summary_mode=(config.get('CHAT_SESSION_SUMMARY') or 'extractive').lower(),
+            llm=llm,
+        )
+
+    # ✅ 인덱스 생성 (백그라운드): 세션 복원용 + TTL
+    def start(self):
+        def _init():
+            try:
+                self.transcripts.create_index([("user_id", 1), ("session_id", 1), ("turn", -1)])
+                self.transcripts.create_index("created_at", expireAfterSeconds=int(self.ttl_seconds))
+            except Exception as e:
+                print(f"⚠️ chat_transcripts 인덱스 생성 실패: {e}")
+
+        threading.Thread(target=_init, name="chat-sessions-init", daemon=True).start()
+
+    # ✅ 세션 조회 / 생성 → (세션, 새로 만들었는지), session_id가 없으면 새 ID 발급
+    #    context_factory(): 환자 기록 맥락 (세션 시작 / 환자 요약이 바뀐 경우에만 호출)
+    def get_or_create(self, user_id, session_id, version, context_factory):
+        created = False
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get((user_id, session_id)) if session_id else None
+            if session is None:
+                created = not session_id
+                session = ChatSession(user_id, session_id or uuid.uuid4().hex)
+                self._sessions[(user_id, session.session_id)] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end((user_id, session_id))
+            session.last_used = time.monotonic()
+
+        with session.lock:
+            if not created and session.turn_count == 0 and session.context is None:
+                self._restore(session)
+            if session.context is None or session.version != version:
+                session.context = context_factory()
+                session.version = version
+        return session, created
+
+    def _evict_idle(self):
+        deadline = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.last_used >= deadline:
+                break
+            del self._sessions[key]
+
+    # 메모리에 없는 세션: 대화 기록의 최근 턴으로 복원 (예산 안에 들어가는 만큼)
+    def _restore(self, session):
+        try:
+            cursor = self.transcripts.find(
+                {"user_id": session.user_id, "session_id": session.session_id},
+                {"turn": 1, "question": 1, "answer": 1},
+            ).sort("turn", -1).limit(20)
+            docs = list(cursor)
+        except Exception as e:
+            print(f"⚠️ 대화 세션 복원 실패 ({session.session_id}): {e}")
+            return
+        if not docs:
+            return
+        session.turn_count = docs[0]["turn"]
+        for doc in reversed(docs):
+            session.turns.append({"role": "user", "text": doc["question"]})
+            session.turns.append({"role": "model", "text": doc["answer"]})
+        self._compact(session)
+
+    # ✅ 턴 기록: 최근 대화에 추가 → 예산 초과분 요약으로 접기 → 대화 기록 모아 쓰기
+    def add_turn(self, session, question, answer, elapsed_time=None, cache_hit=False):
+        with session.lock:
+            session.turn_count += 1
+            session.turns.append({"role": "user", "text": question})
+            session.turns.append({"role": "model", "text": answer})
+            session.last_used = time.monotonic()
+            turn = session.turn_count
+            self._compact(session)
+
+        document = {
+            "user_id": session.user_id,
+            "session_id": session.session_id,
+            "turn": turn,
+            "question": question,
+            "answer": answer,
+            "elapsed_time": elapsed_time,
+            "cache_hit": cache_hit,
+            "created_at": datetime.now(timezone.utc),
+        }
+        try:
+            if self.transcript_buffer is not None:
+                self.transcript_buffer.add(document)
+            else:
+                self.transcripts.insert_one(document)
+        except Exception as e:
+            print(f"⚠️ 대화 기록 저장 실패 ({session.session_id}): {e}")
+
+    # 최근 대화가 예산을 넘으면 오래된 질문 / 답변 쌍부터 요약으로 (session.lock 안에서 호출)
+    def _compact(self, session):
+        used = sum(estimate_tokens(turn["text"]) for turn in session.turns)
+        folded = []
+        while len(session.turns) > 2 and used > self.history_tokens:
+            pair, session.turns = session.turns[:2], session.turns[2:]
+            used -= sum(estimate_tokens(turn["text"]) for turn in pair)
+            folded.append(pair)
+        if not folded:
+            return
+
+        lines = [f"- 환자: {_clip(q['text'], 80)} / 챗봇: {_clip(a['text'], 120)}" for q, a in folded]
+        session.summary = self._fit_summary(session.summary, lines)
+        if self._summarizer is not None:
+            self._summarizer.submit(self._summarize_with_llm, session, session.summary)
+
+    # 발췌 요약: 새 줄을 붙이고 예산을 넘으면 오래된 줄부터 버림
+    def _fit_summary(self, summary, lines):
+        all_lines = [line for line in summary.split("\n") if line] + lines
+        while len(all_lines) > 1 and estimate_tokens("\n".join(all_lines)) > self.summary_tokens:
+            all_lines.pop(0)
+        return "\n".join(all_lines)
+
+    # ✅ LLM 요약 (백그라운드): 요약하는 동안 세션 요약이 또 바뀌었으면 버림
+    def _summarize_with_llm(self, session, source):
+        limit = self.summary_tokens     # 한글은 글자당 약 1토큰
+        try:
+            chat = self.llm.start_chat()
+            text = chat.send_message(SUMMARY_PROMPT.format(limit=limit, text=source)).text.strip()
+        except Exception as e:
+            print(f"⚠️ 대화 요약 실패, 발췌 요약 유지: {e}")
+            return
+        with session.lock:
+            if session.summary == source and text:
+                session.summary = _clip(text, limit)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "history_tokens": self.history_tokens,
+                "summary_mode": self.summary_mode if self._summarizer is not None else "extractive",
+            }
@@ -0,0 +1,149 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+
+from models.consult_model import ConsultDailyStats, ConsultRequest
+from models.model import db
+
+# ✅ 진료 신청 통계 (GET /api/consult/stats?date= 또는 ?from=&to=)
+#   - 하루 / 기간 모두 일별 GROUP BY 쿼리 1번 (total, completed 합계, pending = total - completed)
+#   - materialized=True(CONSULT_STATS_MATERIALIZED=1)이면 일별 집계 테이블 'consult_daily_stats'를
+#     신청 / 취소 / 의사 응답과 같은 트랜잭션에서 갱신하고 통계는 이 테이블에서 읽음 (조회 비용이 일수에 비례)
+#   - 집계 테이블이 비어 있으면 시작 시 consult_request에서 한 번 채움 (python -m scripts.rebuild_consult_stats 로 재생성)
+
+
+class InvalidStatsRange(ValueError):
+    pass
+
+
+# 'YYYYMMDD' (기존 형식) 또는 'YYYY-MM-DD'
+def parse_day(value):
+    for fmt in ('%Y%m%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value or '', fmt).date()
+        except ValueError:
+            continue
+    raise InvalidStatsRange(f"잘못된 날짜 형식: {value} (YYYYMMDD)")
+
+
+# request_datetime은 문자열 컬럼('YYYY-MM-DD HH:MM:SS'), 저장 직후에는 datetime일 수도 있음 / DB의 DATE()는 date 또는 문자열
+def to_day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def day_view(day, total, completed):
+    return {
+        'date': day.strftime('%Y%m%d'),
+        'total': total,
+        'completed': completed,
+        'pending': total - completed,
+    }
+
+
+def _grouped_counts():
+    day = func.date(ConsultRequest.request_datetime)
+    return db.session.query(
+        day,
+        func.count(ConsultRequest.id),
+        func.sum(case((ConsultRequest.is_replied == 'Y', 1), else_=0)),
+    ).group_by(day)
+
+
+class ConsultStats:
+    def __init__(self, materialized=False, max_days=366):
+        self.materialized = materialized
+        self.max_days = max_days
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            materialized=config.get('CONSULT_STATS_MATERIALIZED', False),
+            max_days=config.get('CONSULT_STATS_MAX_DAYS', 366),
+        )
+
+    # ✅ 집계 테이블이 비어 있으면 기존 신청에서 생성 (app context 안에서 호출)
+    def start(self):
+        if not self.materialized:
+            return
+        try:
+            if ConsultDailyStats.query.first() is None and ConsultRequest.query.first() is not None:
+                print(f"✅ 일별 진료 신청 집계 생성: {self.rebuild()}일")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ 일별 진료 신청 집계 생성 실패: {e}")
+
+    # ✅ 기간 통계 → (일별 목록, 기간 합계), 신청이 없는 날은 0
+    def series(self, start_day, end_day):
+        if end_day < start_day:
+            raise InvalidStatsRange("to는 from과 같거나 이후 날짜여야 합니다")
+        if (end_day - start_day).days + 1 > self.max_days:
+            raise InvalidStatsRange(f"조회 기간은 최대 {self.max_days}일입니다")
+
+        counts = self._materialized_counts(start_day, end_day) if self.materialized \
+            else self._aggregate_counts(start_day, end_day)
+        days = []
+        day = start_day
+        while day <= end_day:
+            days.append(day_view(day, *counts.get(day, (0, 0))))
+            day += timedelta(days=1)
+        total = sum(d['total'] for d in days)
+        completed = sum(d['completed'] for d in days)
+        return days, {'total': total, 'completed': completed, 'pending': total - completed}
+
+    # consult_request 일별 GROUP BY (기간 조건은 request_datetime 범위로 → 인덱스 사용 가능)
+    def _aggregate_counts(self, start_day, end_day):
+        start = datetime.combine(start_day, datetime.min.time())
+        end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        rows = _grouped_counts().filter(
+            ConsultRequest.request_datetime >= start,
+            ConsultRequest.request_datetime < end,
+        ).all()
+        return {to_day(d): (int(total), int(completed or 0)) for d, total, completed in rows}
+
+    def _materialized_counts(self, start_day, end_day):
+        rows = ConsultDailyStats.query.filter(
+            ConsultDailyStats.day >= start_day,
+            ConsultDailyStats.day <= end_day,
+        ).all()
+        return {row.day: (row.total, row.completed) for row in rows}
+
+    # ✅ 신청 / 취소 / 의사 응답 시 집계 갱신 (commit은 호출한 쪽에서, 같은 트랜잭션)
+    def record_created(self, request_datetime):
+        if self.materialized:
+            self._bump(to_day(request_datetime), total=1)
+
+    def record_cancelled(self, request_datetime):
+        if self.materialized:
+            self._bump(to_day(request_datetime), total=-1)
+
+    def record_replied(self, request_datetime):
+        if self.materialized:
+            self._bump(to_day(request_datetime), completed=1)
+
+    def _bump(self, day, total=0, completed=0):
+        changes = {
+            ConsultDailyStats.total: ConsultDailyStats.total + total,
+            ConsultDailyStats.completed: ConsultDailyStats.completed + completed,
+        }
+        if ConsultDailyStats.query.filter_by(day=day).update(changes, synchronize_session=False):
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(ConsultDailyStats(day=day, total=total, completed=completed))
+        except IntegrityError:
+            # 같은 날 첫 신청이 동시에 들어온 경우: 먼저 만들어진 행에 더함
+            ConsultDailyStats.query.filter_by(day=day).update(changes, synchronize_session=False)
+
+    # ✅ consult_request 전체에서 집계 테이블 다시 만들기 → 집계된 일수
+    def rebuild(self):
+        rows = [(to_day(d), int(total), int(completed or 0)) for d, total, completed in _grouped_counts().all()
+                if d is not None]
+        ConsultDailyStats.query.delete()
+        db.session.add_all([ConsultDailyStats(day=d, total=total, completed=completed) for d, total, completed in rows])
+        db.session.commit()
+        return len(rows)
@@ -0,0 +1,208 @@
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, abort, jsonify, request, send_file
+from PIL import Image, ImageOps
+from werkzeug.datastructures import ContentRange
+
+from services.ingest import open_checked
+from services.overlay import FORMATS, OverlayCache
+from services.storage import valid_name
+from utils.metrics import THUMBNAIL_REQUESTS
+
+# ✅ /images/* 이미지 응답 공통 처리
+#   - 강한 ETag: 파일 / 렌더링 결과 내용의 SHA-256 (파일은 경로 + 수정 시각 + 크기 기준으로 해시 재사용)
+#   - If-None-Match → 304, Range → 206 (로컬 파일 / 메모리 bytes는 werkzeug make_conditional,
+#     원격 저장소(S3)는 요청 범위만 받아 스트리밍)
+#   - 업로드 파일명(<user_id>_<20자리 타임스탬프>_<파일명>)은 한 번 쓰면 바뀌지 않으므로 immutable 장기 캐시,
+#     그 외 이름(예전 /uploads 등)은 no-cache + ETag 재검증
+#   - ?w=<폭> 썸네일: 설정된 폭(IMAGE_THUMBNAIL_WIDTHS) 중 요청 이상인 가장 작은 값으로 맞춰 생성,
+#     썸네일 전용 메모리 / 디스크 LRU 캐시에 저장 (원본은 그대로 보관)
+#     바뀔 수 있는 이름은 원본 ETag를 캐시 키에 포함 (원본을 덮어쓰면 새 썸네일)
+
+IMMUTABLE_NAME = re.compile(r"^.+_\d{20}_.+$")
+ONE_YEAR = 365 * 24 * 3600
+
+
+def is_immutable_name(filename):
+    return bool(IMMUTABLE_NAME.match(filename))
+
+
+def content_etag(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class FileETags:
+    """파일 내용 해시 캐시: (inode, 수정 시각, 크기)가 같으면 다시 읽지 않음"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        etag = digest.hexdigest()[:32]
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[path] = (signature, etag)
+        return etag
+
+
+_file_etags = FileETags()
+
+
+# ✅ 저장된 파일(StoredObject)의 ETag: 로컬 파일은 내용 해시, 원격 저장소는 저장소 ETag (없으면 크기 + 수정 시각)
+def stored_etag(stored):
+    if stored.path is not None:
+        return _file_etags.get(stored.path)
+    return stored.etag or f"{stored.size}-{int(stored.mtime or 0)}"
+
+
+def apply_cache_headers(response, filename, config):
+    scope = "private" if config.get('IMAGE_CACHE_PRIVATE', True) else "public"
+    if is_immutable_name(filename):
+        max_age = config.get('IMAGE_CACHE_MAX_AGE', ONE_YEAR)
+        response.headers['Cache-Control'] = f"{scope}, max-age={max_age}, immutable"
+    else:
+        response.headers['Cache-Control'] = f"{scope}, no-cache"
+    return response
+
+
+# ✅ 저장소 파일 응답 (조건부 요청 / Range 지원), 파일이 없으면 None
+def send_stored(storage, category, filename, config):
+    stored = storage.stat(category, filename)
+    if stored is None:
+        return None
+    if stored.path is not None:
+        response = send_file(stored.path, etag=stored_etag(stored), conditional=True)
+        return apply_cache_headers(response, filename, config)
+
+    # 원격 저장소: 본문을 메모리에 모으지 않고 청크 단위로 전달
+    etag = stored_etag(stored)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif request.range is not None:
+        byte_range = request.range.range_for_length(stored.size)
+        if byte_range is None:
+            response = Response(status=416)
+            response.content_range = ContentRange("bytes", None, None, stored.size)
+        else:
+            start, stop = byte_range
+            response = Response(storage.iter_chunks(category, filename, start, stop - 1), status=206,
+                                mimetype=mimetype)
+            response.content_range = ContentRange("bytes", start, stop, stored.size)
+            response.content_length = stop - start
+    else:
+        response = Response(storage.iter_chunks(category, filename), mimetype=mimetype)
+        response.content_length = stored.size
+    response.set_etag(etag)
+    response.accept_ranges = "bytes"
+    if stored.mtime:
+        response.last_modified = stored.mtime
+    return apply_cache_headers(response, filename, config)
+
+
+# ✅ 메모리에서 만든 이미지 응답 (렌더링된 오버레이, 썸네일)
+def send_image_bytes(data, mimetype, filename, config):
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(content_etag(data))
+    response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    return apply_cache_headers(response, filename, config)
+
+
+# ✅ 썸네일 생성 ==============================================================
+class ThumbnailRenderer:
+    def __init__(self, widths, cache, quality=80):
+        self.widths = sorted(widths)
+        self.cache = cache
+        self.quality = quality
+
+    @classmethod
+    def from_config(cls, config):
+        widths = [int(w) for w in str(config.get('IMAGE_THUMBNAIL_WIDTHS', '128,256,512')).split(',') if w.strip()]
+        cache = OverlayCache(
+            memory_bytes=config.get('THUMBNAIL_CACHE_MEMORY_MB', 32) * 1024 * 1024,
+            disk_dir=config.get('THUMBNAIL_CACHE_DIR'),
+            disk_bytes=config.get('THUMBNAIL_CACHE_DISK_MB', 512) * 1024 * 1024,
+        )
+        return cls(widths, cache, quality=config.get('THUMBNAIL_QUALITY', 80))
+
+    # 임의 폭 요청으로 캐시가 불어나지 않도록 설정된 폭으로 올림 (가장 큰 폭 초과는 가장 큰 폭)
+    def snap_width(self, width):
+        for candidate in self.widths:
+            if candidate >= width:
+                return candidate
+        return self.widths[-1]
+
+    # ✅ (인코딩된 썸네일 bytes, MIME 타입) 반환, 원본이 요청 폭 이하이면 None (원본 그대로 제공)
+    def render(self, storage, category, filename, width, fmt):
+        pil_format, mimetype, _ = FORMATS[fmt]
+        key = ("thumb", category, filename, str(width), pil_format, str(self.quality))
+        if not is_immutable_name(filename):
+            # 예전 /uploads 등 덮어쓸 수 있는 이름: 원본이 바뀌면 다른 키 (이전 썸네일을 계속 주지 않음)
+            stored = storage.stat(category, filename)
+            key += (stored_etag(stored) if stored is not None else "missing",)
+
+        data, source = self.cache.get(key)
+        if data is not None:
+            THUMBNAIL_REQUESTS.inc(source=source)
+            return data, mimetype
+
+        with storage.open_seekable(category, filename) as f:
+            img = open_checked(f)
+            if max(img.size) <= width:
+                return None
+            if img.format == "JPEG":
+                img.draft("RGB", (width, width))     # DCT 단계 축소 디코딩 (회전돼도 가로가 width 이상 남도록 양쪽 기준)
+            img = ImageOps.exif_transpose(img)       # 원본 표시와 같은 방향 (EXIF 회전 정보 반영)
+            if img.width <= width:
+                return None
+            img = img.convert("RGBA" if pil_format != "JPEG" and "A" in img.getbands() else "RGB")
+        img.thumbnail((width, width * 10), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        options = {"quality": self.quality} if pil_format in ("WEBP", "JPEG") else {}
+        img.save(buffer, format=pil_format, **options)
+        data = buffer.getvalue()
+
+        self.cache.put(key, data)
+        THUMBNAIL_REQUESTS.inc(source="render")
+        return data, mimetype
+
+
+# ✅ 원본 계열 이미지 라우트 공통 처리: ?w=<폭> 썸네일 (&format=webp|jpeg|png, 기본 jpeg), 없으면 파일 그대로
+def serve_image(storage, category, filename, app):
+    if not valid_name(filename) or not storage.exists(category, filename):
+        abort(404)
+
+    width = request.args.get('w', '')
+    if width:
+        if not width.isdigit() or int(width) <= 0:
+            return jsonify({'error': f'잘못된 썸네일 폭: {width}'}), 400
+        fmt = request.args.get('format', 'jpeg').lower()
+        if fmt not in FORMATS:
+            return jsonify({'error': f'지원하지 않는 형식: {fmt} (webp, jpeg, png)'}), 400
+        thumbnails = app.extensions['thumbnail_renderer']
+        rendered = thumbnails.render(storage, category, filename, thumbnails.snap_width(int(width)), fmt)
+        if rendered is not None:
+            data, mimetype = rendered
+            return send_image_bytes(data, mimetype, filename, app.config)
+
+    return send_stored(storage, category, filename, app.config)
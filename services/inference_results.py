@@ -0,0 +1,157 @@
+import base64
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# ✅ inference_results 조회 (GET /api/inference-results)
+#   - user_id / 날짜 범위 조건은 MongoDB 쿼리로 전달, (user_id, timestamp, _id) 복합 인덱스 사용
+#   - 무거운 필드(예전 문서의 전체 병변 픽셀 목록 lesion_points)는 projection으로 제외 (?include_points=1 일 때만 포함)
+#   - limit / after 커서 페이지네이션: 최신순, 커서 = 마지막 문서의 (timestamp, _id) → 건너뛰기(skip) 없이 인덱스로 이어 읽기
+#   - 챗봇의 날짜 / 파일명 질문: (user_id, timestamp) 범위 쿼리, (user_id, original_image_filename) 조회 → 기록 수와 무관하게 1건만 읽음
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+HEAVY_FIELDS = ("model1_inference_result.lesion_points",)
+
+# (키, 옵션): upload_job_id는 비동기 업로드 결과 upsert 조회용 + 재실행 시 중복 저장 방지 (동기 업로드 문서에는 없음)
+INDEXES = (
+    ([("user_id", 1), ("timestamp", -1), ("_id", -1)], {}),
+    ([("timestamp", -1), ("_id", -1)], {}),
+    ([("user_id", 1), ("original_image_filename", 1)], {}),
+    ([("upload_job_id", 1)], {"unique": True, "sparse": True}),
+)
+
+UPLOAD_NAME = re.compile(r"^_\d{20}_(.+)$")
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+# ✅ 서버 시작 시 인덱스 생성 (MongoDB 연결이 늦어도 서버 시작을 막지 않도록 백그라운드)
+def ensure_indexes(collection):
+    def _create():
+        for keys, options in INDEXES:
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                print(f"⚠️ inference_results 인덱스 생성 실패 ({keys}): {e}")
+
+    thread = threading.Thread(target=_create, name="inference-results-indexes", daemon=True)
+    thread.start()
+    return thread
+
+
+def encode_cursor(doc):
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, object_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise InvalidQuery(f"잘못된 커서: {cursor}") from e
+
+
+# ✅ 날짜(YYYY-MM-DD) 또는 날짜+시각(ISO 8601) → datetime, 날짜만 주면 end=True 일 때 다음 날 0시 (그날 포함)
+def parse_date_bound(value, end=False):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise InvalidQuery(f"잘못된 날짜 형식: {value} (YYYY-MM-DD 또는 ISO 8601)") from e
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)     # timestamp는 서버 로컬 시각(naive)으로 저장됨
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_limit(value):
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    if not value.isdigit() or int(value) <= 0:
+        raise InvalidQuery(f"잘못된 limit: {value}")
+    return min(int(value), MAX_PAGE_SIZE)
+
+
+def build_query(user_id=None, date_from=None, date_to=None, after=None):
+    clauses = []
+    if user_id:
+        clauses.append({"user_id": user_id})
+    time_range = {}
+    if date_from is not None:
+        time_range["$gte"] = date_from
+    if date_to is not None:
+        time_range["$lt"] = date_to
+    if time_range:
+        clauses.append({"timestamp": time_range})
+    if after is not None:
+        timestamp, object_id = after
+        clauses.append({"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": object_id}},
+        ]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def projection(include_points=False):
+    if include_points:
+        return None
+    return {field: 0 for field in HEAVY_FIELDS}
+
+
+# ✅ 조건에 맞는 문서 조회 → (문서 목록, 다음 페이지 커서 또는 None)
+#    limit=None 이면 페이지 구분 없이 전체 (예전 응답 형태, 시간순)
+def find_results(collection, user_id=None, date_from=None, date_to=None, limit=None, after=None,
+                 include_points=False):
+    query = build_query(user_id, date_from, date_to, after)
+    if limit is None:
+        cursor = collection.find(query, projection(include_points)).sort([("timestamp", 1), ("_id", 1)])
+        return list(cursor), None
+
+    cursor = collection.find(query, projection(include_points)) \
+        .sort([("timestamp", -1), ("_id", -1)]) \
+        .limit(limit + 1)
+    documents = list(cursor)
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_after = encode_cursor(documents[-1]) if has_more and documents else None
+    return documents, next_after
+
+
+# ✅ 저장 파일명(<user_id>_<20자리 타임스탬프>_<업로드 파일명>) → 업로드 파일명 (형식이 다르면 파일명 그대로)
+def original_filename(image_path, user_id):
+    name = os.path.basename(image_path or '')
+    prefix = f"{user_id}"
+    if user_id is not None and name.startswith(prefix):
+        match = UPLOAD_NAME.match(name[len(prefix):])
+        if match:
+            return match.group(1)
+    return name
+
+
+# ✅ 해당 날짜(서버 로컬 시각 기준 하루)의 가장 최근 기록 1건
+def find_on_date(collection, user_id, day, fields=None):
+    start = datetime.combine(day, datetime.min.time())
+    query = build_query(user_id, start, start + timedelta(days=1))
+    docs = list(collection.find(query, fields).sort([("timestamp", -1), ("_id", -1)]).limit(1))
+    return docs[0] if docs else None
+
+
+# ✅ 업로드 파일명(예: 20250701093000_web_image.png)으로 가장 최근 기록 1건
+def find_by_filename(collection, user_id, filename, fields=None):
+    docs = list(collection.find({"user_id": user_id, "original_image_filename": filename}, fields)
+                .sort([("timestamp", -1), ("_id", -1)]).limit(1))
+    return docs[0] if docs else None
@@ -0,0 +1,58 @@
+import contextvars
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from ai_model.pipeline import INPUT_SIZE
+from services.storage import ORIGINALS
+from utils.timing import stage
+
+# ✅ 업로드 이미지 수신 단계
+#   - 업로드 버퍼(메모리)에서 바로 디코딩 (저장 후 다시 읽지 않음)
+#   - JPEG는 draft()로 DCT 단계에서 축소 디코딩 (모델 입력 224x224의 DRAFT_SCALE배 이상 크기로)
+#   - 헤더의 가로x세로로 최대 픽셀 수를 먼저 확인 (디컴프레션 폭탄 방지, 디코딩 전에 거절)
+#   - 원본 파일 쓰기는 별도 스레드에서 추론과 동시에 진행 (업로드 바이트를 그대로 저장, 재인코딩 없음)
+#   - 원본은 저장소 백엔드(services/storage.py)에 저장, store(OriginalStore)를 넘기면 같은 내용의 원본은 기존 파일 재사용
+
+MAX_UPLOAD_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", str(50_000_000)))
+DRAFT_SCALE = int(os.getenv("UPLOAD_DRAFT_SCALE", "2"))     # 0이면 draft 사용 안 함 (전체 해상도 디코딩)
+
+_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="original-writer")
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+# ✅ 헤더만 읽어 크기 확인 (픽셀 데이터는 아직 디코딩하지 않음)
+def open_checked(source, max_pixels=MAX_UPLOAD_PIXELS):
+    img = Image.open(source)
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"이미지 해상도가 너무 큽니다: {width}x{height} (최대 {max_pixels} 픽셀)")
+    return img
+
+
+# ✅ 업로드 바이트 → RGB 이미지 (JPEG는 모델 입력에 가까운 크기로 축소 디코딩)
+def decode_upload(data, max_pixels=MAX_UPLOAD_PIXELS, draft_scale=DRAFT_SCALE):
+    source = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    img = open_checked(source, max_pixels)
+    if draft_scale and img.format == "JPEG":
+        img.draft("RGB", (INPUT_SIZE[0] * draft_scale, INPUT_SIZE[1] * draft_scale))
+    return img.convert("RGB")
+
+
+def write_original(storage, name, data, store=None):
+    with stage("file_save"):
+        if store is not None:
+            store.save(storage, name, data)
+        else:
+            storage.write_bytes(ORIGINALS, name, data)
+    return name
+
+
+# ✅ 원본 저장을 백그라운드에서 시작 → Future (응답 전에 result()로 완료 확인)
+def write_original_async(storage, name, data, store=None):
+    return _writer.submit(contextvars.copy_context().run, write_original, storage, name, data, store)
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ai_model.pipeline import INPUT_SIZE
+from services.ingest import decode_upload
+from services.storage import MASKS, ORIGINALS
+from utils.metrics import OVERLAY_REQUESTS
+
+# ✅ 오버레이 이미지 지연 생성
+#   - 업로드 시에는 모델별 클래스 마스크(224x224 uint8)만 압축 저장 (저장소 masks/<파일명>.npz)
+#   - GET /images/modelN/<파일명> 요청 시 원본 + 마스크로 오버레이를 그려 WebP / JPEG / PNG로 인코딩
+#   - 렌더링 결과는 메모리 LRU → 디스크 LRU 순서로 캐시 (각각 최대 바이트 수 제한)
+
+MODEL_NAMES = ("model1", "model2", "model3")
+
+# format 파라미터 → (PIL 형식, MIME 타입, 확장자)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "jpg": ("JPEG", "image/jpeg", "jpg"),
+    "png": ("PNG", "image/png", "png"),
+}
+
+
+# ✅ 마스크 저장 / 로드 ========================================================
+def encode_masks(masks):
+    """masks: {"model1": pred, ...} (클래스 ID 배열) → 압축 npz bytes (결과 캐시에도 그대로 저장)"""
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{name: np.asarray(pred, dtype=np.uint8) for name, pred in masks.items()})
+    return buffer.getvalue()
+
+
+def mask_name(filename):
+    return f"{filename}.npz"
+
+
+def load_mask(source, model_name):
+    with np.load(source) as data:
+        return data[model_name] if model_name in data.files else None
+
+
+def format_for_filename(filename, default="png"):
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    return ext if ext in FORMATS else default
+
+
+# ✅ 렌더링 결과 캐시 ==========================================================
+class OverlayCache:
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir if disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()        # key → bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()          # 파일명 → 크기 (오래된 순)
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # 재시작 후에도 기존 캐시 파일을 수정 시각 순으로 이어서 사용
+            entries = []
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.disk_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name, stat.st_size))
+            for _, name, size in sorted(entries):
+                self._disk[name] = size
+                self._disk_size += size
+            self._evict_disk()
+
+    @staticmethod
+    def _disk_name(key):
+        return hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data, "memory"
+
+        if self.disk_dir:
+            name = self._disk_name(key)
+            with self._lock:
+                on_disk = name in self._disk
+                if on_disk:
+                    self._disk.move_to_end(name)
+            if on_disk:
+                try:
+                    with open(os.path.join(self.disk_dir, name), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    with self._lock:
+                        self._disk_size -= self._disk.pop(name, 0)
+                    return None, None
+                self._put_memory(key, data)
+                return data, "disk"
+        return None, None
+
+    def put(self, key, data):
+        self._put_memory(key, data)
+        if not self.disk_dir or len(data) > self.disk_bytes:
+            return
+        name = self._disk_name(key)
+        path = os.path.join(self.disk_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 오버레이 디스크 캐시 저장 실패: {e}")
+            return
+        with self._lock:
+            self._disk_size += len(data) - self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+        self._evict_disk()
+
+    def _put_memory(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _evict_disk(self):
+        removed = []
+        with self._lock:
+            while self._disk_size > self.disk_bytes and self._disk:
+                name, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                removed.append(name)
+        for name in removed:
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+            }
+
+
+# ✅ 오버레이 렌더러 ==========================================================
+class OverlayRenderer:
+    def __init__(self, storage, cache, quality=85):
+        self.storage = storage
+        self.cache = cache
+        self.quality = quality
+
+    @classmethod
+    def from_config(cls, config, storage):
+        cache = OverlayCache(
+            memory_bytes=config.get('OVERLAY_CACHE_MEMORY_MB', 64) * 1024 * 1024,
+            disk_dir=config.get('OVERLAY_CACHE_DIR'),
+            disk_bytes=config.get('OVERLAY_CACHE_DISK_MB', 512) * 1024 * 1024,
+        )
+        return cls(storage, cache, quality=config.get('OVERLAY_QUALITY', 85))
+
+    # ✅ (인코딩된 이미지 bytes, MIME 타입) 반환, 마스크 / 원본이 없으면 None
+    def render(self, model_name, filename, fmt):
+        pil_format, mimetype, _ = FORMATS[fmt]
+        key = (model_name, filename, pil_format, str(self.quality))
+
+        data, source = self.cache.get(key)
+        if data is not None:
+            OVERLAY_REQUESTS.inc(source=source)
+            return data, mimetype
+
+        try:
+            with self.storage.open_seekable(MASKS, mask_name(filename)) as f:
+                pred = load_mask(f, model_name)
+            if pred is None:
+                return None
+            with self.storage.open_seekable(ORIGINALS, filename) as f:
+                resized = decode_upload(f).resize(INPUT_SIZE)
+        except FileNotFoundError:
+            return None
+
+        module = _overlay_module(model_name)
+        overlay = module.render_overlay(pred, resized)
+        if overlay.mode == "RGBA":
+            overlay = overlay.convert("RGB")    # 배경이 불투명하므로 알파 채널 정보 없음
+
+        buffer = io.BytesIO()
+        options = {"quality": self.quality} if pil_format in ("WEBP", "JPEG") else {}
+        overlay.save(buffer, format=pil_format, **options)
+        data = buffer.getvalue()
+
+        self.cache.put(key, data)
+        OVERLAY_REQUESTS.inc(source="render")
+        return data, mimetype
+
+
+def _overlay_module(model_name):
+    from ai_model import predictor, hygiene_predictor, tooth_number_predictor
+    return {"model1": predictor, "model2": hygiene_predictor, "model3": tooth_number_predictor}[model_name]
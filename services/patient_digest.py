@@ -0,0 +1,178 @@
+import os
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+# ✅ 환자별 진료 기록 요약 (MongoDB 'patient_digests', 환자 1명 = 문서 1개)
+#   - 업로드 결과 저장 시 / 의사 응답 시 문서 1개만 증분 갱신 ($push + $sort + $slice, 최신 max_records건 유지)
+#   - 챗봇은 inference_results 전체 대신 이 문서 1개만 읽음
+#   - 프롬프트에 넣는 기록은 토큰 예산(CHATBOT_HISTORY_TOKEN_BUDGET) 안에서 최신순으로 자름
+#   - 요약 문서가 없는 환자(도입 전 기록)는 처음 조회할 때 최근 기록으로 한 번 생성
+
+ENTRY_FIELDS = {
+    "original_image_path": 1,
+    "timestamp": 1,
+    "doctor_comment": 1,
+    "model1_inference_result.label": 1,
+    "model1_inference_result.confidence": 1,
+    "model2_inference_result.label": 1,
+    "model2_inference_result.confidence": 1,
+    "model3_inference_result.tooth_number_fdi": 1,
+    "model3_inference_result.confidence": 1,
+}
+
+
+# BSON datetime은 밀리초 단위 → 저장 후 다시 읽어도 같은 값 (답변 캐시 키에 updated_at 사용)
+def _now():
+    now = datetime.now()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+# ✅ inference_results 문서 → 요약 항목 (챗봇 프롬프트에 필요한 값만)
+def record_entry(doc):
+    model1 = doc.get('model1_inference_result') or {}
+    model2 = doc.get('model2_inference_result') or {}
+    model3 = doc.get('model3_inference_result') or {}
+    image_path = doc.get('original_image_path', '')
+    return {
+        "filename": os.path.basename(image_path),
+        "image_path": image_path,
+        "timestamp": doc.get('timestamp'),
+        "model1": {"label": model1.get('label'), "confidence": model1.get('confidence')},
+        "model2": {"label": model2.get('label'), "confidence": model2.get('confidence')},
+        "model3": {"tooth_number_fdi": model3.get('tooth_number_fdi'), "confidence": model3.get('confidence')},
+        "doctor_comment": doc.get('doctor_comment'),
+    }
+
+
+def format_entry(entry, number=None):
+    model1 = entry.get("model1") or {}
+    model2 = entry.get("model2") or {}
+    model3 = entry.get("model3") or {}
+    title = f"진단 기록 #{number}" if number is not None else "진단 기록"
+    return (
+        f"--- {title} (날짜: {entry.get('timestamp')}) ---\n"
+        f"AI 진단 결과:\n"
+        f"- 모델1 (질병): {model1.get('label') or '감지되지 않음'} (확신도: {model1.get('confidence') or 0.0:.1%})\n"
+        f"- 모델2 (위생): {model2.get('label') or '감지되지 않음'} (확신도: {model2.get('confidence') or 0.0:.1%})\n"
+        f"- 모델3 (치아번호): {model3.get('tooth_number_fdi') or '감지되지 않음'} "
+        f"(확신도: {model3.get('confidence') or 0.0:.1%})\n"
+        f"의사 코멘트: {entry.get('doctor_comment') or '없음'}\n"
+    )
+
+
+# ✅ 토큰 수 대략 추정 (영문 / 숫자는 4글자당 1토큰, 한글 등은 글자당 1토큰으로 넉넉하게)
+def estimate_tokens(text):
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+# ✅ 최신 기록부터 토큰 예산 안에 들어가는 만큼 → (요약 텍스트, 포함된 건수)
+def history_text(digest, token_budget):
+    entries = digest.get("recent") or []
+    total = digest.get("record_count") or len(entries)
+    parts = []
+    used = 0
+    for i, entry in enumerate(entries):
+        text = format_entry(entry, total - i)
+        cost = estimate_tokens(text)
+        if parts and used + cost > token_budget:
+            break
+        parts.append(text)
+        used += cost
+    omitted = total - len(parts)
+    if omitted > 0:
+        parts.append(f"(이전 기록 {omitted}건은 생략되었습니다.)\n")
+    return "\n".join(parts), len(parts) - (1 if omitted > 0 else 0)
+
+
+class PatientDigestStore:
+    def __init__(self, collection, records, max_records=30):
+        self.collection = collection        # patient_digests
+        self.records = records              # inference_results (요약 문서가 없을 때 생성용)
+        self.max_records = max_records
+
+    @classmethod
+    def from_config(cls, mongo_client, config):
+        return cls(
+            mongo_client.get_collection("patient_digests"),
+            mongo_client.get_collection("inference_results"),
+            max_records=config.get('PATIENT_DIGEST_MAX_RECORDS', 30),
+        )
+
+    # ✅ 새 결과 반영 (같은 파일이 이미 있으면 무시: 비동기 작업 재시도 등으로 두 번 호출돼도 1건)
+    #    요약 문서가 새로 생겼는데 이전 기록이 있는 환자(도입 전 기록)는 기록에서 다시 생성
+    def add_record(self, doc):
+        user_id = doc.get('user_id')
+        entry = record_entry(doc)
+        try:
+            result = self.collection.update_one(
+                {"_id": user_id, "recent.filename": {"$ne": entry["filename"]}},
+                {
+                    "$push": {"recent": {"$each": [entry], "$sort": {"timestamp": -1}, "$slice": self.max_records}},
+                    "$inc": {"record_count": 1},
+                    "$set": {"updated_at": _now()},
+                },
+                upsert=True,
+            )
+            if result.upserted_id is not None and self.records.count_documents({"user_id": user_id}, limit=2) > 1:
+                self.rebuild(user_id, include=entry)
+        except DuplicateKeyError:
+            pass
+        except Exception as e:
+            print(f"⚠️ 환자 요약 갱신 실패 (user_id={user_id}): {e}")
+
+    # ✅ 의사 코멘트 반영: inference_results 해당 사진 문서 + 요약의 기록 항목 + 마지막 코멘트
+    #    (요약 문서가 아직 없으면 나중에 기록에서 생성할 때 반영됨)
+    def add_doctor_comment(self, user_id, image_path, comment, replied_at=None):
+        filename = os.path.basename(image_path or '')
+        try:
+            self.records.update_many(
+                {"user_id": user_id, "original_image_path": f"/images/original/{filename}"},
+                {"$set": {"doctor_comment": comment}},
+            )
+            self.collection.update_one(
+                {"_id": user_id, "recent.filename": filename},
+                {"$set": {"recent.$.doctor_comment": comment}},
+            )
+            self.collection.update_one(
+                {"_id": user_id},
+                {"$set": {
+                    "last_doctor_comment": {"filename": filename, "comment": comment, "replied_at": replied_at},
+                    "updated_at": _now(),
+                }},
+            )
+        except Exception as e:
+            print(f"⚠️ 환자 요약 의사 코멘트 갱신 실패 (user_id={user_id}): {e}")
+
+    # ✅ 요약 문서 1개 조회, 없으면 최근 기록 max_records건으로 생성 (기록이 없으면 None)
+    def get(self, user_id):
+        digest = self.collection.find_one({"_id": user_id})
+        if digest is not None:
+            return digest
+        return self.rebuild(user_id)
+
+    # include: 아직 inference_results에 들어가지 않았을 수 있는 새 항목 (지연 쓰기)
+    def rebuild(self, user_id, include=None):
+        cursor = self.records.find({"user_id": user_id}, ENTRY_FIELDS) \
+            .sort([("timestamp", -1), ("_id", -1)]) \
+            .limit(self.max_records)
+        entries = [record_entry(doc) for doc in cursor]
+        record_count = self.records.count_documents({"user_id": user_id})
+        if include is not None and all(e["filename"] != include["filename"] for e in entries):
+            entries = sorted(entries + [include], key=lambda e: e["timestamp"] or datetime.min, reverse=True)
+            entries = entries[:self.max_records]
+            record_count += 1
+        if not entries:
+            return None
+        digest = {
+            "_id": user_id,
+            "recent": entries,
+            "record_count": record_count,
+            "updated_at": _now(),
+        }
+        try:
+            self.collection.replace_one({"_id": user_id}, digest, upsert=True)
+        except Exception as e:
+            print(f"⚠️ 환자 요약 생성 실패 (user_id={user_id}): {e}")
+        return digest
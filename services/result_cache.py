@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+from bson.binary import Binary
+
+from ai_model.pipeline import model_fingerprint, weights_fingerprint
+from services.storage import ORIGINALS
+from utils.metrics import ORIGINAL_DEDUPE, RESULT_CACHE_REQUESTS
+
+# ✅ 내용 기반(content-addressed) 추론 결과 캐시
+#   - 키: SHA-256(모델 지문(가중치 + 실제 적용된 최적화) + 디코딩된 이미지 모드/크기/픽셀) → 같은 사진 재업로드 / 클라이언트 재시도는 추론 생략
+#   - 값: 3개 모델 결과 요약(응답 / inference_results 문서용) + 클래스 마스크 npz bytes
+#   - 메모리 LRU(최대 항목 수) → MongoDB 'inference_cache' 컬렉션(TTL 인덱스) 순서로 조회
+#   - 같은 이미지가 동시에 들어오면 첫 요청만 추론하고 나머지는 그 결과를 기다림 (single-flight)
+#   - 캐시 적중이어도 사용자별 inference_results 문서와 마스크 파일은 요청마다 새로 저장
+#   - 원본 파일 중복 제거: 업로드 바이트의 SHA-256으로 'original_files' 컬렉션 조회 → 이미 있으면 기존 파일 재사용
+#     (local 저장소는 하드 링크, s3는 서버 쪽 복사)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class ResultCache:
+    def __init__(self, collection=None, max_entries=512, ttl_seconds=30 * 24 * 3600):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()        # key → {"summary": ..., "masks": bytes}
+        self._inflight = {}                 # key → Future (추론 중인 요청)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, mongo_client, config):
+        collection = mongo_client.get_collection("inference_cache") if config.get('RESULT_CACHE_MONGO', True) else None
+        return cls(
+            collection,
+            max_entries=config.get('RESULT_CACHE_MEMORY_ENTRIES', 512),
+            ttl_seconds=config.get('RESULT_CACHE_TTL_DAYS', 30) * 24 * 3600,
+        )
+
+    # ✅ TTL 인덱스 생성 + 가중치 지문 미리 계산 (첫 업로드가 가중치 해시를 기다리지 않도록, 백그라운드)
+    def start(self):
+        def _init():
+            weights_fingerprint()
+            if self.collection is None:
+                return
+            try:
+                self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl_seconds))
+            except Exception as e:
+                print(f"⚠️ inference_cache 인덱스 생성 실패: {e}")
+
+        threading.Thread(target=_init, name="result-cache-init", daemon=True).start()
+
+    @staticmethod
+    def key_for(image):
+        digest = hashlib.sha256()
+        digest.update(f"{model_fingerprint()}|{image.mode}|{image.size[0]}x{image.size[1]}|".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    # ✅ 캐시 조회, 없으면 compute() 실행 후 저장 → (entry, 출처: memory | mongo | shared | miss)
+    def get_or_compute(self, key, compute):
+        entry = self._get_memory(key)
+        if entry is not None:
+            RESULT_CACHE_REQUESTS.inc(result="hit_memory")
+            return entry, "memory"
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = Future()
+        if not owner:
+            entry = flight.result()
+            RESULT_CACHE_REQUESTS.inc(result="hit_shared")
+            return entry, "shared"
+
+        try:
+            entry = self._get_mongo(key)
+            source = "mongo"
+            if entry is None:
+                entry = compute()
+                source = "miss"
+                self._put_mongo(key, entry)
+            self._put_memory(key, entry)
+            flight.set_result(entry)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+        RESULT_CACHE_REQUESTS.inc(result="hit_mongo" if source == "mongo" else "miss")
+        return entry, source
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _put_memory(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # MongoDB 계층 오류는 캐시 미스로 처리 (업로드 자체는 실패시키지 않음)
+    def _get_mongo(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one({"_id": key})
+        except Exception as e:
+            print(f"⚠️ inference_cache 조회 실패: {e}")
+            return None
+        if doc is None:
+            return None
+        return {"summary": doc["summary"], "masks": bytes(doc["masks"])}
+
+    def _put_mongo(self, key, entry):
+        if self.collection is None:
+            return
+        try:
+            self.collection.replace_one(
+                {"_id": key},
+                {"fingerprint": model_fingerprint(), "summary": entry["summary"],
+                 "masks": Binary(entry["masks"]), "created_at": _now()},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"⚠️ inference_cache 저장 실패: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "in_flight": len(self._inflight),
+                "mongo": self.collection is not None,
+                "fingerprint": model_fingerprint(load=False),
+            }
+
+
+# ✅ 원본 파일 중복 제거 ======================================================
+class OriginalStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    @classmethod
+    def from_config(cls, mongo_client, config):
+        return cls(mongo_client.get_collection("original_files"))
+
+    # ✅ 같은 내용의 원본이 이미 저장되어 있으면 저장소 안에서 복사(하드 링크), 아니면 새로 쓰고 등록
+    def save(self, storage, name, data):
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            doc = self.collection.find_one({"_id": digest})
+        except Exception as e:
+            print(f"⚠️ original_files 조회 실패: {e}")
+            doc = None
+
+        # 저장소 백엔드 도입 전 문서는 전체 경로(path)만 있음
+        existing = (doc.get("name") or os.path.basename(doc.get("path", ""))) if doc else None
+        if existing and existing != name:
+            try:
+                if storage.copy(ORIGINALS, existing, name):
+                    ORIGINAL_DEDUPE.inc(result="linked")
+                    return name
+            except Exception as e:
+                print(f"⚠️ 기존 원본 재사용 실패, 새로 저장: {e}")
+
+        storage.write_bytes(ORIGINALS, name, data)
+        ORIGINAL_DEDUPE.inc(result="written")
+        try:
+            self.collection.update_one(
+                {"_id": digest},
+                {"$set": {"name": name, "size": len(data), "updated_at": _now()}},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"⚠️ original_files 등록 실패: {e}")
+        return name
@@ -0,0 +1,320 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+# ✅ 이미지 저장소 백엔드 (STORAGE_BACKEND=local | s3)
+#   - 파일은 (category, name)으로 구분: original(원본), masks(클래스 마스크 npz), model1~3(예전 오버레이 파일)
+#   - local: 카테고리 폴더 아래 SHA-1(name) 앞 2글자씩 STORAGE_SHARD_DEPTH단계 하위 폴더에 저장
+#            (폴더당 파일 수 제한, 예전 평면 폴더에 있는 파일도 그대로 읽음)
+#   - s3: S3 호환 저장소 (AWS S3 / MinIO 등, S3_ENDPOINT_URL) → 여러 앱 서버가 같은 파일 공유
+#   - 읽기 / 쓰기는 CHUNK_SIZE 단위 스트리밍 (S3 쓰기는 PART_SIZE 멀티파트 업로드)
+
+ORIGINALS = "original"
+MASKS = "masks"
+
+CHUNK_SIZE = 256 * 1024
+SPOOL_MAX_BYTES = 16 * 1024 * 1024      # 임의 접근이 필요한 읽기(PIL, numpy)에서 이 크기까지는 메모리, 넘으면 임시 파일
+
+
+class StoredObject:
+    def __init__(self, size, mtime, etag=None, path=None):
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag        # 저장소가 주는 내용 해시 (S3 ETag), 없으면 None
+        self.path = path        # 로컬 파일 경로 (local 백엔드만)
+
+
+def valid_name(name):
+    return bool(name) and os.path.basename(name) == name and name not in (".", "..")
+
+
+def shard_prefix(name, depth):
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return [digest[i * 2:i * 2 + 2] for i in range(depth)]
+
+
+class StorageBackend:
+    def write(self, category, name, stream):
+        raise NotImplementedError
+
+    # start / end: 바이트 범위 (end 포함, HTTP Range와 같은 의미)
+    def open_read(self, category, name, start=None, end=None):
+        raise NotImplementedError
+
+    def stat(self, category, name):
+        raise NotImplementedError
+
+    def copy(self, category, source_name, name):
+        raise NotImplementedError
+
+    def delete(self, category, name):
+        raise NotImplementedError
+
+    def exists(self, category, name):
+        return self.stat(category, name) is not None
+
+    def write_bytes(self, category, name, data):
+        self.write(category, name, io.BytesIO(data))
+
+    # ✅ seek 가능한 읽기 (PIL / numpy.load용): 원격 저장소는 스풀 파일로 받아 메모리 사용 제한
+    def open_seekable(self, category, name):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        with self.open_read(category, name) as source:
+            shutil.copyfileobj(source, spool, CHUNK_SIZE)
+        spool.seek(0)
+        return spool
+
+    def iter_chunks(self, category, name, start=None, end=None):
+        with self.open_read(category, name, start, end) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                yield chunk
+
+    def describe(self):
+        return {"backend": type(self).__name__}
+
+
+# ✅ 로컬 디스크 (해시 샤딩) ====================================================
+class LocalShardedStorage(StorageBackend):
+    def __init__(self, directories, shard_depth=2):
+        self.directories = directories      # category → 폴더
+        self.shard_depth = shard_depth
+
+    @classmethod
+    def from_config(cls, config):
+        return cls({
+            ORIGINALS: config['UPLOAD_FOLDER_ORIGINAL'],
+            MASKS: config['MASK_FOLDER'],
+            "model1": config['PROCESSED_FOLDER_MODEL1'],
+            "model2": config['PROCESSED_FOLDER_MODEL2'],
+            "model3": config['PROCESSED_FOLDER_MODEL3'],
+        }, shard_depth=config.get('STORAGE_SHARD_DEPTH', 2))
+
+    def _directory(self, category):
+        directory = self.directories.get(category)
+        if directory is None:
+            raise KeyError(f"알 수 없는 저장소 카테고리: {category}")
+        return directory
+
+    def sharded_path(self, category, name):
+        if not valid_name(name):
+            raise ValueError(f"잘못된 파일명: {name!r}")
+        return os.path.join(self._directory(category), *shard_prefix(name, self.shard_depth), name)
+
+    # 샤딩 경로에 없으면 샤딩 도입 전 평면 폴더 경로 확인
+    def local_path(self, category, name):
+        if not valid_name(name):
+            return None
+        path = self.sharded_path(category, name)
+        if os.path.isfile(path):
+            return path
+        flat = os.path.join(self._directory(category), name)
+        if self.shard_depth and os.path.isfile(flat):
+            return flat
+        return None
+
+    def write(self, category, name, stream):
+        path = self.sharded_path(category, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(stream, f, CHUNK_SIZE)
+        os.replace(tmp_path, path)
+
+    def open_read(self, category, name, start=None, end=None):
+        path = self.local_path(category, name)
+        if path is None:
+            raise FileNotFoundError(f"{category}/{name}")
+        f = open(path, "rb")
+        if start is None:
+            return f
+        f.seek(start)
+        return _LimitedReader(f, None if end is None else end - start + 1)
+
+    def open_seekable(self, category, name):
+        return self.open_read(category, name)
+
+    def stat(self, category, name):
+        path = self.local_path(category, name)
+        if path is None:
+            return None
+        st = os.stat(path)
+        return StoredObject(st.st_size, st.st_mtime, path=path)
+
+    # 같은 디스크면 하드 링크 (디스크 공간 공유), 안 되면 복사
+    def copy(self, category, source_name, name):
+        source = self.local_path(category, source_name)
+        if source is None:
+            return False
+        path = self.sharded_path(category, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(source, path)
+        except FileExistsError:
+            return True
+        except OSError:
+            with open(source, "rb") as f:
+                self.write(category, name, f)
+        return True
+
+    def delete(self, category, name):
+        path = self.local_path(category, name)
+        if path is not None:
+            os.remove(path)
+
+    def describe(self):
+        return {"backend": "local", "shard_depth": self.shard_depth}
+
+
+class _LimitedReader:
+    """파일 객체에서 최대 limit 바이트만 읽기 (Range 응답용)"""
+
+    def __init__(self, f, limit):
+        self._f = f
+        self._remaining = limit
+
+    def read(self, size=-1):
+        if self._remaining is None:
+            return self._f.read(size)
+        if self._remaining <= 0:
+            return b""
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ✅ S3 호환 저장소 ============================================================
+class S3Storage(StorageBackend):
+    PART_SIZE = 8 * 1024 * 1024     # 멀티파트 최소 5MB
+
+    def __init__(self, client, bucket, prefix="", shard_depth=2):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.shard_depth = shard_depth
+
+    @classmethod
+    def from_config(cls, config):
+        import boto3     # STORAGE_BACKEND=s3 일 때만 필요 (pip install boto3)
+
+        client = boto3.client(
+            "s3",
+            endpoint_url=config.get('S3_ENDPOINT_URL') or None,
+            region_name=config.get('S3_REGION') or None,
+        )
+        return cls(client, config['S3_BUCKET'], prefix=config.get('S3_PREFIX', ''),
+                   shard_depth=config.get('STORAGE_SHARD_DEPTH', 2))
+
+    # 키 앞부분을 해시로 분산 (S3 파티션 / MinIO 디렉터리 부하 분산)
+    def key(self, category, name):
+        if not valid_name(name):
+            raise ValueError(f"잘못된 파일명: {name!r}")
+        return "/".join([f"{self.prefix}{category}", *shard_prefix(name, self.shard_depth), name])
+
+    @staticmethod
+    def _is_missing(error):
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def write(self, category, name, stream):
+        key = self.key(category, name)
+        first = stream.read(self.PART_SIZE)
+        if len(first) < self.PART_SIZE:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=first)
+            return
+
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)["UploadId"]
+        try:
+            parts = []
+            chunk = first
+            while chunk:
+                number = len(parts) + 1
+                response = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                   PartNumber=number, Body=chunk)
+                parts.append({"PartNumber": number, "ETag": response["ETag"]})
+                chunk = stream.read(self.PART_SIZE)
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                  MultipartUpload={"Parts": parts})
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def open_read(self, category, name, start=None, end=None):
+        options = {}
+        if start is not None:
+            options["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key(category, name), **options)
+        except Exception as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(f"{category}/{name}") from e
+            raise
+        return _BodyReader(response["Body"])
+
+    def stat(self, category, name):
+        if not valid_name(name):
+            return None
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key(category, name))
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+        mtime = head.get("LastModified")
+        return StoredObject(head["ContentLength"], mtime.timestamp() if mtime else None,
+                            etag=head.get("ETag", "").strip('"') or None)
+
+    # 서버 쪽 복사 (데이터가 앱 서버를 거치지 않음)
+    def copy(self, category, source_name, name):
+        if self.stat(category, source_name) is None:
+            return False
+        self.client.copy_object(Bucket=self.bucket, Key=self.key(category, name),
+                                CopySource={"Bucket": self.bucket, "Key": self.key(category, source_name)})
+        return True
+
+    def delete(self, category, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(category, name))
+
+    def describe(self):
+        return {"backend": "s3", "bucket": self.bucket, "prefix": self.prefix, "shard_depth": self.shard_depth}
+
+
+class _BodyReader:
+    """botocore StreamingBody → with 문에서 쓸 수 있는 읽기 객체"""
+
+    def __init__(self, body):
+        self._body = body
+
+    def read(self, size=-1):
+        return self._body.read(None if size is None or size < 0 else size)
+
+    def close(self):
+        self._body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def create_storage(config):
+    backend = config.get('STORAGE_BACKEND', 'local').lower()
+    if backend == "s3":
+        storage = S3Storage.from_config(config)
+    else:
+        storage = LocalShardedStorage.from_config(config)
+    print(f"✅ 이미지 저장소: {storage.describe()}")
+    return storage
@@ -0,0 +1,239 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.upload_service import UploadPaths, process_upload
+from utils.metrics import UPLOAD_JOBS
+
+# ✅ 비동기 업로드 작업 (POST 업로드 → 202 + job_id → 폴링 / SSE로 결과 조회)
+#   - 작업 상태는 MongoDB 'upload_jobs' 컬렉션에 저장 (queued → running → done | failed)
+#   - 작업 실행은 find_one_and_update로 원자적으로 선점하므로 여러 워커 프로세스가 같은 작업을 중복 실행하지 않음
+#   - 실행 중인 작업은 heartbeat를 주기적으로 갱신, 워커 프로세스가 죽어 running/queued로 남은 작업은
+#     stale_seconds 후 다른(또는 재시작된) 워커가 다시 실행
+#   - 추론 결과는 upload_job_id(unique 인덱스)로 upsert하므로 재실행되어도 inference_results에 중복 저장되지 않음
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TERMINAL = (DONE, FAILED)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class UploadJobManager:
+    def __init__(self, mongo_client, workers=2, stale_seconds=300, max_attempts=3,
+                 result_ttl_seconds=7 * 24 * 3600, reap_interval=30, collection_name="upload_jobs",
+                 result_cache=None, storage=None, digests=None):
+        self.collection = mongo_client.get_collection(collection_name)
+        self.results = mongo_client.get_collection("inference_results")
+        self.stale_seconds = stale_seconds
+        self.heartbeat_interval = max(1.0, stale_seconds / 3)
+        self.max_attempts = max_attempts
+        self.result_ttl_seconds = result_ttl_seconds
+        self.reap_interval = reap_interval
+        self.result_cache = result_cache
+        self.storage = storage
+        self.digests = digests
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-job")
+        self._pending = set()               # 이 프로세스 실행 대기열에 들어간 job_id
+        self._pending_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._reaper = None
+
+    @classmethod
+    def from_config(cls, mongo_client, config, result_cache=None, storage=None, digests=None):
+        return cls(
+            mongo_client,
+            workers=config.get('UPLOAD_JOB_WORKERS', 2),
+            stale_seconds=config.get('UPLOAD_JOB_STALE_SECONDS', 300),
+            max_attempts=config.get('UPLOAD_JOB_MAX_ATTEMPTS', 3),
+            result_ttl_seconds=config.get('UPLOAD_JOB_RESULT_TTL_HOURS', 168) * 3600,
+            result_cache=result_cache,
+            storage=storage,
+            digests=digests,
+        )
+
+    # ✅ 인덱스 생성 + 남은 작업 복구 (백그라운드 스레드, 이후 reap_interval마다 반복)
+    def start(self):
+        if self._reaper is not None:
+            return
+
+        def _loop():
+            try:
+                self.collection.create_index([("status", 1), ("heartbeat", 1)])
+                self.collection.create_index("finished_at", expireAfterSeconds=int(self.result_ttl_seconds))
+            except Exception as e:
+                print(f"⚠️ upload_jobs 인덱스 생성 실패: {e}")
+            while True:
+                try:
+                    self.recover()
+                except Exception as e:
+                    print(f"⚠️ 업로드 작업 복구 실패: {e}")
+                time.sleep(self.reap_interval)
+
+        self._reaper = threading.Thread(target=_loop, name="upload-job-reaper", daemon=True)
+        self._reaper.start()
+
+    # ✅ 작업 등록 (원본은 이미 저장소에 저장된 상태) → job_id
+    def submit(self, paths, user_id, yolo_inference_data, include_points=False):
+        job_id = uuid.uuid4().hex
+        now = _now()
+        self.collection.insert_one({
+            "_id": job_id,
+            "status": QUEUED,
+            "user_id": user_id,
+            "paths": paths.to_dict(),
+            "yolo_inference_data": yolo_inference_data,
+            "include_points": include_points,
+            "attempts": 0,
+            "created_at": now,
+            "heartbeat": now,
+            "result": None,
+            "error": None,
+        })
+        UPLOAD_JOBS.inc(status=QUEUED)
+        self._enqueue(job_id)
+        return job_id
+
+    def get(self, job_id):
+        return self.collection.find_one({"_id": job_id})
+
+    def _enqueue(self, job_id):
+        with self._pending_lock:
+            if job_id in self._pending:
+                return
+            self._pending.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    # 대기 중이거나, 실행 중인데 heartbeat가 오래된(워커가 죽은) 작업만 선점
+    def _claim(self, job_id):
+        now = _now()
+        stale = now - timedelta(seconds=self.stale_seconds)
+        return self.collection.find_one_and_update(
+            {"_id": job_id, "attempts": {"$lt": self.max_attempts},
+             "$or": [{"status": QUEUED}, {"status": RUNNING, "heartbeat": {"$lt": stale}}]},
+            {"$set": {"status": RUNNING, "worker": self.worker_id, "heartbeat": now, "started_at": now},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _run(self, job_id):
+        try:
+            job = self._claim(job_id)
+            if job is None:
+                return      # 다른 워커가 처리 중이거나 이미 끝난 작업
+            self._notify()
+
+            try:
+                with self._heartbeat(job_id):
+                    response = process_upload(
+                        UploadPaths.from_dict(job["paths"]),
+                        job["user_id"],
+                        job["yolo_inference_data"],
+                        save_result=lambda doc: self._save_result(job_id, doc),
+                        storage=self.storage,
+                        include_points=job.get("include_points", False),
+                        extra_fields={"upload_job_id": job_id},
+                        cache=self.result_cache,
+                        digests=self.digests,
+                    )
+            except Exception as e:
+                print(f"❌ 업로드 작업 실패 ({job_id}): {e}")
+                self._finish(job_id, FAILED, error=f"서버 처리 중 오류: {e}")
+                return
+            self._finish(job_id, DONE, result=response)
+        finally:
+            with self._pending_lock:
+                self._pending.discard(job_id)
+
+    # ✅ 실행하는 동안 heartbeat 갱신 → stale_seconds보다 오래 걸려도 다른 워커가 선점하지 않음
+    @contextmanager
+    def _heartbeat(self, job_id):
+        stop = threading.Event()
+
+        def _tick():
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    self.collection.update_one(
+                        {"_id": job_id, "status": RUNNING, "worker": self.worker_id},
+                        {"$set": {"heartbeat": _now()}},
+                    )
+                except Exception as e:
+                    print(f"⚠️ 업로드 작업 heartbeat 갱신 실패 ({job_id}): {e}")
+
+        threading.Thread(target=_tick, name="upload-job-heartbeat", daemon=True).start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    # 같은 작업의 결과를 두 워커가 동시에 upsert하면 unique 인덱스로 한쪽이 실패 → 이미 생긴 문서를 교체
+    def _save_result(self, job_id, doc):
+        try:
+            self.results.replace_one({"upload_job_id": job_id}, doc, upsert=True)
+        except DuplicateKeyError:
+            self.results.replace_one({"upload_job_id": job_id}, doc)
+
+    def _finish(self, job_id, status, result=None, error=None):
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": status, "result": result, "error": error, "finished_at": _now()}},
+        )
+        UPLOAD_JOBS.inc(status=status)
+        self._notify()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    # ✅ 워커가 죽어 남은 작업 복구: 재시도 횟수 초과 → failed, 나머지 → 다시 실행
+    def recover(self):
+        stale = _now() - timedelta(seconds=self.stale_seconds)
+        orphaned = {"$or": [{"status": QUEUED, "created_at": {"$lt": stale}},
+                            {"status": RUNNING, "heartbeat": {"$lt": stale}}]}
+
+        exhausted = self.collection.update_many(
+            {"$and": [orphaned, {"attempts": {"$gte": self.max_attempts}}]},
+            {"$set": {"status": FAILED, "error": "작업 재시도 횟수 초과", "finished_at": _now()}},
+        )
+        if exhausted.modified_count:
+            UPLOAD_JOBS.inc(exhausted.modified_count, status=FAILED)
+            self._notify()
+
+        for job in self.collection.find(orphaned, {"_id": 1}):
+            print(f"🔁 업로드 작업 재실행: {job['_id']}")
+            self._enqueue(job["_id"])
+
+    # ✅ 상태가 바뀔 때까지 대기 (같은 프로세스의 변경은 즉시 깨어나고, 다른 프로세스 변경은 timeout마다 재조회)
+    def wait_for_change(self, timeout):
+        with self._changed:
+            self._changed.wait(timeout)
+
+
+# ✅ 응답용 작업 표현
+def job_view(job):
+    view = {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "created_at": job.get("created_at"),
+        "finished_at": job.get("finished_at"),
+    }
+    if job["status"] == DONE:
+        view["result"] = job.get("result")
+    if job["status"] == FAILED:
+        view["error"] = job.get("error")
+    return view
@@ -0,0 +1,177 @@
+from datetime import datetime
+
+from ai_model.lesion_geometry import decode_lesion_points
+from ai_model.pipeline import run_all_models                       # model1: 질병, model2: 위생, model3: 치아번호
+from services.inference_results import original_filename
+from services.ingest import decode_upload
+from services.overlay import encode_masks, mask_name
+from services.storage import MASKS, ORIGINALS
+from utils.timing import stage
+
+
+class UploadPaths:
+    """업로드 1건의 저장소 파일명 (원본 / 마스크 / 모델별 이미지 URL은 base_name으로 공통)"""
+
+    def __init__(self, base_name):
+        self.base_name = base_name
+
+    # 모델별 클래스 마스크 (오버레이는 조회 시 이 마스크로 그림: services/overlay.py)
+    @property
+    def mask_name(self):
+        return mask_name(self.base_name)
+
+    def to_dict(self):
+        return {"base_name": self.base_name}
+
+    # 저장소 백엔드 도입 전 작업 문서의 upload_dir / mask_dir는 무시 (local 저장소가 평면 폴더도 읽음)
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["base_name"])
+
+
+# ✅ 3개 모델 추론 → 결과 요약(JSON 저장 가능한 값만) + 클래스 마스크 npz bytes (결과 캐시 항목 형태)
+def infer_image(image):
+    # ✅ 1회 전처리 후 model1(질병) / model2(위생) / model3(치아번호) 동시 추론
+    result = run_all_models(image)
+    tooth_info = result.tooth.info_json
+    summary = {
+        'model1': {
+            'lesion_geometry': result.disease.lesion_geometry,
+            'confidence': result.disease.confidence,
+            'used_model': result.disease.model_name,
+            'label': result.disease.label
+        },
+        'model2': {
+            'class_id': result.hygiene.class_id,
+            'confidence': result.hygiene.confidence,
+            'label': result.hygiene.label
+        },
+        'model3': {
+            'class_id': tooth_info['class_id'],
+            'confidence': tooth_info['confidence'],
+            'tooth_number_fdi': tooth_info['tooth_number_fdi']
+        },
+    }
+    masks = encode_masks({
+        "model1": result.disease.pred,
+        "model2": result.hygiene.pred,
+        "model3": result.tooth.pred,
+    })
+    return {"summary": summary, "masks": masks}
+
+
+# ✅ 저장된 원본 1장 → 3개 모델 추론 → MongoDB 저장 → 기존 업로드 응답 형태(dict) 반환
+#    동기 업로드 라우트와 비동기 업로드 작업(services.upload_jobs)이 같이 사용합니다.
+#    save_result: inference_doc을 저장하는 함수 (기본은 MongoDBClient.insert_result)
+#    storage: 원본 / 마스크 저장소 (services/storage.py)
+#    image: 이미 디코딩한 업로드 이미지 (없으면 저장소의 원본에서 디코딩)
+#    cache: ResultCache (services/result_cache.py) — 같은 이미지 + 같은 모델이면 추론 생략
+#    digests: PatientDigestStore (services/patient_digest.py) — 저장 후 챗봇용 환자 요약 갱신
+#    original_saved: 원본 저장 Future (동기 업로드) — 완료를 확인한 뒤에 문서 / 요약 저장 (실패하면 예외)
+def process_upload(paths, user_id, yolo_inference_data, save_result, storage, include_points=False,
+                   extra_fields=None, image=None, cache=None, digests=None, original_saved=None):
+    base_name = paths.base_name
+
+    if image is None:
+        with stage("decode"), storage.open_seekable(ORIGINALS, base_name) as f:
+            image = decode_upload(f)
+
+    if cache is not None:
+        with stage("cache_lookup"):
+            key = cache.key_for(image)
+        entry, _ = cache.get_or_compute(key, lambda: infer_image(image))
+    else:
+        entry = infer_image(image)
+    summary = entry["summary"]
+
+    # ✅ 오버레이 PNG 대신 클래스 마스크만 저장 (/images/modelN/<파일명> 요청 시 렌더링)
+    with stage("mask_save"):
+        storage.write_bytes(MASKS, paths.mask_name, entry["masks"])
+
+    disease = summary['model1']
+    hygiene = summary['model2']
+    tooth_info = summary['model3']
+
+    # ✅ MongoDB 저장
+    inference_doc = {
+        'user_id': user_id,
+        'original_image_path': f"/images/original/{base_name}",
+        'original_image_filename': original_filename(base_name, user_id),     # 챗봇 파일명 질문 조회용 (인덱스)
+        'original_image_yolo_detections': yolo_inference_data,
+
+        'model1_image_path': f"/images/model1/{base_name}",
+        'model1_inference_result': {
+            'message': 'model1 마스크 생성 완료',
+            'lesion_geometry': disease['lesion_geometry'],
+            'confidence': disease['confidence'],
+            'used_model': disease['used_model'],
+            'label': disease['label']
+        },
+
+        'model2_image_path': f"/images/model2/{base_name}",
+        'model2_inference_result': {
+            'message': 'model2 마스크 생성 완료',
+            'class_id': hygiene['class_id'],
+            'confidence': hygiene['confidence'],
+            'label': hygiene['label']
+        },
+
+        'model3_image_path': f"/images/model3/{base_name}",
+        'model3_inference_result': {
+            'message': 'model3 마스크 생성 완료',
+            'class_id': tooth_info['class_id'],
+            'confidence': tooth_info['confidence'],
+            'tooth_number_fdi': tooth_info['tooth_number_fdi']
+        },
+
+        'timestamp': datetime.now()
+    }
+    if extra_fields:
+        inference_doc.update(extra_fields)
+    # 원본 저장(추론과 동시에 진행한 Future)이 끝난 뒤에만 기록: 실패하면 없는 파일을 가리키는 문서가 남지 않음
+    if original_saved is not None:
+        with stage("original_wait"):
+            original_saved.result()
+    with stage("db_insert"):
+        save_result(inference_doc)
+    if digests is not None:
+        with stage("digest_update"):
+            digests.add_record(inference_doc)
+
+    # ✅ 응답 (전체 병변 픽셀 목록은 include_points 일 때만 포함)
+    model1_response = {
+        'message': 'model1 마스크 생성 완료',
+        'lesion_geometry': disease['lesion_geometry'],
+        'confidence': disease['confidence'],
+        'used_model': disease['used_model'],
+        'label': disease['label']
+    }
+    if include_points:
+        model1_response['lesion_points'] = decode_lesion_points(disease['lesion_geometry'])
+
+    return {
+        'message': '3개 모델 처리 및 저장 완료',
+        'original_image_path': f"/images/original/{base_name}",
+        'original_image_yolo_detections': yolo_inference_data,
+
+        'model1_image_path': f"/images/model1/{base_name}",
+        'model1_inference_result': model1_response,
+
+        'model2_image_path': f"/images/model2/{base_name}",
+        'model2_inference_result': {
+            'message': 'model2 마스크 생성 완료',
+            'class_id': hygiene['class_id'],
+            'confidence': hygiene['confidence'],
+            'label': hygiene['label']
+        },
+
+        'model3_image_path': f"/images/model3/{base_name}",
+        'model3_inference_result': {
+            'message': 'model3 마스크 생성 완료',
+            'class_id': tooth_info['class_id'],
+            'confidence': tooth_info['confidence'],
+            'tooth_number_fdi': tooth_info['tooth_number_fdi']
+        },
+
+        'timestamp': datetime.now()
+    }
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from flask import Flask  # noqa: E402
+
+from ai_model.llm_backend import StubBackend, StubChat  # noqa: E402
+from routes.chatbot_routes import chatbot_bp  # noqa: E402
+from services.answer_cache import AnswerCache  # noqa: E402
+from services.chat_sessions import ChatSessionStore  # noqa: E402
+from services.patient_digest import PatientDigestStore, record_entry  # noqa: E402
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self.db = mongomock.MongoClient().db
+
+    def get_collection(self, name):
+        return self.db[name]
+
+
+@pytest.fixture
+def app():
+    mongo = FakeMongoClient()
+    app = Flask(__name__)
+    app.config["CHAT_TURN_LOCK_TIMEOUT_SECONDS"] = 0.05
+    app.extensions["mongo_client"] = mongo
+    app.extensions["patient_digests"] = PatientDigestStore.from_config(mongo, app.config)
+    app.extensions["chat_cache"] = AnswerCache()
+    app.extensions["gemini_model"] = StubBackend()
+    app.extensions["chat_sessions"] = ChatSessionStore(mongo.get_collection("chat_transcripts"))
+    app.register_blueprint(chatbot_bp)
+
+    entry = record_entry({
+        "original_image_path": "/images/original/20261001093000_web_image.png",
+        "timestamp": datetime(2026, 10, 1, 9, 30),
+        "model1_inference_result": {"label": "충치", "confidence": 0.91},
+        "model2_inference_result": {"label": "치석", "confidence": 0.72},
+        "model3_inference_result": {"tooth_number_fdi": 36, "confidence": 0.88},
+    })
+    mongo.get_collection("patient_digests").insert_one(
+        {"_id": "u1", "recent": [entry], "record_count": 1, "updated_at": datetime(2026, 10, 1, 9, 30)})
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def events(response):
+    assert response.mimetype == "text/event-stream"
+    parsed = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+def answer_text(parsed):
+    return "".join(data["text"] for event, data in parsed if event == "chunk")
+
+
+def test_chatbot_stream_chunks_then_done(client):
+    parsed = events(client.post("/chatbot/stream", json={"patient_id": "u1", "message": "충치가 심한가요?"}))
+
+    names = [event for event, _ in parsed]
+    assert names[-1] == "done" and len(names) > 2 and set(names[:-1]) == {"chunk"}
+    assert answer_text(parsed).startswith("[stub:")
+    done = parsed[-1][1]
+    assert done["cache_hit"] is False
+    assert done["image_url"].endswith("/images/original/20261001093000_web_image.png")
+    assert done["first_chunk_time"] <= done["elapsed_time"]
+
+
+def test_api_chat_stream_repeated_first_turn_hits_cache(client, app):
+    first = events(client.post("/api/chat/stream", json={"user_id": "u1", "message": "양치는 어떻게 하나요?"}))
+    second = events(client.post("/api/chat/stream", json={"user_id": "u1", "message": "양치는 어떻게 하나요?"}))
+
+    assert first[-1][1]["cache_hit"] is False
+    assert [event for event, _ in second] == ["chunk", "done"]
+    assert second[-1][1]["cache_hit"] is True
+    assert answer_text(second) == answer_text(first)
+    # 새 세션 2개, 각각 턴 1개씩 기록
+    assert first[-1][1]["session_id"] != second[-1][1]["session_id"]
+    sessions = app.extensions["chat_sessions"]._sessions.values()
+    assert sorted(session.turn_count for session in sessions) == [1, 1]
+
+
+def test_api_chat_stream_error_event(client, app, monkeypatch):
+    def fail(self, message, stream=False):
+        raise RuntimeError("LLM 연결 실패")
+
+    monkeypatch.setattr(StubChat, "send_message", fail)
+    parsed = events(client.post("/api/chat/stream", json={"user_id": "u1", "message": "잇몸이 아파요"}))
+
+    assert parsed == [("error", {"error": "LLM 연결 실패"})]
+    session = next(iter(app.extensions["chat_sessions"]._sessions.values()))
+    assert session.turn_count == 0 and not session.turn_lock.locked()
+
+
+def test_busy_session_is_rejected(client, app):
+    done = events(client.post("/api/chat/stream", json={"user_id": "u1", "message": "안녕하세요"}))[-1][1]
+    session_id = done["session_id"]
+    session = app.extensions["chat_sessions"]._sessions[("u1", session_id)]
+
+    with session.turn_lock:
+        streamed = events(client.post("/api/chat/stream",
+                                      json={"user_id": "u1", "message": "다음 질문", "session_id": session_id}))
+        response = client.post("/api/chat", json={"user_id": "u1", "message": "다음 질문", "session_id": session_id})
+
+    assert [event for event, _ in streamed] == ["error"] and streamed[0][1]["busy"] is True
+    assert response.status_code == 409 and response.get_json()["session_id"] == session_id
+    assert session.turn_count == 1
+
+
+def test_api_chat_stream_error_after_chunks(client, app, monkeypatch):
+    def fail(self, *args, **kwargs):
+        raise RuntimeError("대화 기록 저장 실패")
+
+    monkeypatch.setattr(ChatSessionStore, "add_turn", fail)
+    parsed = events(client.post("/api/chat/stream", json={"user_id": "u1", "message": "잇몸이 아파요"}))
+
+    names = [event for event, _ in parsed]
+    assert names[-1] == "error" and "done" not in names and set(names[:-1]) == {"chunk"}
+    assert parsed[-1][1] == {"error": "대화 기록 저장 실패"}
+    session = next(iter(app.extensions["chat_sessions"]._sessions.values()))
+    assert not session.turn_lock.locked()
@@ -0,0 +1,120 @@
+from datetime import date, datetime
+
+import pytest
+from flask import Flask
+
+from models.consult_model import ConsultDailyStats, ConsultRequest
+from models.model import db
+from services.consult_stats import ConsultStats, InvalidStatsRange, parse_day
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def add_request(stats, when, replied=False):
+    consult = ConsultRequest(user_id="u1", image_path="/images/original/a.png", request_datetime=when,
+                             is_requested="Y", is_replied="Y" if replied else "N")
+    db.session.add(consult)
+    stats.record_created(when)
+    if replied:
+        stats.record_replied(when)
+    db.session.commit()
+    return consult
+
+
+def seed(stats):
+    add_request(stats, datetime(2026, 10, 1, 9, 0), replied=True)
+    add_request(stats, datetime(2026, 10, 3, 10, 0))
+    add_request(stats, datetime(2026, 10, 3, 23, 59, 59), replied=True)
+    add_request(stats, datetime(2026, 10, 5, 0, 0))
+    add_request(stats, datetime(2026, 10, 7, 12, 0))        # 범위 밖
+
+
+def test_parse_day():
+    assert parse_day("20261003") == date(2026, 10, 3)
+    assert parse_day("2026-10-03") == date(2026, 10, 3)
+    for value in (None, "", "2026/10/03", "20261332"):
+        with pytest.raises(InvalidStatsRange):
+            parse_day(value)
+
+
+@pytest.mark.parametrize("materialized", [False, True])
+def test_series_zero_fills_and_totals(app, materialized):
+    stats = ConsultStats(materialized=materialized)
+    seed(stats)
+
+    days, summary = stats.series(date(2026, 10, 1), date(2026, 10, 6))
+
+    assert [d["date"] for d in days] == [f"202610{i:02d}" for i in range(1, 7)]
+    assert [d["total"] for d in days] == [1, 0, 2, 0, 1, 0]
+    assert [d["completed"] for d in days] == [1, 0, 1, 0, 0, 0]
+    assert days[2]["pending"] == 1
+    assert summary == {"total": 4, "completed": 2, "pending": 2}
+
+
+def test_single_day(app):
+    stats = ConsultStats()
+    seed(stats)
+    days, summary = stats.series(date(2026, 10, 3), date(2026, 10, 3))
+    assert len(days) == 1 and summary == {"total": 2, "completed": 1, "pending": 1}
+
+
+def test_invalid_ranges(app):
+    stats = ConsultStats(max_days=31)
+    with pytest.raises(InvalidStatsRange):
+        stats.series(date(2026, 10, 5), date(2026, 10, 1))
+    with pytest.raises(InvalidStatsRange):
+        stats.series(date(2026, 1, 1), date(2026, 2, 1))
+    days, _ = stats.series(date(2026, 1, 1), date(2026, 1, 31))
+    assert len(days) == 31
+
+
+def test_bump_creates_then_updates_row(app):
+    stats = ConsultStats(materialized=True)
+    day = date(2026, 10, 3)
+
+    stats._bump(day, total=1)
+    stats._bump(day, total=1, completed=1)
+    stats._bump(day, total=-1)
+    db.session.commit()
+
+    row = db.session.get(ConsultDailyStats, day)
+    assert (row.total, row.completed) == (1, 1)
+    assert ConsultDailyStats.query.count() == 1
+
+
+def test_counters_not_touched_when_not_materialized(app):
+    stats = ConsultStats(materialized=False)
+    seed(stats)
+    assert ConsultDailyStats.query.count() == 0
+
+
+def test_cancel_updates_materialized_counts(app):
+    stats = ConsultStats(materialized=True)
+    consult = add_request(stats, datetime(2026, 10, 3, 10, 0))
+    stats.record_cancelled(consult.request_datetime)
+    db.session.delete(consult)
+    db.session.commit()
+
+    _, summary = stats.series(date(2026, 10, 3), date(2026, 10, 3))
+    assert summary["total"] == 0
+
+
+def test_start_seeds_empty_table_from_requests(app):
+    seed(ConsultStats(materialized=False))
+    stats = ConsultStats(materialized=True)
+
+    stats.start()
+
+    expected = ConsultStats(materialized=False).series(date(2026, 10, 1), date(2026, 10, 7))
+    assert stats.series(date(2026, 10, 1), date(2026, 10, 7)) == expected
+    assert stats.rebuild() == 4
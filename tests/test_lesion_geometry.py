@@ -0,0 +1,66 @@
+import numpy as np
+
+from ai_model.lesion_geometry import (UNKNOWN_CLASS_KEY, decode_lesion_mask, decode_lesion_points,
+                                      encode_lesion_mask, geometry_from_lesion_points, rle_decode, rle_encode,
+                                      with_lesion_points)
+
+
+def random_mask(seed, shape=(224, 224), classes=4):
+    rng = np.random.default_rng(seed)
+    mask = np.zeros(shape, dtype=np.uint8)
+    for class_id in range(1, classes):
+        y, x = rng.integers(0, shape[0] - 40), rng.integers(0, shape[1] - 40)
+        mask[y:y + rng.integers(1, 40), x:x + rng.integers(1, 40)] = class_id
+    mask[rng.random(shape) < 0.01] = classes     # 흩어진 픽셀
+    return mask
+
+
+def test_rle_round_trip_edges():
+    for binary in (np.zeros((5, 7), bool), np.ones((5, 7), bool), np.eye(6, dtype=bool)):
+        runs = rle_encode(binary)
+        assert np.array_equal(rle_decode(runs, binary.shape), binary)
+    # 첫 run은 항상 0 run (첫 픽셀이 1이면 길이 0)
+    assert rle_encode(np.ones((2, 2), bool))[0] == 0
+
+
+def test_mask_round_trip():
+    for seed in range(5):
+        mask = random_mask(seed)
+        geometry = encode_lesion_mask(mask)
+        assert np.array_equal(decode_lesion_mask(geometry), mask)
+        assert geometry["total_area"] == int((mask > 0).sum())
+
+
+def test_class_area_and_bbox():
+    mask = np.zeros((10, 12), dtype=np.uint8)
+    mask[2:5, 3:9] = 2
+    info = encode_lesion_mask(mask)["classes"]["2"]
+    assert info["area"] == 18
+    assert info["bbox"] == [3, 2, 8, 4]
+
+
+def test_empty_mask():
+    geometry = encode_lesion_mask(np.zeros((8, 8), dtype=np.uint8))
+    assert geometry["classes"] == {} and geometry["total_area"] == 0
+    assert decode_lesion_points(geometry) == []
+
+
+def test_points_match_legacy_format():
+    mask = random_mask(7)
+    points = np.column_stack(np.where(mask > 0)).tolist()
+    assert decode_lesion_points(encode_lesion_mask(mask)) == points
+
+    migrated = geometry_from_lesion_points(points)
+    assert list(migrated["classes"]) == [UNKNOWN_CLASS_KEY]
+    assert decode_lesion_points(migrated) == points
+
+
+def test_with_lesion_points():
+    mask = random_mask(3)
+    result = {"label": "x", "lesion_geometry": encode_lesion_mask(mask)}
+    restored = with_lesion_points(result)
+    assert "lesion_points" not in result
+    assert restored["lesion_points"] == np.column_stack(np.where(mask > 0)).tolist()
+
+    legacy = {"lesion_points": [[1, 2]]}
+    assert with_lesion_points(legacy) is legacy
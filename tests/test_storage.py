@@ -0,0 +1,189 @@
+import io
+import os
+
+import pytest
+
+from services.storage import MASKS, ORIGINALS, LocalShardedStorage, S3Storage, shard_prefix
+
+
+class FakeS3Error(Exception):
+    """botocore ClientError처럼 response["Error"]["Code"]를 가진 예외"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeBody:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+        self.closed = False
+
+    def read(self, size=None):
+        return self._stream.read(-1 if size is None else size)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeS3Client:
+    """S3Storage가 쓰는 API만 흉내 내는 메모리 S3 (호출 기록 포함)"""
+
+    def __init__(self, fail_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+        self.fail_part = fail_part
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append("put_object")
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append("upload_part")
+        if PartNumber == self.fail_part:
+            raise FakeS3Error("InternalError")
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort_multipart_upload")
+        del self.uploads[UploadId]
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("NoSuchKey")
+        return self.objects[(Bucket, Key)]
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self._get(Bucket, Key)
+        if Range is not None:
+            start, end = Range[len("bytes="):].split("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": FakeBody(data)}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)]), "ETag": '"abc"'}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.calls.append("copy_object")
+        self.objects[(Bucket, Key)] = self._get(CopySource["Bucket"], CopySource["Key"])
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+@pytest.fixture
+def s3():
+    storage = S3Storage(FakeS3Client(), "bucket", prefix="app/", shard_depth=2)
+    storage.PART_SIZE = 4
+    return storage
+
+
+def test_s3_key_is_sharded(s3):
+    assert s3.key(ORIGINALS, "a.png") == "/".join(["app/original", *shard_prefix("a.png", 2), "a.png"])
+    with pytest.raises(ValueError):
+        s3.key(ORIGINALS, "../a.png")
+
+
+def test_s3_small_write_is_single_put(s3):
+    s3.write(ORIGINALS, "a.png", io.BytesIO(b"abc"))
+    assert s3.client.calls == ["put_object"]
+    assert s3.client.objects[("bucket", s3.key(ORIGINALS, "a.png"))] == b"abc"
+
+
+def test_s3_large_write_is_multipart(s3):
+    s3.write(ORIGINALS, "a.png", io.BytesIO(b"0123456789"))
+    assert s3.client.calls == ["create_multipart_upload"] + ["upload_part"] * 3 + ["complete_multipart_upload"]
+    assert s3.client.objects[("bucket", s3.key(ORIGINALS, "a.png"))] == b"0123456789"
+    assert s3.client.uploads == {}
+
+
+def test_s3_multipart_failure_aborts(s3):
+    s3.client.fail_part = 2
+    with pytest.raises(FakeS3Error):
+        s3.write(ORIGINALS, "a.png", io.BytesIO(b"0123456789"))
+    assert s3.client.calls[-1] == "abort_multipart_upload"
+    assert s3.client.uploads == {} and s3.client.objects == {}
+
+
+def test_s3_open_read_range_and_missing(s3):
+    s3.write_bytes(MASKS, "m.npz", b"0123456789")
+
+    with s3.open_read(MASKS, "m.npz") as f:
+        assert f.read() == b"0123456789"
+    with s3.open_read(MASKS, "m.npz", 2, 5) as f:
+        assert f.read() == b"2345"
+    with s3.open_read(MASKS, "m.npz", 7) as f:
+        assert f.read() == b"789"
+    assert b"".join(s3.iter_chunks(MASKS, "m.npz", 1, 3)) == b"123"
+
+    with pytest.raises(FileNotFoundError):
+        s3.open_read(MASKS, "missing.npz")
+    assert s3.stat(MASKS, "missing.npz") is None
+    assert s3.stat(MASKS, "m.npz").size == 10 and s3.stat(MASKS, "m.npz").etag == "abc"
+
+
+def test_s3_other_errors_are_raised(s3, monkeypatch):
+    def denied(**kwargs):
+        raise FakeS3Error("AccessDenied")
+
+    monkeypatch.setattr(s3.client, "get_object", denied)
+    with pytest.raises(FakeS3Error):
+        s3.open_read(MASKS, "m.npz")
+
+
+def test_s3_copy(s3):
+    s3.write_bytes(ORIGINALS, "a.png", b"image")
+
+    assert s3.copy(ORIGINALS, "a.png", "b.png") is True
+    assert s3.client.objects[("bucket", s3.key(ORIGINALS, "b.png"))] == b"image"
+    assert s3.copy(ORIGINALS, "missing.png", "c.png") is False
+    assert s3.client.calls.count("copy_object") == 1
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalShardedStorage({ORIGINALS: str(tmp_path / "original"), MASKS: str(tmp_path / "masks")},
+                               shard_depth=2)
+
+
+def test_local_write_read_range(local):
+    local.write_bytes(ORIGINALS, "a.png", b"0123456789")
+
+    path = local.sharded_path(ORIGINALS, "a.png")
+    assert os.path.isfile(path) and local.stat(ORIGINALS, "a.png").path == path
+    with local.open_read(ORIGINALS, "a.png", 2, 5) as f:
+        assert f.read() == b"2345"
+    with pytest.raises(FileNotFoundError):
+        local.open_read(ORIGINALS, "missing.png")
+
+
+def test_local_reads_flat_legacy_layout(local, tmp_path):
+    legacy = tmp_path / "original" / "old.png"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b"legacy")
+
+    assert local.local_path(ORIGINALS, "old.png") == str(legacy)
+    assert local.stat(ORIGINALS, "old.png").size == 6
+    with local.open_read(ORIGINALS, "old.png") as f:
+        assert f.read() == b"legacy"
+
+    # 평면 폴더의 파일도 복사 / 삭제 가능, 새 파일은 샤딩 경로에
+    assert local.copy(ORIGINALS, "old.png", "new.png") is True
+    assert local.local_path(ORIGINALS, "new.png") == local.sharded_path(ORIGINALS, "new.png")
+    local.delete(ORIGINALS, "old.png")
+    assert not local.exists(ORIGINALS, "old.png")
@@ -0,0 +1,44 @@
+import io
+
+from PIL import Image
+
+from services.image_serving import ThumbnailRenderer
+from services.overlay import OverlayCache
+from services.storage import ORIGINALS, LocalShardedStorage
+
+
+def jpeg(color, size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def thumbnail_color(data):
+    return Image.open(io.BytesIO(data)).convert("RGB").getpixel((10, 10))
+
+
+def make(tmp_path):
+    storage = LocalShardedStorage({ORIGINALS: str(tmp_path / "original")})
+    renderer = ThumbnailRenderer([128], OverlayCache(memory_bytes=1024 * 1024))
+    return storage, renderer
+
+
+def test_overwritten_legacy_name_renders_new_thumbnail(tmp_path):
+    storage, renderer = make(tmp_path)
+    storage.write_bytes(ORIGINALS, "legacy.jpg", jpeg((255, 0, 0)))
+    first, _ = renderer.render(storage, ORIGINALS, "legacy.jpg", 128, "jpeg")
+
+    storage.write_bytes(ORIGINALS, "legacy.jpg", jpeg((0, 0, 255)))
+    second, _ = renderer.render(storage, ORIGINALS, "legacy.jpg", 128, "jpeg")
+
+    assert thumbnail_color(first)[0] > 200 and thumbnail_color(second)[2] > 200
+
+
+def test_immutable_name_reuses_cached_thumbnail(tmp_path):
+    storage, renderer = make(tmp_path)
+    name = "u1_20261001093000123456_a.jpg"
+    storage.write_bytes(ORIGINALS, name, jpeg((255, 0, 0)))
+    first, _ = renderer.render(storage, ORIGINALS, name, 128, "jpeg")
+    storage.delete(ORIGINALS, name)
+
+    assert renderer.render(storage, ORIGINALS, name, 128, "jpeg")[0] == first
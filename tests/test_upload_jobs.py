@@ -0,0 +1,115 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from services import upload_jobs  # noqa: E402
+from services.inference_results import ensure_indexes  # noqa: E402
+from services.upload_jobs import DONE, FAILED, QUEUED, RUNNING, UploadJobManager, _now  # noqa: E402
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self.db = mongomock.MongoClient().db
+
+    def get_collection(self, name):
+        return self.db[name]
+
+
+@pytest.fixture
+def mongo():
+    return FakeMongoClient()
+
+
+@pytest.fixture
+def manager(mongo):
+    return UploadJobManager(mongo, workers=1, stale_seconds=60, max_attempts=2)
+
+
+def add_job(manager, job_id, status=QUEUED, attempts=0, age=0):
+    at = _now() - timedelta(seconds=age)
+    manager.collection.insert_one({
+        "_id": job_id, "status": status, "user_id": "u1", "paths": {"base_name": f"{job_id}.png"},
+        "yolo_inference_data": None, "attempts": attempts, "created_at": at, "heartbeat": at,
+    })
+
+
+def test_claim_queued_job_once(manager, mongo):
+    add_job(manager, "j1")
+    job = manager._claim("j1")
+    assert job["status"] == RUNNING and job["attempts"] == 1 and job["worker"] == manager.worker_id
+
+    other = UploadJobManager(mongo, stale_seconds=60, max_attempts=2)
+    other.worker_id = "other:1"
+    assert other._claim("j1") is None
+
+
+def test_claim_stale_running_job(manager):
+    add_job(manager, "fresh", status=RUNNING, attempts=1, age=10)
+    add_job(manager, "stale", status=RUNNING, attempts=1, age=120)
+    add_job(manager, "exhausted", status=RUNNING, attempts=2, age=120)
+    assert manager._claim("fresh") is None
+    assert manager._claim("stale")["attempts"] == 2
+    assert manager._claim("exhausted") is None
+
+
+def test_claim_ignores_finished_jobs(manager):
+    add_job(manager, "done", status=DONE, age=600)
+    assert manager._claim("done") is None
+
+
+def test_recover(manager, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(manager, "_enqueue", enqueued.append)
+    add_job(manager, "new", age=5)
+    add_job(manager, "orphaned_queued", age=120)
+    add_job(manager, "orphaned_running", status=RUNNING, attempts=1, age=120)
+    add_job(manager, "exhausted", status=RUNNING, attempts=2, age=120)
+
+    manager.recover()
+
+    assert sorted(enqueued) == ["orphaned_queued", "orphaned_running"]
+    exhausted = manager.get("exhausted")
+    assert exhausted["status"] == FAILED and exhausted["finished_at"] is not None
+    assert manager.get("new")["status"] == QUEUED
+
+
+def test_rerun_does_not_duplicate_result(manager, mongo, monkeypatch):
+    ensure_indexes(mongo.get_collection("inference_results")).join()
+
+    def fake_process_upload(paths, user_id, yolo, save_result, extra_fields, **kwargs):
+        save_result({"user_id": user_id, "original_image_path": paths.base_name, **extra_fields})
+        return {"message": "ok"}
+
+    monkeypatch.setattr(upload_jobs, "process_upload", fake_process_upload)
+    add_job(manager, "j1")
+    manager._run("j1")
+    assert manager.get("j1")["status"] == DONE
+
+    # 워커가 죽은 것처럼 다시 running + 오래된 heartbeat로 되돌린 뒤 재실행
+    manager.collection.update_one({"_id": "j1"}, {"$set": {"status": RUNNING,
+                                                         "heartbeat": _now() - timedelta(seconds=120)}})
+    manager._run("j1")
+    assert mongo.get_collection("inference_results").count_documents({"upload_job_id": "j1"}) == 1
+
+
+def test_failed_job(manager, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(upload_jobs, "process_upload", broken)
+    add_job(manager, "j1")
+    manager._run("j1")
+    job = manager.get("j1")
+    assert job["status"] == FAILED and "boom" in job["error"]
+
+
+def test_heartbeat_refreshed_while_running(manager, mongo):
+    manager.heartbeat_interval = 0.05
+    add_job(manager, "j1")
+    job = manager._claim("j1")
+    with manager._heartbeat("j1"):
+        time.sleep(0.3)
+    assert manager.get("j1")["heartbeat"] > job["heartbeat"]
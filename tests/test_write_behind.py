@@ -0,0 +1,177 @@
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError, ServerSelectionTimeoutError
+
+mongomock = pytest.importorskip("mongomock")
+
+import models.model as model  # noqa: E402
+from models.model import MongoDBClient, _WriteBehindBuffer  # noqa: E402
+
+
+class FakeCollection:
+    """insert_many(ordered=False) 흉내: bad 문서는 검증 실패, 이미 있는 _id는 중복 키, fail_next면 연결 오류"""
+
+    name = "results"
+
+    def __init__(self):
+        self.docs = {}
+        self.fail_next = 0
+        self.write_concern_next = 0
+
+    def insert_many(self, batch, ordered=False):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise AutoReconnect("connection reset")
+        errors = []
+        for index, doc in enumerate(batch):
+            if doc.get("bad"):
+                errors.append({"index": index, "code": 121, "errmsg": "Document failed validation"})
+            elif doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.docs[doc["_id"]] = doc
+        if self.write_concern_next:
+            # 저장은 됐지만 복제 확인 실패
+            self.write_concern_next -= 1
+            raise BulkWriteError({"writeErrors": errors,
+                                  "writeConcernErrors": [{"code": 64, "errmsg": "waiting for replication timed out"}]})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+class FailingDeadLetter:
+    def __init__(self, fail_with_document=True):
+        self.fail_with_document = fail_with_document
+        self.entries = []
+
+    def insert_one(self, entry):
+        if self.fail_with_document and "document" in entry:
+            raise ValueError("document too large")
+        self.entries.append(entry)
+
+
+def no_retry(operation, func):
+    return func()
+
+
+def make_buffer(collection, dead_letter=None):
+    # 백그라운드 주기는 길게: flush()를 직접 호출해 확인
+    return _WriteBehindBuffer(collection, batch_size=100, interval=3600, with_retry=no_retry,
+                              dead_letter=dead_letter)
+
+
+def test_invalid_document_is_dead_lettered_and_buffer_keeps_going():
+    collection = FakeCollection()
+    dead_letter = mongomock.MongoClient().db.dead_letter
+    buffer = make_buffer(collection, dead_letter)
+    for i in range(5):
+        buffer.add({"_id": i, "bad": i == 2})
+
+    buffer.flush()
+
+    assert sorted(collection.docs) == [0, 1, 3, 4]
+    assert buffer.pending() == 0
+    entry = dead_letter.find_one()
+    assert entry["collection"] == "results" and entry["document_id"] == 2 and entry["code"] == 121
+    assert entry["document"]["_id"] == 2
+
+    buffer.add({"_id": 5})
+    buffer.flush()
+    assert 5 in collection.docs
+
+
+def test_duplicate_keys_count_as_saved():
+    collection = FakeCollection()
+    collection.docs[1] = {"_id": 1}
+    dead_letter = mongomock.MongoClient().db.dead_letter
+    buffer = make_buffer(collection, dead_letter)
+    buffer.add({"_id": 1})
+    buffer.add({"_id": 2})
+
+    buffer.flush()
+
+    assert buffer.pending() == 0 and 2 in collection.docs
+    assert dead_letter.count_documents({}) == 0
+
+
+def test_connection_error_keeps_batch_for_next_flush():
+    collection = FakeCollection()
+    collection.fail_next = 1
+    buffer = make_buffer(collection)
+    buffer.add({"_id": 1})
+
+    with pytest.raises(AutoReconnect):
+        buffer.flush()
+    assert buffer.pending() == 1
+
+    buffer.flush()
+    assert buffer.pending() == 0 and 1 in collection.docs
+
+
+def test_write_concern_error_keeps_batch_for_next_flush():
+    collection = FakeCollection()
+    collection.write_concern_next = 1
+    dead_letter = mongomock.MongoClient().db.dead_letter
+    buffer = make_buffer(collection, dead_letter)
+    for i in range(3):
+        buffer.add({"_id": i, "bad": i == 1})
+
+    with pytest.raises(BulkWriteError):
+        buffer.flush()
+    assert buffer.pending() == 2
+    assert [entry["document_id"] for entry in dead_letter.find()] == [1]
+
+    buffer.flush()
+    assert buffer.pending() == 0 and sorted(collection.docs) == [0, 2]
+    assert dead_letter.count_documents({}) == 1
+
+
+def test_unstorable_document_dead_letters_error_only():
+    dead_letter = FailingDeadLetter()
+    buffer = make_buffer(FakeCollection(), dead_letter)
+    buffer.add({"_id": 1, "bad": True})
+
+    buffer.flush()
+
+    assert buffer.pending() == 0
+    assert dead_letter.entries == [{"collection": "results", "document_id": 1, "code": 121,
+                                    "error": "Document failed validation"}]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(model, "MongoClient", lambda *args, **kwargs: mongomock.MongoClient())
+    monkeypatch.setattr(model.time, "sleep", lambda seconds: None)
+    return MongoDBClient(uri="mongodb://test", db_name="test", retry_attempts=3)
+
+
+def test_retry_transient_errors(client):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise AutoReconnect("reset")
+        return "ok"
+
+    assert client._with_retry("insert_one", flaky) == "ok"
+    assert len(calls) == 3
+
+
+def test_server_selection_timeout_is_not_retried(client):
+    calls = []
+
+    def unreachable():
+        calls.append(1)
+        raise ServerSelectionTimeoutError("no servers")
+
+    with pytest.raises(ServerSelectionTimeoutError):
+        client._with_retry("insert_one", unreachable)
+    assert len(calls) == 1
+
+
+def test_write_behind_buffer_per_collection(client):
+    buffer = client.write_behind_buffer("chat_transcripts")
+    assert client.write_behind_buffer("chat_transcripts") is buffer
+    buffer.add({"turn": 1})
+    client.flush()
+    assert client.get_collection("chat_transcripts").count_documents({}) == 1
@@ -0,0 +1,342 @@
+import bisect
+import threading
+import time
+
+# ✅ Prometheus 텍스트 형식 메트릭 (GET /metrics)
+#   - Counter / Gauge / Histogram, 라벨은 키워드 인자로: REQUEST_COUNT.inc(endpoint=..., method=..., status=...)
+#   - 메트릭마다 락 하나, 기록은 dict 갱신 한 번 (히스토그램은 해당 버킷 하나만 증가, 누적은 조회 시 계산)
+#   - 프로세스 단위 집계: gunicorn 워커가 여러 개면 워커별로 따로 수집됩니다.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[n] for n in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(key, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [버킷별 개수..., +Inf 개수], 합계
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self):
+        with self._lock:
+            return [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total) in self._samples():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# ✅ 조회 시점에 값을 채우는 수집 함수 (큐 길이 등 상태값)
+def add_collector(collector):
+    _collectors.append(collector)
+
+
+def render_metrics():
+    for collector in _collectors:
+        try:
+            collector()
+        except Exception as e:
+            print(f"⚠️ 메트릭 수집 실패: {e}")
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ✅ 공통 메트릭 ==========================================================
+REQUEST_COUNT = Counter(
+    "http_requests_total", "HTTP 요청 수", ("endpoint", "method", "status"))
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP 요청 처리 시간", ("endpoint", "method"))
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "처리 중인 HTTP 요청 수", ("endpoint",))
+
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds", "업로드 파이프라인 단계별 시간", ("stage",))
+INFERENCE_LATENCY = Histogram(
+    "inference_forward_duration_seconds", "모델 forward 시간 (요청 기준)", ("model",))
+INFERENCE_BATCH_SIZE = Histogram(
+    "inference_batch_size", "마이크로 배치 크기 (INFERENCE_BATCHING=1 일 때)", ("model",),
+    buckets=(1, 2, 4, 8, 16, 32))
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "inference_batch_queue_depth", "배치 대기열 길이", ("model",))
+
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB 명령 처리 시간", ("command", "outcome"))
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections", "MongoDB 커넥션 풀 연결 수 (open = 열린 연결, in_use = 사용 중)", ("state",))
+MONGO_POOL_MAX_SIZE = Gauge(
+    "mongodb_pool_max_size", "MongoDB 커넥션 풀 최대 크기 (서버당)")
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongodb_pool_checkout_wait_seconds", "커넥션 풀에서 연결을 얻기까지 대기 시간",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total", "커넥션 풀 연결 획득 실패 (timeout = 풀 포화)", ("reason",))
+MONGO_WRITE_RETRIES = Counter(
+    "mongodb_write_retries_total", "일시적 오류로 다시 시도한 MongoDB 쓰기", ("operation",))
+MONGO_WRITE_BEHIND_PENDING = Gauge(
+    "mongodb_write_behind_pending", "지연 쓰기 버퍼에 남은 문서 수 (컬렉션별)", ("collection",))
+MONGO_WRITE_BEHIND_DROPPED = Counter(
+    "mongodb_write_behind_dropped_total", "지연 쓰기에서 저장하지 못하고 dead letter로 옮긴 문서 수 (컬렉션별)", ("collection",))
+MONGO_WRITE_BEHIND_FLUSH_SIZE = Histogram(
+    "mongodb_write_behind_flush_size", "지연 쓰기 insert_many 1회당 문서 수", ("collection",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250))
+SQL_QUERY_LATENCY = Histogram(
+    "sqlalchemy_query_duration_seconds", "SQLAlchemy(MySQL) 쿼리 시간", ("statement",))
+
+UPLOAD_JOBS = Counter(
+    "upload_jobs_total", "비동기 업로드 작업 상태 전이 수", ("status",))
+
+OVERLAY_REQUESTS = Counter(
+    "overlay_cache_requests_total", "오버레이 요청 (memory / disk 캐시 적중, render = 새로 그림)", ("source",))
+
+THUMBNAIL_REQUESTS = Counter(
+    "thumbnail_cache_requests_total", "썸네일 요청 (memory / disk 캐시 적중, render = 새로 생성)", ("source",))
+
+RESULT_CACHE_REQUESTS = Counter(
+    "inference_result_cache_requests_total",
+    "추론 결과 캐시 조회 (hit_memory / hit_mongo / hit_shared = 동시 요청 결과 공유, miss = 추론 실행)", ("result",))
+ORIGINAL_DEDUPE = Counter(
+    "original_dedupe_total", "원본 저장 (linked = 같은 내용의 기존 파일 재사용, written = 새로 저장)", ("result",))
+
+CHAT_CACHE_REQUESTS = Counter(
+    "chat_answer_cache_requests_total", "챗봇 답변 캐시 조회 (hit_memory / hit_mongo, miss = LLM 호출)", ("result",))
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "LLM(Gemini) 응답 시간", ("backend", "outcome"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0))
+LLM_FIRST_CHUNK_LATENCY = Histogram(
+    "llm_first_chunk_seconds", "LLM 스트리밍 첫 조각까지 시간", ("backend",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0))
+
+
+def observe_stage(name, seconds):
+    STAGE_LATENCY.observe(seconds, stage=name)
+    if name.startswith("forward."):
+        INFERENCE_LATENCY.observe(seconds, model=name[len("forward."):])
+
+
+# ✅ MongoDB 명령 시간 (pymongo 명령 모니터링, 등록 이후 생성된 MongoClient에 적용)
+def _mongo_listener():
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name, outcome="ok")
+
+        def failed(self, event):
+            MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name, outcome="error")
+
+    return MongoCommandMetrics()
+
+
+# ✅ MongoDB 커넥션 풀 사용량 (MongoDBClient가 MongoClient 생성 시 event_listeners로 전달)
+def mongo_pool_listener():
+    from pymongo import monitoring
+
+    class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+        def pool_created(self, event):
+            max_size = (event.options or {}).get("maxPoolSize")
+            if max_size is not None:
+                MONGO_POOL_MAX_SIZE.set(max_size)
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+
+        def connection_created(self, event):
+            MONGO_POOL_CONNECTIONS.inc(state="open")
+
+        def connection_ready(self, event):
+            pass
+
+        def connection_closed(self, event):
+            MONGO_POOL_CONNECTIONS.dec(state="open")
+
+        def connection_check_out_started(self, event):
+            pass
+
+        def connection_check_out_failed(self, event):
+            MONGO_POOL_CHECKOUT_FAILURES.inc(reason=str(event.reason).lower())
+
+        def connection_checked_out(self, event):
+            MONGO_POOL_CONNECTIONS.inc(state="in_use")
+            duration = getattr(event, "duration", None)     # pymongo 4.7+
+            if duration is not None:
+                MONGO_POOL_CHECKOUT_WAIT.observe(duration)
+
+        def connection_checked_in(self, event):
+            MONGO_POOL_CONNECTIONS.dec(state="in_use")
+
+    return MongoPoolMetrics()
+
+
+# ✅ SQLAlchemy 쿼리 시간 (모든 Engine에 적용)
+def _install_sqlalchemy_events():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            SQL_QUERY_LATENCY.observe(time.perf_counter() - starts.pop(), statement=verb)
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _install_global_hooks():
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from pymongo import monitoring
+        from utils.timing import add_listener
+
+        monitoring.register(_mongo_listener())
+        _install_sqlalchemy_events()
+        add_listener(observe_stage)
+        _installed = True
+
+
+# ✅ Flask 앱에 요청 메트릭과 /metrics 엔드포인트 등록
+#    MongoDBClient 생성 전에 호출해야 MongoDB 명령 시간도 수집됩니다.
+def init_metrics(app):
+    from flask import Response, g, request
+
+    _install_global_hooks()
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_endpoint = request.endpoint or "unmatched"
+        g._metrics_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(endpoint=g._metrics_endpoint)
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    # 예외로 after_request가 건너뛰어져도 teardown은 항상 호출됨
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return
+        endpoint = g.pop("_metrics_endpoint")
+        status = g.pop("_metrics_status", 500)
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+        REQUEST_COUNT.inc(endpoint=endpoint, method=request.method, status=str(status))
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    return app
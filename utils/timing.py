@@ -0,0 +1,54 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# ✅ 업로드 파이프라인 단계별 시간 측정
+#   with stage("decode"): ...   처럼 감싸 두면
+#   - record_stages() 블록 안에서는 요청 단위로 단계별 시간이 모이고 (벤치마크용)
+#   - add_listener()로 등록한 함수에도 (단계, 초)가 전달됩니다 (메트릭용)
+#   contextvars를 쓰므로 copy_context()로 넘긴 워커 스레드의 측정도 같은 요청에 합쳐집니다.
+
+_current_recorder = contextvars.ContextVar("stage_recorder", default=None)
+_listeners = []
+
+
+class StageRecorder:
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def record_stages():
+    recorder = StageRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+def report(name, seconds):
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.add(name, seconds)
+    for listener in _listeners:
+        listener(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report(name, time.perf_counter() - start)
+
+
+def add_listener(listener):
+    _listeners.append(listener)